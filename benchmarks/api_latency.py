@@ -0,0 +1,141 @@
+"""
+api_latency.py
+--------------
+Drives lambda_handler.lambda_handler against synthetic listings and the fake
+Google server, reporting per-request latency percentiles (overall and per
+sort_by), throughput of one container, and the external calls made.
+
+Requests cycle through every region and a mix of sorts, pages and commute
+types. Destination addresses repeat across requests (--addresses per region),
+as real traffic clusters around a few business districts, so the caches see
+realistic reuse.
+
+Usage:
+    python -m benchmarks.api_latency --db-url postgresql://user:pw@host/db \
+        [--rows 10000] [--requests 500] [--latency-ms 50] [--error-rate 0] [--listings-engine sql] \
+        [--output results.json]
+
+The listings table of --db-url is replaced unless --skip-load is given.
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from benchmarks.database import LAMBDA_DIR, driver_url, load_listings
+from benchmarks.fake_google import FakeGoogleServer
+from benchmarks.report import latency_summary, peak_rss_mb, environment, write_results
+from benchmarks.synthetic import generate_listings
+import config.env
+from config.constants import CITY_CENTERS
+
+SORT_MIX = ["list_price", "distance", "commute_seconds", "list_price", "beds", "commute_seconds"]
+COMMUTE_TYPES = ["driving", "transit", "walking", "bicycling"]
+
+
+def build_requests(n_requests, addresses_per_region, seed=0):
+    """The request bodies the benchmark sends, in order."""
+    rng = random.Random(seed)
+    regions = list(CITY_CENTERS)
+    bodies = []
+    for i in range(n_requests):
+        city = regions[i % len(regions)].split(",")[0]
+        bodies.append({
+            "user_address": f"{rng.randrange(addresses_per_region)} Benchmark Plaza, {city}",
+            "commute_type": rng.choice(COMMUTE_TYPES),
+            "sort_by": SORT_MIX[i % len(SORT_MIX)],
+            "page": rng.choice([1, 1, 1, 2, 3]),
+            "page_size": 20
+        })
+    return bodies
+
+
+def run_requests(lambda_handler, bodies):
+    """
+    Send every body through the handler in order.
+
+    Returns:
+        (list, list, float): Per-request (sort_by, status code, seconds), and elapsed wall time.
+    """
+    samples = []
+    start = time.perf_counter()
+    # The handler's metrics and error lines go to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        for body in bodies:
+            event = {"body": json.dumps(body), "headers": {"Accept-Encoding": "gzip"}}
+            t0 = time.perf_counter()
+            response = lambda_handler(event, None)
+            samples.append((body["sort_by"], response["statusCode"], time.perf_counter() - t0))
+    return samples, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", required=True, help="Scratch Postgres database (libpq URL)")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--addresses", type=int, default=5, help="Distinct destination addresses per region")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake Google API latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake Google API requests that fail")
+    parser.add_argument("--response-cache", default="off", choices=["off", "memory", "shared"])
+    parser.add_argument("--listings-engine", default="sql", choices=["sql", "memory"])
+    parser.add_argument("--skip-load", action="store_true", help="Reuse the listings already in the database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    load_seconds = None
+    if not args.skip_load:
+        t0 = time.perf_counter()
+        load_listings(args.db_url, generate_listings(args.rows, seed=args.seed))
+        load_seconds = time.perf_counter() - t0
+
+    with FakeGoogleServer(args.latency_ms, args.error_rate, seed=args.seed) as server:
+        # The Lambda reads config.env at import; re-read it with the benchmark's settings
+        os.environ["GOOGLE_MAPS_API_URL"] = server.url
+        os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+        os.environ["RESPONSE_CACHE_MODE"] = args.response_cache
+        os.environ["LISTINGS_ENGINE"] = args.listings_engine
+        importlib.reload(config.env)
+        sys.path.insert(0, LAMBDA_DIR)
+        import db
+        db.db_url = driver_url(args.db_url, "psycopg")
+        import lambda_handler
+        import commute_cache
+
+        bodies = build_requests(args.requests, args.addresses, seed=args.seed)
+        # The first request pays for connections and lazy imports; report it on its own
+        first, _ = run_requests(lambda_handler.lambda_handler, bodies[:1])
+        samples, elapsed = run_requests(lambda_handler.lambda_handler, bodies[1:])
+        calls = dict(server.counts)
+
+    by_sort = {}
+    for sort_by, _, seconds in samples:
+        by_sort.setdefault(sort_by, []).append(seconds)
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    results = {
+        "benchmark": "api_latency",
+        "environment": environment(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("db_url", "output")},
+        "load_seconds": load_seconds,
+        "first_request_ms": first[0][2] * 1000,
+        "latency": latency_summary([seconds for _, _, seconds in samples]),
+        "latency_by_sort": {sort_by: latency_summary(values) for sort_by, values in by_sort.items()},
+        "throughput_rps": len(samples) / elapsed if elapsed else None,
+        "status_codes": statuses,
+        "google_calls": calls,
+        "commute_cache": commute_cache.get_cache_stats(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
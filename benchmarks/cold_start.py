@@ -0,0 +1,88 @@
+"""
+cold_start.py
+-------------
+Measures API Lambda init cost: wall time to import lambda_handler in a fresh
+interpreter, plus the slowest imports reported by `python -X importtime`.
+
+Usage:
+    python -m benchmarks.cold_start [--runs 10] [--output results.json]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.report import environment, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(REPO_ROOT, "lambda")
+
+
+def _lambda_env():
+    # Mirror the container layout: lambda/ as the working directory, config/ and geo/ importable
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([LAMBDA_DIR, REPO_ROOT])
+    return env
+
+
+def measure_import_seconds(module="lambda_handler"):
+    """Wall time of a fresh interpreter importing module, minus a bare interpreter start."""
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=LAMBDA_DIR, env=_lambda_env(), check=True)
+        return time.perf_counter() - start
+
+    baseline = run("pass")
+    return run(f"import {module}") - baseline
+
+
+def slowest_imports(module="lambda_handler", top=15):
+    """Parse `-X importtime` output into the modules with the largest cumulative import time."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=LAMBDA_DIR, env=_lambda_env(), capture_output=True, text=True, check=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings.append({"module": name.rstrip(), "self_ms": int(self_us) / 1000,
+                        "cumulative_ms": int(cumulative_us) / 1000})
+    # Nested imports are indented under the module that pulled them in; keep the
+    # modules imported directly by the target and its own package-level imports
+    for t in timings:
+        t["depth"] = (len(t["module"]) - len(t["module"].lstrip())) // 2
+        t["module"] = t["module"].strip()
+    candidates = [t for t in timings if t["module"] != module and t["depth"] <= 2]
+    return sorted(candidates, key=lambda t: t["cumulative_ms"], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    samples = [measure_import_seconds() for _ in range(args.runs)]
+    slowest = slowest_imports()
+    results = {
+        "benchmark": "cold_start",
+        "environment": environment(),
+        "runs": args.runs,
+        "import_ms": {
+            "p50": statistics.median(samples) * 1000,
+            "min": min(samples) * 1000,
+            "max": max(samples) * 1000,
+        },
+        "slowest_imports": slowest,
+    }
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
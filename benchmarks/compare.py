@@ -0,0 +1,78 @@
+"""
+compare.py
+----------
+Compares two benchmark result files (from run_all or a single benchmark) and
+lists every timing and memory metric that moved by more than a threshold.
+
+Metrics are the numeric leaves whose names end in _ms, _seconds or _mb (lower
+is better) or are throughputs (_rps, _per_second; higher is better).
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json [--threshold 0.1]
+
+Exits with status 1 if any metric regressed beyond the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ("_ms", "_seconds", "_mb")
+HIGHER_IS_BETTER = ("_rps", "_per_second")
+
+
+def flatten(results, prefix=""):
+    """Map dotted paths to the numeric metrics in a result document."""
+    metrics = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key.endswith(LOWER_IS_BETTER + HIGHER_IS_BETTER):
+            metrics[path] = float(value)
+    return metrics
+
+
+def compare(baseline, current, threshold):
+    """
+    Relative change of every metric present in both documents.
+
+    Returns:
+        list: (path, baseline, current, change, regressed) for metrics that moved more than threshold.
+    """
+    before, after = flatten(baseline), flatten(current)
+    changes = []
+    for path in sorted(before.keys() & after.keys()):
+        if before[path] == 0:
+            continue
+        change = (after[path] - before[path]) / before[path]
+        if abs(change) <= threshold:
+            continue
+        regressed = change < 0 if path.endswith(HIGHER_IS_BETTER) else change > 0
+        changes.append((path, before[path], after[path], change, regressed))
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change to report (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    changes = compare(baseline, current, args.threshold)
+    for path, before, after, change, regressed in changes:
+        label = "REGRESSED" if regressed else "improved"
+        print(f"{label:9}  {path}: {before:.3f} -> {after:.3f} ({change:+.1%})")
+    if not changes:
+        print(f"No metric moved by more than {args.threshold:.0%}.")
+    sys.exit(1 if any(change[4] for change in changes) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+fake_google.py
+--------------
+Local stand-in for the Google Maps Geocoding and Distance Matrix APIs, so the
+API Lambda can be benchmarked without network calls or API spend.
+
+Point GOOGLE_MAPS_API_URL at server.url before the Lambda modules are imported.
+Geocoding places an address near the center of the CITY_CENTERS region named in
+it (any region if none is), at a position derived from a hash of the address, so
+results are stable across runs. Distance Matrix durations are straight-line
+distance times a detour factor over a per-mode speed.
+
+Latency is added per request, and a configurable fraction of requests fail with
+OVER_QUERY_LIMIT (Distance Matrix) or an HTTP 500 (Geocoding).
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from config.constants import CITY_CENTERS
+from geo.kernel import geodesic_km, KM_PER_DEGREE_LAT
+
+MODE_SPEED_KMH = {"walking": 5, "bicycling": 15, "driving": 35, "transit": 22}
+DETOUR_FACTOR = 1.3
+GEOCODE_SPREAD_KM = 8
+
+
+def _geocode(address):
+    """Deterministic coordinates for an address, or None for addresses containing 'nowhere'."""
+    if "nowhere" in address.lower():
+        return None
+    digest = hashlib.sha256(address.encode("utf-8")).digest()
+    regions = [name for name in CITY_CENTERS if name.split(",")[0].lower() in address.lower()]
+    names = regions or list(CITY_CENTERS)
+    lat, lon = CITY_CENTERS[names[digest[0] % len(names)]]
+    # Two bytes each for the north and east offsets, in [-1, 1) of the spread
+    north = (int.from_bytes(digest[1:3], "big") / 32768 - 1) * GEOCODE_SPREAD_KM
+    east = (int.from_bytes(digest[3:5], "big") / 32768 - 1) * GEOCODE_SPREAD_KM
+    return lat + north / KM_PER_DEGREE_LAT, lon + east / KM_PER_DEGREE_LAT
+
+
+class FakeGoogleServer:
+    """
+    Threaded HTTP server answering /geocode/json and /distancematrix/json.
+
+    Args:
+        latency_ms (float): Delay added to every request.
+        error_rate (float): Fraction of requests that fail.
+        seed (int): Seed for choosing which requests fail.
+        port (int): Port to listen on; 0 picks a free one.
+    """
+
+    def __init__(self, latency_ms=0.0, error_rate=0.0, seed=0, port=0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.counts = {"geocode": 0, "matrix": 0, "elements": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _fail(self):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.counts["errors"] += 1
+            return failed
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def geocode(self, query):
+        """Return (status code, body) for a Geocoding request."""
+        self._count("geocode")
+        if self._fail():
+            return 500, {"status": "UNKNOWN_ERROR"}
+        location = _geocode(query.get("address", [""])[0])
+        if location is None:
+            return 200, {"status": "ZERO_RESULTS", "results": []}
+        return 200, {"status": "OK", "results": [{"geometry": {"location": {"lat": location[0], "lng": location[1]}}}]}
+
+    def distance_matrix(self, query):
+        """Return (status code, body) for a Distance Matrix request."""
+        self._count("matrix")
+        if self._fail():
+            return 200, {"status": "OVER_QUERY_LIMIT", "rows": []}
+        origins = [tuple(map(float, o.split(","))) for o in query["origins"][0].split("|")]
+        destinations = [tuple(map(float, d.split(","))) for d in query["destinations"][0].split("|")]
+        speed = MODE_SPEED_KMH.get(query.get("mode", ["driving"])[0], MODE_SPEED_KMH["driving"])
+        self._count("elements", len(origins) * len(destinations))
+
+        rows = []
+        for o_lat, o_lon in origins:
+            elements = []
+            for d_lat, d_lon in destinations:
+                km = float(geodesic_km(o_lat, o_lon, d_lat, d_lon)) * DETOUR_FACTOR
+                elements.append({
+                    "status": "OK",
+                    "distance": {"value": int(km * 1000)},
+                    "duration": {"value": int(km / speed * 3600)}
+                })
+            rows.append({"elements": elements})
+        return 200, {"status": "OK", "rows": rows}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real APIs, so clients reuse connections
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                if server.latency_ms:
+                    time.sleep(server.latency_ms / 1000)
+                if parsed.path.endswith("/geocode/json"):
+                    status, body = server.geocode(query)
+                elif parsed.path.endswith("/distancematrix/json"):
+                    status, body = server.distance_matrix(query)
+                else:
+                    status, body = 404, {"status": "NOT_FOUND"}
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the fake Google Maps API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    with FakeGoogleServer(args.latency_ms, args.error_rate, port=args.port) as server:
+        print(f"Serving fake Google Maps APIs at {server.url}")
+        try:
+            server._thread.join()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,63 @@
+"""
+report.py
+---------
+Shared result helpers for the benchmarks: latency percentiles, peak memory and
+JSON output, so every scenario reports in the same machine-readable shape.
+"""
+
+import json
+import platform
+import resource
+import sys
+from datetime import datetime, timezone
+import numpy as np
+
+
+def latency_summary(samples):
+    """
+    Summarize per-operation wall times.
+
+    Args:
+        samples (list): Durations in seconds.
+
+    Returns:
+        dict: Count and p50/p90/p99/mean/max in milliseconds.
+    """
+    ms = np.asarray(samples, dtype=float) * 1000
+    if ms.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(ms.size),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "max_ms": float(ms.max()),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def environment():
+    """Host details recorded with every result, so runs are compared like for like."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_results(results, output=None):
+    """Print results as JSON, or write them to output."""
+    text = json.dumps(results, indent=2, default=float)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
@@ -0,0 +1,62 @@
+"""
+run_all.py
+----------
+Runs every benchmark in its own interpreter, as each component runs in its own
+container, and merges the results into one JSON document for comparison with
+benchmarks.compare.
+
+Usage:
+    python -m benchmarks.run_all [--db-url postgresql://user:pw@host/db] [--rows 10000] \
+        [--requests 500] [--output results.json]
+
+Without --db-url only the benchmarks that need no database run.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from benchmarks.database import REPO_ROOT
+from benchmarks.report import environment, write_results
+
+
+def run_benchmark(module, *arguments):
+    """Run one benchmark module and return its parsed results."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "results.json")
+        subprocess.run(
+            [sys.executable, "-m", f"benchmarks.{module}", *map(str, arguments), "--output", output],
+            cwd=REPO_ROOT, check=True
+        )
+        with open(output) as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", help="Scratch Postgres database (libpq URL); its listings are replaced")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "benchmarks": {}}
+    results["benchmarks"]["cold_start"] = run_benchmark("cold_start", "--runs", 5)
+    results["benchmarks"]["scraper_postprocess"] = run_benchmark("scraper_postprocess", "--rows", args.rows)
+    if args.db_url:
+        results["benchmarks"]["updater_load"] = run_benchmark(
+            "updater_load", "--db-url", args.db_url, "--rows", args.rows
+        )
+        results["benchmarks"]["api_latency"] = run_benchmark(
+            "api_latency", "--db-url", args.db_url, "--rows", args.rows, "--requests", args.requests,
+            "--latency-ms", args.latency_ms, "--error-rate", args.error_rate
+        )
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+synthetic.py
+------------
+Reproducible synthetic listings spread across every region in CITY_CENTERS.
+
+generate_listings() builds rows in the shape of the `listings` table (without
+ids), ready for sync_listings or region artifacts. generate_raw_scrape() builds
+messier rows in the shape the scraper returns, with missing coordinates, string
+bath counts, duplicates and listings outside MAX_DISTANCE_KM, for the scraper's
+post-processing.
+"""
+
+import numpy as np
+import pandas as pd
+from config.constants import CITY_CENTERS, MAX_DISTANCE_KM
+from geo.kernel import KM_PER_DEGREE_LAT, geodesic_km
+
+
+def _region_points(rng, n_rows, spread_km):
+    """Regions drawn uniformly, with points scattered normally around each region center."""
+    names = np.array(list(CITY_CENTERS.keys()))
+    centers = np.array(list(CITY_CENTERS.values()), dtype=float)
+    picks = rng.integers(0, len(names), n_rows)
+    offsets_km = rng.normal(0.0, spread_km, size=(n_rows, 2))
+    lat = centers[picks, 0] + offsets_km[:, 0] / KM_PER_DEGREE_LAT
+    lon = centers[picks, 1] + offsets_km[:, 1] / (KM_PER_DEGREE_LAT * np.cos(np.radians(centers[picks, 0])))
+    return names[picks], centers[picks], lat, lon
+
+
+def generate_listings(n_rows, seed=0, url_prefix="https://bench.example/listing/"):
+    """
+    Generate listings rows in the shape of the `listings` table.
+
+    Args:
+        n_rows (int): Number of listings.
+        seed (int): Random seed; the same seed always gives the same rows.
+        url_prefix (str): Prefix of property_url, which is the natural key.
+
+    Returns:
+        DataFrame: One row per listing, every point within MAX_DISTANCE_KM of its region center.
+    """
+    rng = np.random.default_rng(seed)
+    regions, centers, lat, lon = _region_points(rng, n_rows, MAX_DISTANCE_KM / 4)
+
+    # Keep every listing inside the region radius, as the scraper does
+    outside = geodesic_km(lat, lon, centers[:, 0], centers[:, 1]) > MAX_DISTANCE_KM * 0.95
+    lat[outside] = centers[outside, 0]
+    lon[outside] = centers[outside, 1]
+
+    beds = rng.integers(0, 5, n_rows)
+    full_baths = np.maximum(1, beds - rng.integers(0, 2, n_rows))
+    ids = pd.Series(np.arange(n_rows)).astype(str)
+    return pd.DataFrame({
+        "property_url": url_prefix + ids,
+        "latitude": lat,
+        "longitude": lon,
+        "beds": beds,
+        "full_baths": full_baths,
+        "half_baths": rng.integers(0, 2, n_rows),
+        "list_price": np.round(900 + 700 * beds + rng.gamma(2.0, 400.0, n_rows), 0),
+        "formatted_address": ids + " Benchmark Ave",
+        "city": pd.Series(regions).str.split(",").str[0],
+        "region": regions,
+        "primary_photo": "https://bench.example/photo/" + ids + ".jpg"
+    })
+
+
+def perturb_listings(df, fraction, seed=1):
+    """
+    Simulate the next scrape: change prices of a fraction of listings, delist another
+    fraction and add as many new ones.
+
+    Returns:
+        DataFrame: The next snapshot.
+    """
+    rng = np.random.default_rng(seed)
+    n_changes = int(len(df) * fraction)
+    df = df.copy()
+    changed = rng.choice(len(df), n_changes, replace=False)
+    df.loc[df.index[changed], "list_price"] += 50
+    delisted = rng.choice(len(df), n_changes, replace=False)
+    df = df.drop(df.index[delisted])
+    fresh = generate_listings(n_changes, seed=seed + 1000, url_prefix=f"https://bench.example/new-{seed}/")
+    return pd.concat([df, fresh], ignore_index=True)
+
+
+def generate_raw_scrape(n_rows, seed=0):
+    """
+    Generate rows shaped like the scraper's raw output, grouped by city.
+
+    Returns:
+        dict: {city: DataFrame} with a few percent of missing coordinates, missing or
+              string bath counts, duplicate URLs and points beyond MAX_DISTANCE_KM.
+    """
+    rng = np.random.default_rng(seed)
+    df = generate_listings(n_rows, seed=seed).drop(columns=["region"])
+
+    # Spread some listings well beyond the region radius
+    far = rng.random(n_rows) < 0.03
+    df.loc[far, "latitude"] += rng.choice([-1, 1], far.sum()) * 2 * MAX_DISTANCE_KM / KM_PER_DEGREE_LAT
+
+    missing = rng.random(n_rows) < 0.02
+    df.loc[missing, "latitude"] = np.nan
+    df["full_baths"] = df["full_baths"].astype(object)
+    df.loc[rng.random(n_rows) < 0.05, "full_baths"] = None
+    as_text = rng.random(n_rows) < 0.05
+    df.loc[as_text, "full_baths"] = df.loc[as_text, "full_baths"].astype(str)
+
+    duplicates = df.sample(frac=0.02, random_state=seed)
+    df = pd.concat([df, duplicates], ignore_index=True)
+    return {city: group.reset_index(drop=True) for city, group in df.groupby("city")}
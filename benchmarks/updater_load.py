@@ -0,0 +1,87 @@
+"""
+updater_load.py
+---------------
+Times rental_listings_updater.lambda_handler loading synthetic region artifacts
+from a local directory, with the process's peak resident memory after each load.
+tracemalloc is left off, as it slows allocation-heavy loads several times over.
+
+Three loads run in order: the initial load into an empty listings table, an
+unchanged re-run (every region skipped by content hash), and an incremental
+load where --change-fraction of listings were repriced, delisted or added.
+
+Usage:
+    python -m benchmarks.updater_load --db-url postgresql://user:pw@host/db \
+        [--rows 100000] [--change-fraction 0.01] [--output results.json]
+
+The listings table of --db-url is replaced.
+"""
+
+import argparse
+import contextlib
+import sys
+import tempfile
+import time
+from benchmarks.database import UPDATE_DB_DIR, driver_url, reset_listings
+from benchmarks.report import peak_rss_mb, environment, write_results
+from benchmarks.synthetic import generate_listings, perturb_listings
+from config.db_engine import create_db_engine
+from scraping.artifacts import LocalArtifactStore, write_region_artifacts
+
+
+def timed_load(handler, artifact_dir):
+    """
+    Run one load.
+
+    Returns:
+        dict: Whether the database changed, seconds, and peak resident memory so far.
+    """
+    # The updater's progress lines go to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        t0 = time.perf_counter()
+        updated = handler({"artifact_dir": artifact_dir}, None)
+        seconds = time.perf_counter() - t0
+    return {"updated": updated, "seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", required=True, help="Scratch Postgres database (libpq URL)")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--change-fraction", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    sys.path.insert(0, UPDATE_DB_DIR)
+    import rental_listings_updater
+    rental_listings_updater.engine = create_db_engine(driver_url(args.db_url, "psycopg2"))
+    reset_listings(rental_listings_updater.engine)
+
+    df = generate_listings(args.rows, seed=args.seed)
+    loads = {}
+    with tempfile.TemporaryDirectory() as artifact_dir:
+        store = LocalArtifactStore(artifact_dir)
+        t0 = time.perf_counter()
+        write_region_artifacts(df, store)
+        write_seconds = time.perf_counter() - t0
+
+        loads["initial"] = timed_load(rental_listings_updater.lambda_handler, artifact_dir)
+        loads["unchanged"] = timed_load(rental_listings_updater.lambda_handler, artifact_dir)
+        write_region_artifacts(perturb_listings(df, args.change_fraction, seed=args.seed + 1), store)
+        loads["incremental"] = timed_load(rental_listings_updater.lambda_handler, artifact_dir)
+
+    for load in loads.values():
+        load["rows_per_second"] = args.rows / load["seconds"] if load["seconds"] else None
+
+    results = {
+        "benchmark": "updater_load",
+        "environment": environment(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("db_url", "output")},
+        "artifact_write_seconds": write_seconds,
+        "loads": loads,
+    }
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
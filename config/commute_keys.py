@@ -0,0 +1,79 @@
+"""
+commute_keys.py
+---------------
+Commute cache keys, shared by the API Lambda and update_db so both read and
+write the same entries: destination grid cells, the arrival time of
+time-dependent modes, and the key format itself.
+"""
+
+import math
+from datetime import datetime, date, time as dtime, timedelta
+from config.constants import COMMUTE_CACHE_CELL_DEGREES
+
+# Travel modes whose commute depends on the arrival time
+TIME_DEPENDENT_MODES = ("transit", "driving")
+
+
+def default_arrival_timestamp(hour=9):
+    """
+    Returns a UNIX timestamp for the next occurrence of a given hour.
+    Defaults to 9:00 AM today, or tomorrow if past 9:00 AM.
+
+    Args:
+        hour (int): Hour of day (0-23) for arrival time.
+
+    Returns:
+        int: UNIX timestamp
+    """
+    arrival = datetime.combine(date.today(), dtime(hour=hour))
+    if datetime.now() > arrival:
+        arrival += timedelta(days=1)
+    return int(arrival.timestamp())
+
+
+def destination_cell(coord):
+    """Quantize a destination coordinate to a grid cell id."""
+    lat, lon = coord
+    return (math.floor(lat / COMMUTE_CACHE_CELL_DEGREES), math.floor(lon / COMMUTE_CACHE_CELL_DEGREES))
+
+
+def cell_center(cell):
+    """(latitude, longitude) of the center of a destination cell."""
+    return (cell[0] + 0.5) * COMMUTE_CACHE_CELL_DEGREES, (cell[1] + 0.5) * COMMUTE_CACHE_CELL_DEGREES
+
+
+def arrival_bucket(travel_type):
+    """Hour bucket of the arrival time used for time-dependent modes."""
+    if travel_type in TIME_DEPENDENT_MODES:
+        return str(default_arrival_timestamp() // 3600)
+    return "any"
+
+
+def cell_cache_key(origin, cell, travel_type):
+    """
+    Build the cache key for a listing -> destination cell lookup.
+
+    Args:
+        origin (tuple): (latitude, longitude) of the listing.
+        cell (tuple): (cell_lat, cell_lon) destination cell.
+        travel_type (str): Travel mode.
+
+    Returns:
+        str: Cache key, "lat,lon|cell_lat,cell_lon|mode|arrival_bucket".
+    """
+    return f"{origin[0]:.5f},{origin[1]:.5f}|{cell[0]},{cell[1]}|{travel_type}|{arrival_bucket(travel_type)}"
+
+
+def commute_cache_key(origin, destination, travel_type):
+    """
+    Build the cache key for a single listing -> destination lookup.
+
+    Args:
+        origin (tuple): (latitude, longitude) of the listing.
+        destination (tuple): (latitude, longitude) of the user.
+        travel_type (str): Travel mode.
+
+    Returns:
+        str: Cache key.
+    """
+    return cell_cache_key(origin, destination_cell(destination), travel_type)
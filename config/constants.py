@@ -16,3 +16,126 @@ CITY_CENTERS = {
 }
 
 MAX_DISTANCE_KM = 50
+
+# Nearest-first listings queries search growing radii around the user until a page is
+# full; past NEAREST_RING_MAX_KM (beyond any region's listings) the whole region is read
+NEAREST_RING_START_KM = 1.0
+NEAREST_RING_GROWTH = 4
+NEAREST_RING_MAX_KM = 2 * MAX_DISTANCE_KM
+
+
+# Distance Matrix API request limits (per HTTP request)
+MAX_MATRIX_ORIGINS = 25
+MAX_MATRIX_ELEMENTS = 100
+
+# Commute time cache
+COMMUTE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+COMMUTE_CACHE_NEGATIVE_TTL_SECONDS = 24 * 3600   # "no route" answers
+COMMUTE_CACHE_MEMORY_SIZE = 20000
+COMMUTE_CACHE_MAX_ROWS = 2_000_000               # enforced by update_db after each load
+COMMUTE_CACHE_EVICT_INTERVAL_SECONDS = 600
+COMMUTE_CACHE_EVICT_BATCH_ROWS = 1000            # expired rows a request may delete
+COMMUTE_CACHE_CELL_DEGREES = 0.001  # ~110m destination cells
+
+# Geocoding cache
+GEOCODE_CACHE_TTL_SECONDS = 30 * 24 * 3600
+GEOCODE_NEGATIVE_TTL_SECONDS = 600
+GEOCODE_CACHE_MEMORY_SIZE = 5000
+
+# Commute-sorted queries: candidates are pulled nearest-first in batches until no
+# unseen listing can beat the requested page, or the candidate cap is reached
+COMMUTE_SORT_BATCH_SIZE = 50
+COMMUTE_SORT_MAX_CANDIDATES = 500
+
+# Upper bound on straight-line speed per travel mode (km/h), used to lower-bound commute times
+MAX_MODE_SPEED_KMH = {
+    "walking": 7,
+    "bicycling": 35,
+    "driving": 130,
+    "transit": 130
+}
+
+# Filtered listing counts, cached per (region, filters, dataset version)
+COUNT_CACHE_SIZE = 2000
+COUNT_CACHE_TTL_SECONDS = 24 * 3600
+DATASET_VERSION_CHECK_SECONDS = 30
+
+# Scraper scheduling
+SCRAPE_CONCURRENCY = 3
+SCRAPE_RATE_PER_SECOND = 0.5
+SCRAPE_MAX_RETRIES = 5
+SCRAPE_FULL_WINDOW_DAYS = 60
+SCRAPE_SCHEDULE_HOURS = 24      # scrape interval; an unfinished run older than this is not resumed
+
+# Database connections
+DB_POOL_RECYCLE_SECONDS = 1800   # Replace connections before server/NAT idle timeouts
+DB_POOL_TIMEOUT_SECONDS = 10
+DB_CONNECT_TIMEOUT_SECONDS = 5
+DB_KEEPALIVE_IDLE_SECONDS = 60
+# Connections an async engine keeps in "single" mode: a container serves one request at a
+# time, but that request overlaps queries (rows with count, prefetched candidate batches
+# with commute cache reads), which would otherwise queue behind a single connection
+DB_REQUEST_CONCURRENCY = 3
+
+# Shared HTTP session to the Google Maps APIs
+HTTP_MAX_CONNECTIONS = 20
+HTTP_KEEPALIVE_SECONDS = 60
+HTTP_TIMEOUT_SECONDS = 10
+
+# Response compression
+COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Full-response cache
+RESPONSE_CACHE_TTL_SECONDS = 900
+RESPONSE_CACHE_MEMORY_SIZE = 500
+RESPONSE_CACHE_MAX_ROWS = 100_000
+RESPONSE_CACHE_EVICT_INTERVAL_SECONDS = 600
+RESPONSE_CACHE_COORD_DECIMALS = 4  # ~11m; nearby geocodes of the same address share entries
+
+# Multi-destination requests
+MAX_DESTINATIONS = 5
+
+# Offline commute estimator: (intercept seconds, seconds per straight-line km) per mode,
+# used until a region and mode have been calibrated from observed API results
+COMMUTE_ESTIMATE_DEFAULTS = {
+    "walking": (0.0, 3600 * 1.25 / 5),
+    "bicycling": (60.0, 3600 * 1.3 / 15),
+    "driving": (240.0, 3600 * 1.35 / 40),
+    "transit": (600.0, 3600 * 1.4 / 20),
+}
+COMMUTE_ESTIMATE_MIN_SAMPLES = 50
+COMMUTE_ESTIMATE_MAX_SAMPLES = 500_000
+COMMUTE_ESTIMATE_HOLDOUT_FRACTION = 0.2
+COMMUTE_ESTIMATE_REFRESH_SECONDS = 600
+# Candidates kept fetched ahead of commute lookups, in batches, when ordering by commute
+COMMUTE_SORT_POOL_BATCHES = 2
+
+# Precomputed commute grid: update_db fills listing -> cell commutes for the cells of the
+# commute cache grid with the most requests, within MAX_DISTANCE_KM of a region center
+COMMUTE_GRID_MAX_CELLS = 20          # per region
+COMMUTE_GRID_MIN_DEMAND = 50         # requests to a cell within the demand window before it is precomputed
+COMMUTE_DEMAND_WINDOW_DAYS = 7
+COMMUTE_DEMAND_FLUSH_SECONDS = 60    # how often an API container writes its request counts
+COMMUTE_GRID_MAX_ELEMENTS = 50_000   # Distance Matrix elements per update run
+COMMUTE_GRID_CONCURRENCY = 8
+COMMUTE_GRID_REFRESH_SECONDS = 300   # how often the API Lambda re-reads covered cells
+
+# CloudWatch namespace of the API Lambda's per-request metrics (see lambda/tracing.py)
+TRACE_NAMESPACE = "FindOptimalCommuteRentals/Api"
+
+# Google Maps API governor: AIMD concurrency per API and container, retries with
+# jittered backoff, and Distance Matrix element budgets
+GOOGLE_MAX_CONCURRENCY = 16
+GOOGLE_MIN_CONCURRENCY = 1
+GOOGLE_MAX_RETRIES = 2
+GOOGLE_RETRY_BASE_SECONDS = 0.2
+GOOGLE_RETRY_MAX_SECONDS = 2.0
+# A commute sort may look up every capped candidate for every destination
+MATRIX_ELEMENTS_PER_REQUEST = COMMUTE_SORT_MAX_CANDIDATES * MAX_DESTINATIONS
+MATRIX_ELEMENTS_PER_MINUTE = 10_000   # per container
+
+# Listings loads: rows per chunk streamed through validation into COPY, which bounds
+# the updater's memory. The scraper writes Parquet row groups of the same size.
+LOAD_CHUNK_ROWS = 20_000
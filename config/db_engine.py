@@ -0,0 +1,96 @@
+"""
+db_engine.py
+------------
+Builds SQLAlchemy engines with a connection lifecycle suited to Lambda.
+
+Pool modes (DB_POOL_MODE):
+    single  Persistent connections for one request at a time, reused across warm
+            invocations: one for synchronous engines, and DB_REQUEST_CONCURRENCY for
+            async engines, whose requests run queries concurrently.
+    null    No pooling; every checkout opens a fresh connection. Use behind
+            pgbouncer or RDS Proxy, which do the pooling themselves.
+    pool    A capped pool of DB_POOL_SIZE connections with no overflow.
+
+Pooled connections are pinged on checkout, so a connection that went stale while
+the container was frozen is replaced transparently instead of failing the query.
+
+With the psycopg (v3) driver, repeated query shapes are prepared server-side
+after DB_PREPARE_THRESHOLD executions on a connection. Preparing is disabled in
+"null" mode, since transaction-pooling proxies do not keep prepared statements.
+psycopg deallocates prepared statements on ROLLBACK, so engines that should keep
+them run in autocommit: single statements need no BEGIN/ROLLBACK round trips,
+and releasing a connection to the pool leaves its prepared statements intact.
+"""
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
+from config.env import DB_POOL_MODE, DB_POOL_SIZE, DB_PREPARE_THRESHOLD
+from config.constants import (
+    DB_POOL_RECYCLE_SECONDS, DB_POOL_TIMEOUT_SECONDS, DB_CONNECT_TIMEOUT_SECONDS, DB_KEEPALIVE_IDLE_SECONDS,
+    DB_REQUEST_CONCURRENCY
+)
+
+POOL_MODES = ("single", "null", "pool")
+
+
+def _prepare_threshold(mode):
+    if mode == "null" or DB_PREPARE_THRESHOLD.lower() in ("off", "none", ""):
+        return None
+    return int(DB_PREPARE_THRESHOLD)
+
+
+def create_db_engine(db_url, mode=None, autocommit=False, asynchronous=False):
+    """
+    Create an engine for db_url with the configured pooling mode.
+
+    Args:
+        db_url (str): SQLAlchemy database URL.
+        mode (str): One of POOL_MODES. Defaults to DB_POOL_MODE.
+        autocommit (bool): Run every statement in its own implicit transaction.
+        asynchronous (bool): Build an AsyncEngine; db_url must name an async driver.
+
+    Returns:
+        Engine: The SQLAlchemy engine (AsyncEngine if asynchronous).
+
+    Raises:
+        ValueError: If the pooling mode is unknown.
+    """
+    mode = mode or DB_POOL_MODE
+    if mode not in POOL_MODES:
+        raise ValueError(f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, got '{mode}'")
+
+    # libpq settings: fail fast on unreachable hosts, and detect dead peers after a freeze
+    connect_args = {
+        "connect_timeout": DB_CONNECT_TIMEOUT_SECONDS,
+        "keepalives": 1,
+        "keepalives_idle": DB_KEEPALIVE_IDLE_SECONDS,
+    }
+    if db_url.startswith("postgresql+psycopg:"):
+        connect_args["prepare_threshold"] = _prepare_threshold(mode)
+
+    options = {"isolation_level": "AUTOCOMMIT"} if autocommit else {}
+    if asynchronous:
+        # Imported here so the synchronous updater never loads the asyncio extension
+        from sqlalchemy.ext.asyncio import create_async_engine
+        engine_factory, queue_pool = create_async_engine, AsyncAdaptedQueuePool
+    else:
+        engine_factory, queue_pool = create_engine, QueuePool
+
+    if mode == "null":
+        return engine_factory(db_url, poolclass=NullPool, connect_args=connect_args, **options)
+
+    if mode == "single":
+        pool_size = DB_REQUEST_CONCURRENCY if asynchronous else 1
+    else:
+        pool_size = DB_POOL_SIZE
+    return engine_factory(
+        db_url,
+        poolclass=queue_pool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+        **options
+    )
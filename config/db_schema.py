@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, String, Float, MetaData
+from sqlalchemy import Table, Column, Integer, String, Float, Date, DateTime, MetaData, Index, Text, Computed
 
 metadata = MetaData()
 
@@ -16,5 +16,123 @@ listings = Table(
     Column("property_url", String),
     Column("primary_photo", String),
     Column("latitude", Float),
-    Column("longitude", Float)
-)
\ No newline at end of file
+    Column("longitude", Float),
+    # Baths as filtered and sorted on, stored so an index can serve it
+    Column("total_baths", Float, Computed("full_baths + half_baths / 2.0", persisted=True)),
+    # Natural key for incremental loads; keeps ids stable across refreshes
+    Index("ux_listings_property_url", "property_url", unique=True),
+    # Serves region-scoped bounding-box scans for radius filters and nearest-first sorts
+    Index("ix_listings_region_lat_lon", "region", "latitude", "longitude"),
+    # Serve region-scoped range filters and (sort key, id) ordered pages and cursor seeks
+    Index("ix_listings_region_list_price", "region", "list_price", "id"),
+    Index("ix_listings_region_beds", "region", "beds", "id"),
+    Index("ix_listings_region_total_baths", "region", "total_baths", "id")
+)
+
+# Commute times returned by the Distance Matrix API, shared across Lambda containers;
+# NULL seconds caches a "no route" answer
+commute_cache = Table(
+    "commute_cache",
+    metadata,
+    Column("cache_key", String, primary_key=True),
+    Column("commute_seconds", Integer),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Index("ix_commute_cache_expires_at", "expires_at")
+)
+
+# Geocoded user addresses keyed by normalized address; NULL coordinates cache a failed lookup
+geocode_cache = Table(
+    "geocode_cache",
+    metadata,
+    Column("address_key", String, primary_key=True),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("expires_at", DateTime(timezone=True), nullable=False)
+)
+
+# Serialized API responses keyed by a hash of the normalized request and dataset version
+response_cache = Table(
+    "response_cache",
+    metadata,
+    Column("cache_key", String, primary_key=True),
+    Column("dataset_version", Integer, nullable=False),
+    Column("payload", Text, nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Index("ix_response_cache_expires_at", "expires_at")
+)
+
+# Commute estimator coefficients fitted offline from observed API results.
+# region '*' holds the per-mode fit across all regions.
+commute_estimates = Table(
+    "commute_estimates",
+    metadata,
+    Column("region", String, primary_key=True),
+    Column("mode", String, primary_key=True),
+    Column("intercept_seconds", Float, nullable=False),
+    Column("seconds_per_km", Float, nullable=False),
+    Column("samples", Integer, nullable=False),
+    Column("mae_seconds", Float),
+    Column("mape", Float),
+    Column("calibrated_at", DateTime(timezone=True), nullable=False)
+)
+
+# Commute times precomputed by update_db from every listing in a region to a busy
+# destination cell (commute cache grid); NULL seconds means no route was found
+commute_grid = Table(
+    "commute_grid",
+    metadata,
+    Column("cell_lat", Integer, primary_key=True),
+    Column("cell_lon", Integer, primary_key=True),
+    Column("mode", String, primary_key=True),
+    Column("listing_id", Integer, primary_key=True),
+    Column("latitude", Float, nullable=False),
+    Column("longitude", Float, nullable=False),
+    Column("commute_seconds", Integer)
+)
+
+# Destination cells whose commute_grid rows are complete for a region and dataset version
+commute_grid_cells = Table(
+    "commute_grid_cells",
+    metadata,
+    Column("region", String, primary_key=True),
+    Column("cell_lat", Integer, primary_key=True),
+    Column("cell_lon", Integer, primary_key=True),
+    Column("mode", String, primary_key=True),
+    Column("dataset_version", Integer, nullable=False),
+    Column("demand", Integer, nullable=False),
+    Column("listings", Integer, nullable=False),
+    Column("computed_at", DateTime(timezone=True), nullable=False)
+)
+
+# Commute requests per destination cell, travel mode and day, under the region nearest the
+# cell; counted by the API Lambda on every lookup (grid hits included), update_db precomputes
+# the busiest cells of each region from it
+commute_demand = Table(
+    "commute_demand",
+    metadata,
+    Column("region", String, primary_key=True),
+    Column("cell_lat", Integer, primary_key=True),
+    Column("cell_lon", Integer, primary_key=True),
+    Column("mode", String, primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("requests", Integer, nullable=False)
+)
+
+# Single-row table bumped by update_db on every load; used to invalidate derived caches
+dataset_version = Table(
+    "dataset_version",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False)
+)
+
+# Content hash of each region's last loaded artifact, so unchanged regions are skipped
+region_loads = Table(
+    "region_loads",
+    metadata,
+    Column("region", String, primary_key=True),
+    Column("sha256", String, nullable=False),
+    Column("rows", Integer, nullable=False),
+    Column("loaded_at", DateTime(timezone=True), nullable=False)
+)
@@ -0,0 +1,71 @@
+"""
+distance_matrix.py
+------------------
+Distance Matrix request parameters and response parsing, shared by the API
+Lambda (aiohttp, under its governor) and update_db's commute precompute
+(urllib, in threads). Only the transport differs between the two.
+"""
+
+from collections import namedtuple
+from config.env import GOOGLE_API_KEY, GOOGLE_MAPS_API_URL
+from config.commute_keys import TIME_DEPENDENT_MODES, default_arrival_timestamp
+
+DISTANCE_MATRIX_URL = f"{GOOGLE_MAPS_API_URL}/distancematrix/json"
+
+# Element statuses that are a definitive "no route" answer, safe to cache
+NO_ROUTE_STATUSES = {"ZERO_RESULTS", "NOT_FOUND"}
+
+# Result for a single origin-destination element of the matrix
+CommuteElement = namedtuple("CommuteElement", ["seconds", "status"])
+
+
+def format_coords(coords):
+    """Join (latitude, longitude) pairs into a Distance Matrix location list."""
+    return "|".join(f"{lat},{lon}" for lat, lon in coords)
+
+
+def matrix_params(destinations, travel_type):
+    """
+    Query parameters for requests to destinations in one travel mode; each
+    request adds its own "origins".
+
+    Args:
+        destinations (list): (latitude, longitude) of each destination.
+        travel_type (str): Travel mode.
+
+    Returns:
+        dict: Query parameters.
+    """
+    params = {
+        "destinations": format_coords(destinations),
+        "mode": travel_type,
+        "key": GOOGLE_API_KEY
+    }
+    # Required for transit mode
+    if travel_type in TIME_DEPENDENT_MODES:
+        params["arrival_time"] = default_arrival_timestamp()
+    return params
+
+
+def parse_matrix(data, n_origins, n_destinations):
+    """
+    Elements of a successful response. Row i corresponds to origin i and element j
+    to destination j; elements missing from the response get status "MISSING".
+
+    Returns:
+        list: One list of CommuteElement (seconds, status) per origin.
+    """
+    rows = data.get("rows", [])
+    matrix = []
+    for i in range(n_origins):
+        row_elements = rows[i].get("elements", []) if i < len(rows) else []
+        elements = []
+        for j in range(n_destinations):
+            element = row_elements[j] if j < len(row_elements) else {}
+            status = element.get("status", "MISSING")
+            if status == "OK":
+                elements.append(CommuteElement(element["duration"]["value"], status))
+            else:
+                elements.append(CommuteElement(None, status))
+        matrix.append(elements)
+    return matrix
@@ -1,8 +1,25 @@
 import os
 
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+GOOGLE_MAPS_API_URL = os.environ.get("GOOGLE_MAPS_API_URL", "https://maps.googleapis.com/maps/api")
 DB_USER = os.environ.get("username")
 DB_PASSWORD = os.environ.get("password")
 DB_HOST = os.environ.get("DB_HOST")
 DB_NAME = os.environ.get("DB_NAME")
-DB_PORT = os.environ.get("DB_PORT", "5432")
\ No newline at end of file
+DB_PORT = os.environ.get("DB_PORT", "5432")
+
+# Connection pooling: "single" keeps one persistent connection per container,
+# "null" opens a connection per checkout (for pgbouncer/RDS Proxy), "pool" keeps a capped pool
+DB_POOL_MODE = os.environ.get("DB_POOL_MODE", "single")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "3"))
+# Executions of a query shape on a connection before it is prepared server-side; "off" disables
+DB_PREPARE_THRESHOLD = os.environ.get("DB_PREPARE_THRESHOLD", "1")
+
+# Full-response cache: "off", "memory" (per container) or "shared" (memory, then Postgres)
+RESPONSE_CACHE_MODE = os.environ.get("RESPONSE_CACHE_MODE", "shared")
+
+# Listings queries: "sql" (Postgres) or "memory" (per-container NumPy columns, see lambda/memory_listings.py)
+LISTINGS_ENGINE = os.environ.get("LISTINGS_ENGINE", "sql")
+
+# Request tracing: "off", "metrics" (EMF log line per request) or "full" (also a Server-Timing header)
+TRACE_MODE = os.environ.get("TRACE_MODE", "metrics")
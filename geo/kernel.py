@@ -0,0 +1,134 @@
+"""
+kernel.py
+---------
+Vectorized geo math shared by the scraper and the API Lambda.
+
+Every function takes scalars or NumPy arrays (broadcast against each other) and
+returns arrays, so distances for a whole DataFrame are computed in one call
+instead of one geopy call per row.
+"""
+
+import numpy as np
+from config.constants import CITY_CENTERS
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is optional; fall back to a dense nearest-center search
+    # The API Lambda does not install scipy on purpose: it looks up one point per
+    # request, where the dense search is faster than a tree, and importing
+    # scipy.spatial would add about 0.4 s to every cold start
+    cKDTree = None
+
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS-84 ellipsoid, as used by geopy.distance.geodesic
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+KM_PER_DEGREE_LAT = 111.195
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometers on a sphere of radius EARTH_RADIUS_KM."""
+    return EARTH_RADIUS_KM * _central_angle(np.radians(lat1), np.radians(lon1),
+                                            np.radians(lat2), np.radians(lon2))
+
+
+def geodesic_km(lat1, lon1, lat2, lon2):
+    """
+    Distance in kilometers on the WGS-84 ellipsoid using Lambert's formula.
+
+    Agrees with geopy.distance.geodesic to within a few meters at metro scales,
+    which is far below the precision listings are displayed or filtered at.
+    """
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sigma = _central_angle(beta1, np.radians(lon1), beta2, np.radians(lon2))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        distance = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+    return np.where(sigma == 0, 0.0, distance)
+
+
+def bounding_boxes(lat, lon, radius_km):
+    """
+    Latitude/longitude boxes containing every point within radius_km of each (lat, lon).
+    Returns (min_lat, max_lat, min_lon, max_lon) arrays.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlon = np.minimum(radius_km / (KM_PER_DEGREE_LAT * np.maximum(np.cos(np.radians(lat)), 0.01)), 180)
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+class CenterIndex:
+    """
+    Nearest-center lookup over a fixed set of named points.
+
+    Centers are stored as unit vectors, where straight-line (chord) distance is
+    monotonic in great-circle distance, and queried through a k-d tree when scipy
+    is installed, so bulk lookups stay sublinear as centers are added. Without
+    scipy (as in the API Lambda) every center is compared. The returned distance
+    is the exact ellipsoidal distance to the chosen center.
+    """
+
+    def __init__(self, centers):
+        self.names = np.array(list(centers.keys()))
+        coords = np.array(list(centers.values()), dtype=float)
+        self.lats = coords[:, 0]
+        self.lons = coords[:, 1]
+        self._vectors = _unit_vectors(self.lats, self.lons)
+        self._tree = cKDTree(self._vectors) if cKDTree is not None else None
+
+    def nearest(self, lat, lon):
+        """
+        Nearest center for each point.
+
+        Returns:
+            (np.ndarray, np.ndarray): Center names and distances in kilometers.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        points = _unit_vectors(lat, lon)
+
+        # Take a few nearest on the sphere, then pick the closest on the ellipsoid
+        k = min(3, len(self.names))
+        if self._tree is not None:
+            _, candidates = self._tree.query(points, k=k)
+            candidates = candidates.reshape(len(points), k)
+        else:
+            chord = ((points[:, None, :] - self._vectors[None, :, :]) ** 2).sum(axis=2)
+            candidates = np.argsort(chord, axis=1)[:, :k]
+        distances = geodesic_km(lat[:, None], lon[:, None], self.lats[candidates], self.lons[candidates])
+        best = np.argmin(distances, axis=1)
+        rows = np.arange(len(points))
+        return self.names[candidates[rows, best]], distances[rows, best]
+
+
+_city_index = None
+
+
+def nearest_city_center(lat, lon):
+    """Nearest entry of CITY_CENTERS for each point, as (names, distances_km) arrays."""
+    global _city_index
+    if _city_index is None:
+        _city_index = CenterIndex(CITY_CENTERS)
+    return _city_index.nearest(lat, lon)
+
+
+def _central_angle(lat1, lon1, lat2, lon2):
+    """Central angle in radians between points given in radians (haversine form)."""
+    h = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def _unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
@@ -1,48 +1,123 @@
-import aiohttp
 import asyncio
-from config.env import GOOGLE_API_KEY
-from utils.time_utils import default_arrival_timestamp
+from config.constants import MAX_MATRIX_ORIGINS, MAX_MATRIX_ELEMENTS
+from config.distance_matrix import DISTANCE_MATRIX_URL, CommuteElement, format_coords, matrix_params, parse_matrix
+from runtime import get_http_session
+from governor import matrix_governor, reserve_elements
+from tracing import stage, count
 
-async def _fetch_commute_time(session, origin, params):
+def _chunk_origins(origins_coords, batch_size, n_destinations=1):
     """
-    Fetch commute time from Distance Matrix API for a single origin-destination pair.
-    Returns duration in seconds or None if unavailable.
+    Split origins into batches that fit within a single Distance Matrix request.
+    Respects both the per-request origin limit and the element limit
+    (origins x destinations).
     """
-    url = "https://maps.googleapis.com/maps/api/distancematrix/json"
+    size = max(1, min(batch_size, MAX_MATRIX_ORIGINS, MAX_MATRIX_ELEMENTS // n_destinations))
+    for start in range(0, len(origins_coords), size):
+        yield start, origins_coords[start:start + size]
+
+
+async def _send_matrix_request(session, url, params, n_origins):
+    """One Distance Matrix request; returns (status, data) as ApiGovernor.call expects."""
+    count("matrix_requests")
     try:
         async with session.get(url, params=params) as resp:
+            if resp.status == 429:
+                return "OVER_QUERY_LIMIT", {}
+            if resp.status >= 500:
+                return "UNKNOWN_ERROR", {}
             data = await resp.json()
-            element = data.get("rows", [])[0].get("elements", [])[0]
-            if element.get("status") == "OK":
-                return element["duration"]["value"]
-            return None
     except Exception as e:
-        print(f"[ERROR] Failed fetching commute for {origin}: {e}")
-        return None
+        print(f"[ERROR] Failed fetching commute for {n_origins} origins: {e}")
+        return "REQUEST_FAILED", {}
+    return data.get("status", "UNKNOWN_ERROR"), data
 
-async def compute_commute_times(origins_coords, destination_coord, travel_type="walking"):
+
+async def _fetch_commute_batch(session, origins, n_destinations, params):
     """
-    Compute commute durations from multiple origins to a single destination
-    using Distance Matrix API.
-    Returns a list of durations in seconds (None if unavailable).
+    Fetch commute times for a batch of origins to every destination in params.
+    Row i of the response corresponds to origins[i], element j to destination j.
+    Returns a list with one list of CommuteElement per origin.
+
+    The batch is only sent if its elements fit the governor's budgets, and transient
+    failures are retried under the governor's concurrency limit.
     """
+    if not reserve_elements(len(origins) * n_destinations):
+        return [[CommuteElement(None, "BUDGET_EXCEEDED")] * n_destinations for _ in origins]
 
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for origin in origins_coords:
-            params = {
-                "origins": f"{origin[0]},{origin[1]}",
-                "destinations": f"{destination_coord[0]},{destination_coord[1]}",
-                "mode": travel_type,
-                "key": GOOGLE_API_KEY
-            }
+    params = {**params, "origins": format_coords(origins)}
+    count("matrix_elements_requested", len(origins) * n_destinations)
+    top_status, data = await matrix_governor.call(
+        lambda: _send_matrix_request(session, DISTANCE_MATRIX_URL, params, len(origins))
+    )
 
-            # Required for transit mode
-            if travel_type in ["transit", "driving"]:
-                params["arrival_time"] = default_arrival_timestamp()
+    # Request-level failures (e.g. OVER_QUERY_LIMIT after retries) apply to every element
+    if top_status != "OK":
+        count("matrix_elements_failed", len(origins) * n_destinations)
+        return [[CommuteElement(None, top_status)] * n_destinations for _ in origins]
 
+    matrix = parse_matrix(data, len(origins), n_destinations)
+    count("matrix_elements_failed", sum(element.seconds is None for elements in matrix for element in elements))
+    return matrix
+
+
+async def compute_commute_matrix(origins_coords, destination_coords, travel_type="walking",
+                                 batch_size=MAX_MATRIX_ORIGINS):
+    """
+    Compute commute durations from multiple origins to multiple destinations in one
+    travel mode, packing the origins x destinations matrix into as few Distance
+    Matrix requests as the element limit allows.
+
+    Args:
+        origins_coords (list): (latitude, longitude) of each origin.
+        destination_coords (list): (latitude, longitude) of each destination; at most
+                                   MAX_MATRIX_ORIGINS, so they fit in a single request.
+        travel_type (str): Travel mode.
+        batch_size (int): Maximum origins per request.
+
+    Returns:
+        list: One list of CommuteElement (seconds, status) per origin, in destination order.
+    """
+    origins_coords = list(origins_coords)
+    if not origins_coords or not destination_coords:
+        return [[] for _ in origins_coords]
 
-            tasks.append(_fetch_commute_time(session, origin, params))
+    params = matrix_params(destination_coords, travel_type)
 
-        results = await asyncio.gather(*tasks)
-        return results
\ No newline at end of file
+    session = await get_http_session()
+    n_destinations = len(destination_coords)
+    batches = list(_chunk_origins(origins_coords, batch_size, n_destinations))
+    with stage("distance_matrix"):
+        responses = await asyncio.gather(*[
+            _fetch_commute_batch(session, batch, n_destinations, params) for _, batch in batches
+        ])
+
+    results = [None] * len(origins_coords)
+    for (start, batch), rows in zip(batches, responses):
+        results[start:start + len(batch)] = rows
+    return results
+
+
+async def compute_commute_elements(origins_coords, destination_coord, travel_type="walking",
+                                   batch_size=MAX_MATRIX_ORIGINS):
+    """
+    Compute commute durations from multiple origins to a single destination,
+    packing origins into as few Distance Matrix requests as allowed.
+    Returns a list of CommuteElement (seconds, status) in the same order as origins_coords.
+    """
+    matrix = await compute_commute_matrix(
+        origins_coords, [destination_coord], travel_type=travel_type, batch_size=batch_size
+    )
+    return [row[0] for row in matrix]
+
+
+async def compute_commute_times(origins_coords, destination_coord, travel_type="walking",
+                                batch_size=MAX_MATRIX_ORIGINS):
+    """
+    Compute commute durations from multiple origins to a single destination
+    using Distance Matrix API.
+    Returns a list of durations in seconds (None if unavailable).
+    """
+    elements = await compute_commute_elements(
+        origins_coords, destination_coord, travel_type=travel_type, batch_size=batch_size
+    )
+    return [element.seconds for element in elements]
@@ -1,9 +1,16 @@
 import json
+import math
+from pagination import decode_cursor
+from listing_row import OUTPUT_COLUMNS
+from config.constants import MAX_DESTINATIONS
 
 VALID_COMMUTE_TYPES = ['driving', 'bicycling', 'walking', 'transit']
+VALID_COMMUTE_SOURCES = ['api', 'estimate']
 VALID_SORT_BY = [
-    'list_price', 'beds', 'baths', 'distance', 'commute_seconds', 'commute_time'
+    'list_price', 'beds', 'baths', 'distance', 'commute_seconds', 'commute_time', 'commute_score'
 ]
+# Sorts on stored columns that may be NULL, so their cursors may carry a null key
+NULLABLE_SORT_BY = ['list_price', 'beds', 'baths']
 
 def check_inputs(event):
     """
@@ -21,16 +28,23 @@ def check_inputs(event):
     elif 'body' in event and isinstance(event['body'], dict):
         event = event['body']
 
-    # Ensures Required Fields are provided
-    if 'user_address' not in event or not isinstance(event['user_address'], str):
-        raise ValueError("user_address is required and must be a string")
-    user_address = event['user_address']
-
     # Gets and validates commute types
     commute_type = event.get('commute_type', 'walking').lower()
     if commute_type not in VALID_COMMUTE_TYPES:
         raise ValueError(f"commute_type must be one of {VALID_COMMUTE_TYPES}")
 
+    # Ensures Required Fields are provided: one user_address, or a list of destinations
+    if 'destinations' in event:
+        if 'user_address' in event:
+            raise ValueError("provide either user_address or destinations, not both")
+        destinations = check_destinations(event['destinations'], commute_type)
+    else:
+        if 'user_address' not in event or not isinstance(event['user_address'], str):
+            raise ValueError("user_address is required and must be a string")
+        destinations = [{"address": event['user_address'], "commute_type": commute_type, "weight": 1.0}]
+    user_address = destinations[0]['address']
+    commute_type = destinations[0]['commute_type']
+
     # Gets and validates Pagination Info
     try:
         page = int(event.get('page', 1))
@@ -52,6 +66,15 @@ def check_inputs(event):
     if not isinstance(filters, dict):
         raise ValueError("filters must be a dictionary")
 
+    # Gets and validates the optional search radius
+    if 'max_distance_km' in filters:
+        try:
+            filters['max_distance_km'] = float(filters['max_distance_km'])
+        except (TypeError, ValueError):
+            raise ValueError("max_distance_km must be a number")
+        if not filters['max_distance_km'] > 0:
+            raise ValueError("max_distance_km must be > 0")
+
     # Gets and validates sort_by
     sort_by = event.get('sort_by', 'list_price')
     if sort_by not in VALID_SORT_BY:
@@ -62,13 +85,79 @@ def check_inputs(event):
     if not isinstance(ascending, bool):
         raise ValueError("ascending must be a boolean")
 
+    # Gets and validates the optional pagination cursor
+    cursor = event.get('cursor')
+    if cursor is not None:
+        if not isinstance(cursor, str):
+            raise ValueError("cursor must be a string")
+        cursor = decode_cursor(cursor)
+        if cursor['sort_by'] != sort_by or cursor['ascending'] != ascending:
+            raise ValueError("cursor does not match sort_by and ascending")
+        if cursor['last_key'] is None and sort_by not in NULLABLE_SORT_BY:
+            raise ValueError("cursor is invalid")
+
+    # Gets and validates commute_source: Distance Matrix lookups, or offline estimates only
+    commute_source = event.get('commute_source', 'api')
+    if commute_source not in VALID_COMMUTE_SOURCES:
+        raise ValueError(f"commute_source must be one of {VALID_COMMUTE_SOURCES}")
+
+    # Gets and validates the optional field projection (a list or comma-separated string)
+    fields = event.get('fields', OUTPUT_COLUMNS)
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if not isinstance(fields, list) or not fields or not all(isinstance(field, str) for field in fields):
+        raise ValueError("fields must be a non-empty list of field names")
+    unknown = [field for field in fields if field not in OUTPUT_COLUMNS]
+    if unknown:
+        raise ValueError(f"fields must be chosen from {OUTPUT_COLUMNS}")
+    fields = list(dict.fromkeys(fields))
+
     # Ensures all fields are included in the returned dictionary
     return {
         "user_address": user_address,
         "commute_type": commute_type,
+        "destinations": destinations,
         "page": page,
         "page_size": page_size,
         "filters": filters,
         "sort_by": sort_by,
         "ascending": ascending,
-    }
\ No newline at end of file
+        "cursor": cursor,
+        "fields": fields,
+        "commute_source": commute_source,
+    }
+
+def check_destinations(destinations, default_commute_type):
+    """
+    Validates a list of commute destinations.
+
+    Parameters:
+        destinations (list): Dicts with 'address' and optional 'commute_type' and 'weight'.
+        default_commute_type (str): Travel mode for destinations that do not set one.
+
+    Returns:
+        list: Destinations with 'address', 'commute_type' and 'weight' filled in.
+    """
+    if not isinstance(destinations, list) or not 1 <= len(destinations) <= MAX_DESTINATIONS:
+        raise ValueError(f"destinations must be a list of 1 to {MAX_DESTINATIONS} destinations")
+
+    checked = []
+    for destination in destinations:
+        if not isinstance(destination, dict):
+            raise ValueError("each destination must be a dictionary")
+        if not isinstance(destination.get('address'), str):
+            raise ValueError("each destination needs an address string")
+
+        commute_type = destination.get('commute_type', default_commute_type)
+        if not isinstance(commute_type, str) or commute_type.lower() not in VALID_COMMUTE_TYPES:
+            raise ValueError(f"destination commute_type must be one of {VALID_COMMUTE_TYPES}")
+
+        try:
+            weight = float(destination.get('weight', 1.0))
+        except (TypeError, ValueError):
+            raise ValueError("destination weight must be a number")
+        if not (weight > 0 and math.isfinite(weight)):
+            raise ValueError("destination weight must be a finite number > 0")
+
+        checked.append({"address": destination['address'], "commute_type": commute_type.lower(), "weight": weight})
+    return checked
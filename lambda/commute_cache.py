@@ -0,0 +1,239 @@
+"""
+commute_cache.py
+----------------
+Two-tier cache in front of the Distance Matrix API: an in-container LRU and a
+Postgres table shared by all containers. Only misses are sent to the API.
+
+"No route" answers are cached too, as NULL seconds with a shorter TTL, so unreachable
+pairs are not re-billed on every request. Misses the API could not answer (failures
+after retries, or over budget) come back as UNAVAILABLE, distinct from None for
+"no route", and are not cached.
+
+Requests only delete a bounded batch of expired rows; the table's size cap is
+enforced by update_db (see update_db/cache_maintenance.py).
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from config.db_schema import commute_cache
+from config.constants import (
+    COMMUTE_CACHE_TTL_SECONDS, COMMUTE_CACHE_NEGATIVE_TTL_SECONDS, COMMUTE_CACHE_MEMORY_SIZE,
+    COMMUTE_CACHE_EVICT_INTERVAL_SECONDS, COMMUTE_CACHE_EVICT_BATCH_ROWS
+)
+from config.commute_keys import commute_cache_key
+from config.distance_matrix import NO_ROUTE_STATUSES
+from db import get_engine
+from calculate_commute_times import compute_commute_matrix
+from governor import UNAVAILABLE_STATUSES
+from utils.ttl_cache import TTLCache
+from tracing import count
+
+# Result cell for a lookup the API could not answer right now
+UNAVAILABLE = "unavailable"
+# Memory cache lookups tell a miss from a cached "no route" (None)
+_MISSING = object()
+
+_memory_cache = TTLCache(COMMUTE_CACHE_MEMORY_SIZE, COMMUTE_CACHE_TTL_SECONDS)
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "db_errors": 0}
+_table_ready = False
+_last_eviction = 0.0
+
+
+def get_cache_stats():
+    """Return a copy of the hit/miss counters for this container."""
+    stats = dict(_stats)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+    stats["memory_entries"] = len(_memory_cache)
+    return stats
+
+
+async def _ensure_table():
+    global _table_ready
+    if not _table_ready:
+        async with get_engine().begin() as conn:
+            await conn.run_sync(commute_cache.create, checkfirst=True)
+            # Tables created before "no route" entries were cached have NOT NULL seconds
+            not_null = (await conn.execute(text(
+                "SELECT is_nullable = 'NO' FROM information_schema.columns "
+                "WHERE table_name = 'commute_cache' AND column_name = 'commute_seconds'"
+            ))).scalar()
+            if not_null:
+                await conn.execute(text("ALTER TABLE commute_cache ALTER COLUMN commute_seconds DROP NOT NULL"))
+        _table_ready = True
+
+
+async def _read_db(keys):
+    """Fetch unexpired entries for keys from the shared cache table."""
+    if not keys:
+        return {}
+    try:
+        await _ensure_table()
+        query = select(commute_cache.c.cache_key, commute_cache.c.commute_seconds).where(
+            commute_cache.c.cache_key.in_(keys),
+            commute_cache.c.expires_at > func.now()
+        )
+        async with get_engine().connect() as conn:
+            return {row.cache_key: row.commute_seconds for row in await conn.execute(query)}
+    except Exception as e:
+        _stats["db_errors"] += 1
+        print(f"[ERROR] Failed reading commute cache: {e}")
+        return {}
+
+
+async def _evict_expired(conn):
+    """
+    Drop at most COMMUTE_CACHE_EVICT_BATCH_ROWS expired rows, found through the
+    expires_at index, so the delete stays cheap on the request path.
+    """
+    global _last_eviction
+    now = time.monotonic()
+    if now - _last_eviction < COMMUTE_CACHE_EVICT_INTERVAL_SECONDS:
+        return
+    _last_eviction = now
+
+    expired = (
+        select(commute_cache.c.cache_key)
+        .where(commute_cache.c.expires_at <= func.now())
+        .order_by(commute_cache.c.expires_at)
+        .limit(COMMUTE_CACHE_EVICT_BATCH_ROWS)
+    )
+    await conn.execute(delete(commute_cache).where(commute_cache.c.cache_key.in_(expired.scalar_subquery())))
+
+
+def _ttl_seconds(seconds):
+    """Time to live of an entry: "no route" answers expire sooner."""
+    return COMMUTE_CACHE_NEGATIVE_TTL_SECONDS if seconds is None else COMMUTE_CACHE_TTL_SECONDS
+
+
+async def _write_db(entries):
+    """Upsert fresh entries (seconds, or None for no route) into the shared cache table."""
+    if not entries:
+        return
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"cache_key": key, "commute_seconds": seconds, "expires_at": now + timedelta(seconds=_ttl_seconds(seconds))}
+        for key, seconds in entries.items()
+    ]
+    stmt = insert(commute_cache).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[commute_cache.c.cache_key],
+        set_={"commute_seconds": stmt.excluded.commute_seconds, "expires_at": stmt.excluded.expires_at}
+    )
+    try:
+        await _ensure_table()
+        async with get_engine().begin() as conn:
+            await conn.execute(stmt)
+            await _evict_expired(conn)
+    except Exception as e:
+        _stats["db_errors"] += 1
+        print(f"[ERROR] Failed writing commute cache: {e}")
+
+
+async def get_commute_matrix(origins_coords, destinations):
+    """
+    Look up commute times from each origin to each destination, checking the
+    in-container cache, then the shared table, and calling the Distance Matrix
+    API only for misses. Misses are fetched as one matrix per travel mode.
+
+    Args:
+        origins_coords (list): (latitude, longitude) of each listing.
+        destinations (list): (coords, travel_type) pairs, where coords is the
+                             (latitude, longitude) of a destination.
+
+    Returns:
+        list: One list per origin of durations in seconds (None if there is no route,
+              UNAVAILABLE if the API could not answer), in destination order.
+    """
+    keys = [
+        [commute_cache_key(origin, coords, travel_type) for coords, travel_type in destinations]
+        for origin in origins_coords
+    ]
+    results = [[None] * len(destinations) for _ in origins_coords]
+
+    # Tier 1: in-container LRU
+    pending = {}
+    for i, row_keys in enumerate(keys):
+        for j, key in enumerate(row_keys):
+            seconds = _memory_cache.get(key, _MISSING)
+            if seconds is not _MISSING:
+                results[i][j] = seconds
+                _stats["memory_hits"] += 1
+            else:
+                pending.setdefault(key, []).append((i, j))
+
+    count("commute_cache_memory_hits", len(origins_coords) * len(destinations) - sum(len(c) for c in pending.values()))
+
+    # Tier 2: shared Postgres table
+    for key, seconds in (await _read_db(list(pending))).items():
+        _memory_cache.set(key, seconds, ttl_seconds=_ttl_seconds(seconds))
+        cells = pending.pop(key)
+        _stats["db_hits"] += len(cells)
+        count("commute_cache_db_hits", len(cells))
+        for i, j in cells:
+            results[i][j] = seconds
+
+    if not pending:
+        return results
+    misses = sum(len(cells) for cells in pending.values())
+    _stats["misses"] += misses
+    count("commute_cache_misses", misses)
+
+    # Misses go to the API: per travel mode, the distinct missing origins x missing destinations
+    by_mode = {}
+    for key, cells in pending.items():
+        i, j = cells[0]
+        origin_rows, destination_columns = by_mode.setdefault(destinations[j][1], ({}, {}))
+        origin_rows.setdefault(keys[i][j].split("|", 1)[0], i)
+        destination_columns.setdefault(j, None)
+
+    modes = list(by_mode)
+    fetched = await asyncio.gather(*[
+        compute_commute_matrix(
+            [origins_coords[i] for i in by_mode[mode][0].values()],
+            [destinations[j][0] for j in by_mode[mode][1]],
+            travel_type=mode
+        )
+        for mode in modes
+    ])
+
+    new_entries = {}
+    for mode, matrix in zip(modes, fetched):
+        origin_rows, destination_columns = by_mode[mode]
+        for i, elements in zip(origin_rows.values(), matrix):
+            for j, element in zip(destination_columns, elements):
+                key = keys[i][j]
+                if key not in pending:
+                    continue
+                if element.seconds is None and element.status not in NO_ROUTE_STATUSES:
+                    if element.status in UNAVAILABLE_STATUSES:
+                        for cell_i, cell_j in pending[key]:
+                            results[cell_i][cell_j] = UNAVAILABLE
+                    continue
+                new_entries[key] = element.seconds
+                _memory_cache.set(key, element.seconds, ttl_seconds=_ttl_seconds(element.seconds))
+                for cell_i, cell_j in pending[key]:
+                    results[cell_i][cell_j] = element.seconds
+
+    await _write_db(new_entries)
+    return results
+
+
+async def get_commute_times(origins_coords, destination_coord, travel_type="walking"):
+    """
+    Look up commute times for each origin to a single destination through the cache.
+
+    Args:
+        origins_coords (list): (latitude, longitude) of each listing.
+        destination_coord (tuple): (latitude, longitude) of the user.
+        travel_type (str): Travel mode.
+
+    Returns:
+        list: Durations in seconds (None if there is no route, UNAVAILABLE if the API could
+              not answer), in the same order as origins_coords.
+    """
+    matrix = await get_commute_matrix(origins_coords, [(destination_coord, travel_type)])
+    return [row[0] for row in matrix]
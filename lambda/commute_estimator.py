@@ -0,0 +1,109 @@
+"""
+commute_estimator.py
+--------------------
+Offline commute estimates: seconds = intercept + seconds_per_km * straight-line
+distance, with coefficients per region and travel mode fitted by update_db from
+previously observed API results (see update_db/commute_calibration.py).
+
+Estimates cost no API calls. They are returned directly for commute_source
+"estimate", used to decide which candidates get real commute lookups first, and
+stand in for lookups the API could not answer (see governor).
+"""
+
+import time
+import numpy as np
+from sqlalchemy import select
+from config.db_schema import commute_estimates
+from config.constants import COMMUTE_ESTIMATE_DEFAULTS, COMMUTE_ESTIMATE_REFRESH_SECONDS
+from db import get_engine
+from commute_cache import UNAVAILABLE
+from governor import mark_degraded
+from utils.distance_utils import geodesic_distances
+from tracing import count
+
+ALL_REGIONS = "*"
+
+_state = {"coefficients": {}, "loaded_at": None}
+
+
+async def _load_coefficients():
+    """Return {(region, mode): (intercept, seconds_per_km)}, re-read at most every refresh interval."""
+    now = time.monotonic()
+    if _state["loaded_at"] is not None and now - _state["loaded_at"] < COMMUTE_ESTIMATE_REFRESH_SECONDS:
+        return _state["coefficients"]
+    try:
+        query = select(
+            commute_estimates.c.region, commute_estimates.c.mode,
+            commute_estimates.c.intercept_seconds, commute_estimates.c.seconds_per_km
+        )
+        async with get_engine().connect() as conn:
+            rows = (await conn.execute(query)).all()
+        _state["coefficients"] = {(row.region, row.mode): (row.intercept_seconds, row.seconds_per_km) for row in rows}
+    except Exception as e:
+        # No calibration yet (or the table is missing): the defaults apply
+        print(f"[ERROR] Failed reading commute estimates: {e}")
+    _state["loaded_at"] = now
+    return _state["coefficients"]
+
+
+def _coefficients_for(coefficients, region, travel_type):
+    """Regional fit, else the mode's fit across all regions, else the defaults."""
+    return (
+        coefficients.get((region, travel_type))
+        or coefficients.get((ALL_REGIONS, travel_type))
+        or COMMUTE_ESTIMATE_DEFAULTS[travel_type]
+    )
+
+
+async def estimate_commute_matrix(origins_coords, destinations, region):
+    """
+    Estimate commute times from each origin to each destination.
+
+    Args:
+        origins_coords (list): (latitude, longitude) of each listing.
+        destinations (list): (coords, travel_type) pairs.
+        region (str): Region whose calibration applies.
+
+    Returns:
+        list: One list per origin of estimated seconds, in destination order.
+    """
+    if not origins_coords:
+        return []
+    coefficients = await _load_coefficients()
+    count("commute_estimates", len(origins_coords) * len(destinations))
+    lats = np.array([origin[0] for origin in origins_coords], dtype=float)
+    lons = np.array([origin[1] for origin in origins_coords], dtype=float)
+
+    columns = []
+    for coords, travel_type in destinations:
+        intercept, seconds_per_km = _coefficients_for(coefficients, region, travel_type)
+        columns.append(intercept + seconds_per_km * geodesic_distances(coords[0], coords[1], lats, lons))
+    return np.rint(np.column_stack(columns)).astype(int).tolist()
+
+
+async def fill_unavailable(matrix, origins_coords, destinations, region):
+    """
+    Replace UNAVAILABLE cells of a looked-up commute matrix with estimates.
+
+    Args:
+        matrix (list): One list of seconds per origin, from a commute lookup.
+        origins_coords (list): (latitude, longitude) of each listing.
+        destinations (list): (coords, travel_type) pairs.
+        region (str): Region whose calibration applies.
+
+    Returns:
+        (list, list): The matrix with estimates filled in, and per origin whether any
+                      of its times is an estimate.
+    """
+    rows = [i for i, times in enumerate(matrix) if UNAVAILABLE in times]
+    if not rows:
+        return matrix, [False] * len(matrix)
+    mark_degraded()
+    count("commute_fallback_estimates", sum(matrix[i].count(UNAVAILABLE) for i in rows))
+    estimated = await estimate_commute_matrix([origins_coords[i] for i in rows], destinations, region)
+    matrix = list(matrix)
+    flags = [False] * len(matrix)
+    for i, estimates in zip(rows, estimated):
+        matrix[i] = [e if seconds == UNAVAILABLE else seconds for seconds, e in zip(matrix[i], estimates)]
+        flags[i] = True
+    return matrix, flags
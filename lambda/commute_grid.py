@@ -0,0 +1,124 @@
+"""
+commute_grid.py
+---------------
+Destination cells whose commutes update_db has precomputed for every listing in
+a region (see update_db/commute_precompute.py). When every destination of a request
+falls in such a cell, listings are joined to the stored commutes and sorted on
+them in SQL, with no Distance Matrix calls.
+
+Every request also counts toward its destination cells' demand in commute_demand,
+under the region the cell belongs to, which is what update_db ranks cells by. Grid and response cache hits count too,
+so a precomputed cell keeps its demand even though it no longer fills the commute
+cache. Counts are batched per container and written at most every
+COMMUTE_DEMAND_FLUSH_SECONDS; a container retired between writes loses only its
+latest counts.
+"""
+
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from config.db_schema import commute_grid_cells, commute_demand
+from config.constants import MAX_DISTANCE_KM, COMMUTE_GRID_REFRESH_SECONDS, COMMUTE_DEMAND_FLUSH_SECONDS
+from config.commute_keys import cell_center, destination_cell
+from geo.kernel import nearest_city_center
+from db import get_engine, get_dataset_version
+from utils.ttl_cache import TTLCache
+
+_covered_cells = TTLCache(64, COMMUTE_GRID_REFRESH_SECONDS)
+_pending_demand = Counter()
+_demand_table_ready = False
+_last_demand_flush = 0.0
+
+
+async def _load_covered_cells(region, version):
+    """Return the set of (cell_lat, cell_lon, mode) complete for a region and dataset version."""
+    covered = _covered_cells.get((region, version))
+    if covered is not None:
+        return covered
+    try:
+        query = select(commute_grid_cells.c.cell_lat, commute_grid_cells.c.cell_lon, commute_grid_cells.c.mode).where(
+            commute_grid_cells.c.region == region,
+            commute_grid_cells.c.dataset_version == version
+        )
+        async with get_engine().connect() as conn:
+            covered = {tuple(row) for row in await conn.execute(query)}
+    except Exception as e:
+        # No precompute yet (or the table is missing): requests use the commute cache
+        print(f"[ERROR] Failed reading commute grid cells: {e}")
+        covered = set()
+    _covered_cells.set((region, version), covered)
+    return covered
+
+
+async def _flush_demand():
+    """Add this container's request counts to commute_demand, at most every COMMUTE_DEMAND_FLUSH_SECONDS."""
+    global _demand_table_ready, _last_demand_flush
+    now = time.monotonic()
+    if not _pending_demand or now - _last_demand_flush < COMMUTE_DEMAND_FLUSH_SECONDS:
+        return
+    _last_demand_flush = now
+
+    rows = [
+        {"region": region, "cell_lat": cell_lat, "cell_lon": cell_lon, "mode": mode, "day": day, "requests": requests}
+        for (region, cell_lat, cell_lon, mode, day), requests in _pending_demand.items()
+    ]
+    _pending_demand.clear()
+    stmt = insert(commute_demand).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            commute_demand.c.region, commute_demand.c.cell_lat, commute_demand.c.cell_lon,
+            commute_demand.c.mode, commute_demand.c.day
+        ],
+        set_={"requests": commute_demand.c.requests + stmt.excluded.requests}
+    )
+    try:
+        async with get_engine().begin() as conn:
+            if not _demand_table_ready:
+                await conn.run_sync(commute_demand.create, checkfirst=True)
+                _demand_table_ready = True
+            await conn.execute(stmt)
+    except Exception as e:
+        print(f"[ERROR] Failed writing commute demand: {e}")
+
+
+async def record_demand(destinations):
+    """
+    Count a request toward the demand of each destination's cell and travel mode,
+    under the city center nearest the cell. Cells farther than MAX_DISTANCE_KM from
+    every center belong to no region and are not counted.
+
+    Args:
+        destinations (list): Destination tuples.
+    """
+    today = datetime.now(timezone.utc).date()
+    cells = list({destination_cell(d.coords) + (d.commute_type,) for d in destinations})
+    centers = [cell_center(cell[:2]) for cell in cells]
+    regions, distances = nearest_city_center([c[0] for c in centers], [c[1] for c in centers])
+    for cell, region, distance in zip(cells, regions.tolist(), distances.tolist()):
+        if distance <= MAX_DISTANCE_KM:
+            _pending_demand[(region,) + cell + (today,)] += 1
+    await _flush_demand()
+
+
+async def get_commute_grid(destinations, region):
+    """
+    Precomputed cells for a request's destinations.
+
+    Args:
+        destinations (list): Destination tuples.
+        region (str): Closest supported city.
+
+    Returns:
+        list: (cell_lat, cell_lon, mode, weight) per destination, or None unless every
+              destination's cell and travel mode is covered.
+    """
+    covered = await _load_covered_cells(region, await get_dataset_version())
+    grid = []
+    for destination in destinations:
+        cell = destination_cell(destination.coords) + (destination.commute_type,)
+        if cell not in covered:
+            return None
+        grid.append(cell + (destination.weight,))
+    return grid
@@ -0,0 +1,211 @@
+"""
+commute_sort.py
+---------------
+Globally consistent ordering by commute time without calling the API for a whole region.
+
+Candidates are pulled in batches in distance order, nearest-first for shortest-first
+orderings and farthest-first for longest-first ones, and their commute times computed
+(through the commute cache). A listing at straight-line distance d cannot be
+reached faster than d / MAX_MODE_SPEED_KMH[mode], so once the requested page is
+filled with commutes no longer than that bound for the next unseen candidate,
+no remaining listing can displace it.
+
+With several destinations, a candidate at distance d from the primary destination
+is at least d - D_j from destination j (D_j being the primary-to-j distance), which
+bounds the weighted combined score the same way.
+
+Fetched candidates wait in a small pool and are looked up in order of their offline
+estimate (see commute_estimator), best first. Stopping then requires the page to beat
+the bound of every pooled candidate as well as the farthest fetched distance. The next
+candidate batch is fetched while commutes are looked up.
+
+At most COMMUTE_SORT_MAX_CANDIDATES listings are looked up per request. When the cap
+is reached before the page is settled, the ordering covers only the candidate pool:
+the nearest COMMUTE_SORT_MAX_CANDIDATES listings for shortest-first, or the farthest
+for longest-first (which has no bound, so it always ranks the whole capped pool of a
+large region). The page is then marked truncated and the total is the number ranked in
+the pool, so pages beyond it are empty rather than silently misordered.
+"""
+
+import asyncio
+from config.constants import (
+    COMMUTE_SORT_BATCH_SIZE, COMMUTE_SORT_MAX_CANDIDATES, COMMUTE_SORT_POOL_BATCHES, MAX_MODE_SPEED_KMH
+)
+from db import get_listings, get_dataset_version, check_cursor_version
+from commute_cache import get_commute_matrix
+from commute_estimator import estimate_commute_matrix, fill_unavailable
+from destinations import apply_commute_times, combined_score
+from utils.distance_utils import geodesic_distance
+from tracing import stage, count
+
+
+def commute_lower_bound_seconds(distance_km, travel_type):
+    """Smallest possible commute time for a straight-line distance and travel mode."""
+    return distance_km / MAX_MODE_SPEED_KMH[travel_type] * 3600
+
+
+def score_lower_bound(distance_km, destinations, offsets_km):
+    """
+    Smallest possible combined score (minutes) for a listing distance_km from the primary destination.
+
+    Args:
+        distance_km (float): Straight-line distance from the primary destination.
+        destinations (list): Destination tuples.
+        offsets_km (list): Distance from the primary destination to each destination.
+    """
+    total_weight = sum(d.weight for d in destinations)
+    bound = sum(
+        d.weight * commute_lower_bound_seconds(max(0.0, distance_km - offset), d.commute_type)
+        for d, offset in zip(destinations, offsets_km)
+    )
+    return bound / total_weight / 60
+
+
+def _rank(ranked, ascending, attribute):
+    """Order commute candidates by (attribute, id) in the requested direction."""
+    return sorted(ranked, key=lambda row: (getattr(row, attribute), row.id), reverse=not ascending)
+
+
+def _after_cursor(rows, cursor, ascending, attribute):
+    """Ranked rows that come after the cursor position."""
+    if cursor is None:
+        return rows
+    last = (cursor['last_key'], cursor['last_id'])
+    if ascending:
+        return [row for row in rows if (getattr(row, attribute), row.id) > last]
+    return [row for row in rows if (getattr(row, attribute), row.id) < last]
+
+
+def _ranking_value(times, destinations, attribute):
+    """The value rows are ordered by, from per-destination commute seconds."""
+    if attribute == 'commute_score':
+        return combined_score(times, destinations)
+    return times[0]
+
+
+async def get_listings_by_commute(destinations, closest_city, filters, ascending, page, page_size,
+                                  sort_by='commute_seconds', cursor=None, lookup=None):
+    """
+    Fetch one page of listings ordered by commute time across the whole filtered region.
+
+    Candidates are fetched nearest-first into a pool and looked up in order of their
+    offline estimate, so the listings likely to make the page are paid for first.
+
+    Args:
+        destinations (list): Destination tuples; the first is the primary destination.
+        closest_city (str): Closest supported city.
+        filters (dict): Filter parameters for listings.
+        ascending (bool): Sort order.
+        page (int): Current page.
+        page_size (int): Listings per page.
+        sort_by (str): 'commute_score' orders by the combined score; otherwise by the
+                       commute to the primary destination.
+        cursor (dict): Decoded cursor from the previous page; takes precedence over page.
+        lookup (callable): Async lookup(origins_coords, destinations) returning a commute matrix.
+                           Defaults to the cached Distance Matrix lookup.
+
+    Returns:
+        (list, int, bool, bool): ListingRow objects for the page with the commute fields and
+                                 'sort_key' populated; the total number of listings matching the
+                                 filters, or of listings ranked in the candidate pool if truncated;
+                                 whether the ordering was truncated to the candidate pool; and
+                                 whether ranked listings remain after the page.
+    """
+    lookup = lookup or get_commute_matrix
+    user_coords = destinations[0].coords
+    pairs = [(d.coords, d.commute_type) for d in destinations]
+    attribute = 'commute_score' if sort_by == 'commute_score' else 'commute_seconds'
+    offsets_km = [geodesic_distance(*user_coords, *d.coords) for d in destinations]
+
+    def lower_bound(distance_km):
+        if attribute == 'commute_score':
+            return score_lower_bound(distance_km, destinations, offsets_km)
+        return commute_lower_bound_seconds(distance_km, destinations[0].commute_type)
+
+    await check_cursor_version(cursor)
+    skip = 0 if cursor is not None else (page - 1) * page_size
+    needed = skip + page_size
+    version = await get_dataset_version()
+    ranked = []
+    pool = []
+    estimates = {}
+    total = 0
+    candidates_seen = 0
+    fetched_edge_km = 0.0
+    settled = False
+
+    def fetch_batch(batch_cursor):
+        return asyncio.ensure_future(get_listings(
+            user_coords[0], user_coords[1], closest_city, filters,
+            'distance', ascending, 1, COMMUTE_SORT_BATCH_SIZE, cursor=batch_cursor
+        ))
+
+    # Candidates come in the requested direction: longest-first pools the farthest listings,
+    # the likeliest longest commutes. It has no distance bound, so it ranks the whole capped pool
+    next_batch = fetch_batch(None)
+    while True:
+        # Top up the pool: wait for a batch only when the pool is short, otherwise take one
+        # that has already arrived, so fetching overlaps the commute lookups
+        while next_batch is not None and len(pool) < COMMUTE_SORT_POOL_BATCHES * COMMUTE_SORT_BATCH_SIZE:
+            if pool and len(pool) >= COMMUTE_SORT_BATCH_SIZE and not next_batch.done():
+                break
+            batch, total = await next_batch
+            next_batch = None
+            exhausted = len(batch) < COMMUTE_SORT_BATCH_SIZE
+            batch = batch[:COMMUTE_SORT_MAX_CANDIDATES - candidates_seen]
+            if not batch:
+                break
+            candidates_seen += len(batch)
+            count("commute_sort_candidates", len(batch))
+            fetched_edge_km = batch[-1].distance_kilometers
+            if not exhausted and candidates_seen < COMMUTE_SORT_MAX_CANDIDATES:
+                batch_cursor = {"last_key": float(batch[-1].sort_key), "last_id": batch[-1].id, "version": version}
+                next_batch = fetch_batch(batch_cursor)
+
+            estimated = await estimate_commute_matrix([row.coords for row in batch], pairs, closest_city)
+            for row, times in zip(batch, estimated):
+                estimates[row.id] = _ranking_value(times, destinations, attribute)
+            pool.extend(batch)
+            pool.sort(key=lambda row: estimates[row.id], reverse=not ascending)
+
+        if not pool:
+            break
+
+        # Look up the most promising candidates by estimate
+        chunk, pool = pool[:COMMUTE_SORT_BATCH_SIZE], pool[COMMUTE_SORT_BATCH_SIZE:]
+        origins = [row.coords for row in chunk]
+        with stage("commute"):
+            commute_matrix = await lookup(origins, pairs)
+        commute_matrix, estimated = await fill_unavailable(commute_matrix, origins, pairs, closest_city)
+        for row, times, is_estimate in zip(chunk, commute_matrix, estimated):
+            if apply_commute_times(row, destinations, times, is_estimate):
+                ranked.append(row)
+
+        if not ascending:
+            continue
+        remaining = _after_cursor(_rank(ranked, ascending, attribute), cursor, ascending, attribute)
+        if len(remaining) >= needed:
+            kth_best = getattr(remaining[needed - 1], attribute)
+            # Nothing unseen can beat the page: not the pooled candidates, nor anything farther
+            bounds = [lower_bound(row.distance_kilometers) for row in pool]
+            # Listings not fetched yet, or left out by the candidate cap, are farther than the edge
+            if next_batch is not None or candidates_seen < total:
+                bounds.append(lower_bound(fetched_edge_km))
+            if not bounds or kth_best <= min(bounds):
+                settled = True
+                break
+
+    if next_batch is not None:
+        # The prefetched batch is not needed; let it finish so its connection is released
+        await next_batch
+
+    # Unless the page was settled by the bound, listings beyond the cap were never ranked
+    truncated = not settled and candidates_seen < total
+    if truncated:
+        count("commute_sort_truncated")
+        total = len(ranked)
+    remaining = _after_cursor(_rank(ranked, ascending, attribute), cursor, ascending, attribute)
+    rows = remaining[skip:needed]
+    for row in rows:
+        row.sort_key = getattr(row, attribute)
+    return rows, total, truncated, len(remaining) > needed
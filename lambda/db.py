@@ -1,84 +1,360 @@
-import pandas as pd
-from sqlalchemy import create_engine, select, func
-from config.db_schema import listings
-from utils.distance_utils import geodesic_distance
+import asyncio
+import json
+import time
+from sqlalchemy import select, func, tuple_, and_
+from config.db_schema import listings, dataset_version, commute_grid
+from config.constants import (
+    COUNT_CACHE_SIZE, COUNT_CACHE_TTL_SECONDS, DATASET_VERSION_CHECK_SECONDS,
+    NEAREST_RING_START_KM, NEAREST_RING_GROWTH, NEAREST_RING_MAX_KM
+)
+from listing_row import ListingRow, LISTING_COLUMNS
+from utils.distance_utils import geodesic_distances, bounding_box
+from utils.ttl_cache import TTLCache
+from tracing import stage, count
 
-from config.env import DB_USER, DB_PASSWORD, DB_HOST, DB_NAME, DB_PORT
+from config.env import DB_USER, DB_PASSWORD, DB_HOST, DB_NAME, DB_PORT, LISTINGS_ENGINE
+from config.db_engine import create_db_engine
 
-db_url = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(db_url)
+# psycopg (v3) for its async driver and server-side prepared statements
+db_url = f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+_engine = None
 
-def get_listings(user_lat, user_lon, closest_city, filters, sort_by='list_price', ascending=True, page=1, page_size=20):
+_count_cache = TTLCache(COUNT_CACHE_SIZE, COUNT_CACHE_TTL_SECONDS)
+_version_state = {"version": None, "checked_at": 0.0}
+
+def get_engine():
+    """
+    Create the SQLAlchemy engine on first use rather than at import time.
+    The engine, and with it the pooled connection, lives for the whole container.
+    Queries are single statements (cache writes are single upserts), so the engine
+    runs in autocommit and prepared statements survive between invocations.
+    The engine is async, and its connections are bound to the runtime's event loop.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_db_engine(db_url, autocommit=True, asynchronous=True)
+    return _engine
+
+
+DISTANCE_SORT_KEYS = ['commute_seconds', 'commute_time', 'distance']
+GRID_SORT_KEYS = ['commute_seconds', 'commute_time', 'commute_score']
+FILTER_KEYS = ['min_price', 'max_price', 'min_beds', 'max_beds', 'min_baths', 'max_baths', 'max_distance_km']
+
+
+async def get_dataset_version():
+    """
+    Return the current dataset version written by update_db.
+    The value is re-read from the database at most every DATASET_VERSION_CHECK_SECONDS.
+    """
+    now = time.monotonic()
+    if _version_state["version"] is None or now - _version_state["checked_at"] > DATASET_VERSION_CHECK_SECONDS:
+        try:
+            async with get_engine().connect() as conn:
+                version = (await conn.execute(
+                    select(dataset_version.c.version).where(dataset_version.c.id == 1)
+                )).scalar()
+        except Exception as e:
+            print(f"[ERROR] Failed reading dataset version: {e}")
+            version = None
+        _version_state["version"] = version or 0
+        _version_state["checked_at"] = now
+    return _version_state["version"]
+
+
+async def check_cursor_version(cursor):
+    """
+    Cursors only seek correctly within the dataset version they were issued for.
+
+    Raises:
+        ValueError: If the cursor was issued for an older dataset version.
+    """
+    if cursor is not None and cursor['version'] != await get_dataset_version():
+        raise ValueError("cursor has expired; request the first page again")
+
+
+def filter_signature(filters, user_lat, user_lon):
+    """Canonical string for the filters that affect which listings match."""
+    signature = {key: filters[key] for key in FILTER_KEYS if key in filters}
+    # A radius filter makes the match set depend on the user's location
+    if "max_distance_km" in filters:
+        signature["center"] = [round(user_lat, 5), round(user_lon, 5)]
+    return json.dumps(signature, sort_keys=True)
+
+
+def _distance_expr(user_lat, user_lon):
+    """Haversine distance in kilometers from the user to each listing, as a SQL expression."""
+    R = 6371  # Earth radius in kilometers
+    return R * 2 * func.asin(
+        func.sqrt(
+            func.pow(func.sin(func.radians(listings.c.latitude - user_lat) / 2), 2) +
+            func.cos(func.radians(user_lat)) *
+            func.cos(func.radians(listings.c.latitude)) *
+            func.pow(func.sin(func.radians(listings.c.longitude - user_lon) / 2), 2)
+        )
+    )
+
+
+def _grid_joins(commute_grid_cells):
+    """
+    Join listings to the precomputed commutes of each destination cell.
+
+    Returns:
+        (FromClause, list): The joined tables and the commute seconds column per destination.
+    """
+    from_clause = listings
+    columns = []
+    for j, (cell_lat, cell_lon, mode, _) in enumerate(commute_grid_cells):
+        grid = commute_grid.alias(f"commute_grid_{j}")
+        from_clause = from_clause.join(grid, and_(
+            grid.c.listing_id == listings.c.id,
+            grid.c.cell_lat == cell_lat,
+            grid.c.cell_lon == cell_lon,
+            grid.c.mode == mode,
+            # No route to a destination drops the listing, as on the API path
+            grid.c.commute_seconds.isnot(None)
+        ))
+        columns.append(grid.c.commute_seconds)
+    return from_clause, columns
+
+
+def _sort_expr(sort_by, user_lat, user_lon, grid_columns=None, grid_weights=None):
+    """SQL expression listings are ordered by for a given sort_by."""
+    if grid_columns and sort_by in GRID_SORT_KEYS:
+        if sort_by != 'commute_score':
+            return grid_columns[0]
+        # Same units and arithmetic as destinations.combined_score, so cursors agree
+        weighted = sum(column * weight for column, weight in zip(grid_columns, grid_weights))
+        return weighted / sum(grid_weights) / 60
+    if sort_by in DISTANCE_SORT_KEYS:
+        return _distance_expr(user_lat, user_lon)
+    if sort_by == 'baths':
+        return listings.c.total_baths
+    return getattr(listings.c, sort_by)
+
+
+def _filter_conditions(user_lat, user_lon, closest_city, filters):
+    """Build WHERE conditions for the region and optional filters."""
+    conditions = [listings.c.region == closest_city]
+    if "max_distance_km" in filters:
+        # Prune with an indexable bounding box first, then apply the exact distance
+        min_lat, max_lat, min_lon, max_lon = bounding_box(user_lat, user_lon, filters["max_distance_km"])
+        conditions.append(listings.c.latitude.between(min_lat, max_lat))
+        conditions.append(listings.c.longitude.between(min_lon, max_lon))
+        conditions.append(_distance_expr(user_lat, user_lon) <= filters["max_distance_km"])
+    if "min_price" in filters:
+        conditions.append(listings.c.list_price >= filters["min_price"])
+    if "max_price" in filters:
+        conditions.append(listings.c.list_price <= filters["max_price"])
+    if "min_beds" in filters:
+        conditions.append(listings.c.beds >= filters["min_beds"])
+    if "max_beds" in filters:
+        conditions.append(listings.c.beds <= filters["max_beds"])
+    if "min_baths" in filters:
+        conditions.append(listings.c.total_baths >= filters["min_baths"])
+    if "max_baths" in filters:
+        conditions.append(listings.c.total_baths <= filters["max_baths"])
+    return conditions
+
+
+def _seek_conditions(sort_expr, cursor, ascending):
+    """
+    Conditions selecting the rows after the cursor in (sort key, id) order, as consecutive
+    ranges to read in turn. NULL sort keys come last ascending and first descending, as
+    Postgres orders them, and a cursor may sit on a NULL key. Each range is a single
+    index seek; an OR across the NULL boundary would scan from the start of the region.
+    """
+    last_key, last_id = cursor['last_key'], cursor['last_id']
+    if last_key is None:
+        same_key_after = and_(sort_expr.is_(None), listings.c.id > last_id if ascending else listings.c.id < last_id)
+        return [same_key_after] if ascending else [same_key_after, sort_expr.isnot(None)]
+    position = tuple_(sort_expr, listings.c.id)
+    last_seen = tuple_(last_key, last_id)
+    return [position > last_seen, sort_expr.is_(None)] if ascending else [position < last_seen]
+
+
+def _radius_conditions(user_lat, user_lon, radius_km):
+    """Indexable bounding box plus exact distance conditions for listings within radius_km."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(user_lat, user_lon, radius_km)
+    return [
+        listings.c.latitude.between(min_lat, max_lat),
+        listings.c.longitude.between(min_lon, max_lon),
+        _distance_expr(user_lat, user_lon) <= radius_km
+    ]
+
+
+async def _fetch_nearest(fetch, query, user_lat, user_lon, filters, cursor, page_size):
+    """
+    Fetch a nearest-first page by searching growing radii around the user.
+
+    Each ring query only reads the (region, latitude, longitude) index range of its
+    bounding box and sorts the listings inside it. Once a ring holds a full page, no
+    listing outside it can come earlier, so the page is final; otherwise the radius
+    grows by NEAREST_RING_GROWTH, up to the radius filter or NEAREST_RING_MAX_KM,
+    past which the whole region is queried.
+
+    Args:
+        fetch (callable): Async fetch(statement) returning a result.
+        query (Select): The page query, with ordering, limit and offset applied.
+        cursor (dict): Decoded cursor; rings start beyond its distance.
+
+    Returns:
+        list: Raw result rows for the page.
+    """
+    limit = filters.get("max_distance_km", NEAREST_RING_MAX_KM)
+    radius = NEAREST_RING_START_KM + (cursor['last_key'] if cursor is not None else 0.0)
+    rings = 0
+    while radius < limit:
+        rings += 1
+        raw_rows = (await fetch(query.where(*_radius_conditions(user_lat, user_lon, radius)))).all()
+        if len(raw_rows) == page_size:
+            count("sql_distance_rings", rings)
+            return raw_rows
+        radius *= NEAREST_RING_GROWTH
+    count("sql_distance_rings", rings + 1)
+    return (await fetch(query)).all()
+
+
+async def get_listings(user_lat, user_lon, closest_city, filters, sort_by='list_price', ascending=True, page=1, page_size=20,
+                 cursor=None, commute_grid_cells=None):
     """
     Fetch listings from the database with optional filtering, sorting, and distance calculation.
 
     Distance is computed in SQL only if sorting by distance/commute; otherwise, it is computed in Python
-    for the limited page of results to avoid expensive queries.
+    for the limited page of results to avoid expensive queries. Nearest-first pages are searched
+    in growing radii around the user (see _fetch_nearest) rather than sorting the whole region.
+
+    The total number of matching listings is returned with the page via a window aggregate
+    and cached per (region, filters, dataset version), so later pages skip the count. When
+    the count needs its own query (cursor pages), it runs concurrently with the row fetch.
+
+    With LISTINGS_ENGINE=memory, pages without commute_grid_cells are served from the
+    container's in-memory copy of the region instead (see memory_listings).
 
     Parameters:
         user_lat (float): Latitude of the user location.
         user_lon (float): Longitude of the user location.
         closest_city (str): Region/city to filter listings by proximity.
-        filters (dict): Optional filters for price, beds, and baths.
+        filters (dict): Optional filters for price, beds, baths, and max_distance_km.
         sort_by (str): Column to sort by. Special values 'distance', 'commute_seconds', 'commute_time'
                        trigger SQL distance computation.
         ascending (bool): Sort order; True for ascending, False for descending.
         page (int): Page number (1-based) for pagination.
         page_size (int): Number of listings per page.
+        cursor (dict): Decoded cursor from the previous page. When given, the query seeks past the
+                       cursor's (sort key, id) instead of using page for an OFFSET.
+        commute_grid_cells (list): Precomputed (cell_lat, cell_lon, mode, weight) per destination,
+                                   from commute_grid. When given, only listings with a commute to
+                                   every destination match, 'commute_times' is populated from the
+                                   stored commutes, and commute sort keys are sorted on them in SQL.
 
     Returns:
-        pd.DataFrame: DataFrame containing the paged listings with 'distance_kilometers' always populated.
+        (list, int): ListingRow objects for the page with 'distance_kilometers' and 'sort_key'
+                     always populated, and the total number of listings matching the filters.
+
+    Raises:
+        ValueError: If the cursor was issued for an older dataset version.
     """
-    # Determine if we need to sort by distance/commute
-    need_distance_sort = sort_by in ['commute_seconds', 'commute_time', 'distance']
+    if LISTINGS_ENGINE == "memory" and not commute_grid_cells:
+        # Imported here, as the in-memory engine builds on this module
+        from memory_listings import get_memory_listings
+        return await get_memory_listings(user_lat, user_lon, closest_city, filters, sort_by, ascending,
+                                         page, page_size, cursor=cursor)
 
-    # Base query: no distance computation unless sorting by distance
-    query = select(listings).where(listings.c.region == closest_city)
+    await check_cursor_version(cursor)
 
-    # Apply optional filters
-    if "min_price" in filters:
-        query = query.where(listings.c.list_price >= filters["min_price"])
-    if "max_price" in filters:
-        query = query.where(listings.c.list_price <= filters["max_price"])
-    if "min_beds" in filters:
-        query = query.where(listings.c.beds >= filters["min_beds"])
-    if "max_beds" in filters:
-        query = query.where(listings.c.beds <= filters["max_beds"])
-    if "min_baths" in filters:
-        query = query.where((listings.c.full_baths + listings.c.half_baths / 2) >= filters["min_baths"])
-    if "max_baths" in filters:
-        query = query.where((listings.c.full_baths + listings.c.half_baths / 2) <= filters["max_baths"])
+    # Precomputed commutes come from joined commute_grid rows
+    from_clause, grid_columns = listings, []
+    if commute_grid_cells:
+        from_clause, grid_columns = _grid_joins(commute_grid_cells)
+    grid_weights = [cell[3] for cell in commute_grid_cells or []]
 
-    # Sorting
-    if need_distance_sort:
-        # Compute distance in SQL for sorting if necessary
-        R = 6371  # Earth radius in kilometers
-        distance_expr = R * 2 * func.asin(
-            func.sqrt(
-                func.pow(func.sin(func.radians(listings.c.latitude - user_lat) / 2), 2) +
-                func.cos(func.radians(user_lat)) *
-                func.cos(func.radians(listings.c.latitude)) *
-                func.pow(func.sin(func.radians(listings.c.longitude - user_lon) / 2), 2)
-            )
-        ).label('distance_kilometers')
-        query = query.add_columns(distance_expr).order_by(distance_expr if ascending else distance_expr.desc())
+    # Determine if we need to sort by distance
+    need_distance_sort = sort_by in DISTANCE_SORT_KEYS and not (grid_columns and sort_by in GRID_SORT_KEYS)
+    nearest_first = need_distance_sort and ascending
+
+    # Base query: stored columns plus the sort key, with distance computed in SQL only
+    # when it is the sort key
+    conditions = _filter_conditions(user_lat, user_lon, closest_city, filters)
+    sort_expr = _sort_expr(sort_by, user_lat, user_lon, grid_columns, grid_weights)
+    query = select(listings, sort_expr.label('sort_key'), *grid_columns).select_from(from_clause).where(*conditions)
+
+    # Only count matching rows when the count for this filter set is not cached.
+    # A cursor seek or a radius ring narrows the rows the window sees, so those cases
+    # count separately.
+    grid_signature = tuple(tuple(cell[:3]) for cell in commute_grid_cells or [])
+    count_key = (
+        closest_city, filter_signature(filters, user_lat, user_lon), grid_signature, await get_dataset_version()
+    )
+    total = _count_cache.get(count_key)
+    with_window = total is None and cursor is None and not nearest_first
+    if with_window:
+        query = query.add_columns(func.count().over().label('total_listings'))
+
+    # Ties are broken on id in the same direction so (sort_key, id) is a total order
+    if ascending:
+        query = query.order_by(sort_expr.asc(), listings.c.id.asc())
+    else:
+        query = query.order_by(sort_expr.desc(), listings.c.id.desc())
+
+    # Pagination: seek past the cursor when given, otherwise fall back to OFFSET
+    later_seeks = []
+    if cursor is not None:
+        seek, *later_seeks = _seek_conditions(sort_expr, cursor, ascending)
+        unpaged_query = query
+        query = query.where(seek).limit(page_size)
     else:
-        # Sort by other column safely using SQLAlchemy column reference
-        if hasattr(listings.c, sort_by):
-            col = getattr(listings.c, sort_by)
-            query = query.order_by(col.asc() if ascending else col.desc())
+        query = query.limit(page_size).offset((page - 1) * page_size)
 
-    # Pagination
-    query = query.limit(page_size).offset((page - 1) * page_size)
+    count_query = select(func.count()).select_from(from_clause).where(*conditions)
 
-    # Execute query
-    df = pd.read_sql(query, engine)
+    async def fetch(statement):
+        count("sql_queries")
+        async with get_engine().connect() as conn:
+            return await conn.execute(statement)
+
+    async def fetch_rows():
+        if nearest_first:
+            return await _fetch_nearest(fetch, query, user_lat, user_lon, filters, cursor, page_size)
+        raw_rows = (await fetch(query)).all()
+        # A page crossing the NULL sort keys continues in the next range
+        for seek in later_seeks:
+            if len(raw_rows) == page_size:
+                break
+            raw_rows += (await fetch(unpaged_query.where(seek).limit(page_size - len(raw_rows)))).all()
+        return raw_rows
+
+    # Execute query, reading plain tuples into compact rows
+    n_columns = len(LISTING_COLUMNS)
+    with stage("sql"):
+        if total is None and not with_window:
+            raw_rows, count_result = await asyncio.gather(fetch_rows(), fetch(count_query))
+            total = count_result.scalar()
+            _count_cache.set(count_key, total)
+            count("sql_rows_matched", total)
+        else:
+            raw_rows = await fetch_rows()
+            if total is None:
+                # Pages past the end have no window aggregate to ride on
+                total = raw_rows[0][-1] if raw_rows else (await fetch(count_query)).scalar()
+                _count_cache.set(count_key, total)
+                count("sql_rows_matched", total)
+    count("sql_rows_returned", len(raw_rows))
+
+    rows = [ListingRow(raw[:n_columns], raw[n_columns]) for raw in raw_rows]
+    if grid_columns:
+        n_grid = len(grid_columns)
+        for row, raw in zip(rows, raw_rows):
+            row.commute_times = list(raw[n_columns + 1:n_columns + 1 + n_grid])
 
     # Compute distance in Python if not sorted by distance
-    if 'distance_kilometers' not in df.columns:
-        df['distance_kilometers'] = df.apply(
-            lambda row: geodesic_distance(user_lat, user_lon, row['latitude'], row['longitude']),
-            axis=1
+    if need_distance_sort:
+        for row in rows:
+            row.distance_kilometers = row.sort_key
+    elif rows:
+        distances = geodesic_distances(
+            user_lat, user_lon, [row.latitude for row in rows], [row.longitude for row in rows]
         )
+        for row, distance in zip(rows, distances.tolist()):
+            row.distance_kilometers = distance
 
-    return df
\ No newline at end of file
+    return rows, total
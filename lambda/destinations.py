@@ -0,0 +1,57 @@
+"""
+destinations.py
+---------------
+Commute destinations for a request. The first destination is the primary one:
+it picks the region, and distance and the single-commute fields refer to it.
+Every destination contributes its weighted commute to a combined score.
+"""
+
+import asyncio
+from collections import namedtuple
+from geocoding import geocode_user_address
+
+Destination = namedtuple("Destination", ["address", "coords", "commute_type", "weight"])
+
+
+async def resolve_destinations(requested):
+    """
+    Geocode the requested destinations concurrently.
+
+    Args:
+        requested (list): Validated destinations, dicts with 'address', 'commute_type' and 'weight'.
+
+    Returns:
+        list: Destination tuples in request order.
+
+    Raises:
+        ValueError: If any address cannot be geocoded.
+    """
+    coords = await asyncio.gather(*[geocode_user_address(d['address']) for d in requested])
+    return [
+        Destination(d['address'], location, d['commute_type'], d['weight'])
+        for d, location in zip(requested, coords)
+    ]
+
+
+def combined_score(times, destinations):
+    """Weighted mean commute in minutes across destinations."""
+    total_weight = sum(d.weight for d in destinations)
+    return sum(seconds * d.weight for seconds, d in zip(times, destinations)) / total_weight / 60
+
+
+def apply_commute_times(row, destinations, times, estimated=False):
+    """
+    Store per-destination commute times and the combined score on a row.
+    estimated flags times that are offline estimates rather than API answers.
+
+    Returns:
+        bool: False if any destination has no commute time, so the row should be dropped.
+    """
+    if any(seconds is None for seconds in times):
+        return False
+    row.commute_times = times
+    row.commute_seconds = times[0]
+    row.commute_minutes = times[0] / 60
+    row.commute_score = combined_score(times, destinations)
+    row.commute_estimated = estimated
+    return True
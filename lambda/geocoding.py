@@ -2,14 +2,158 @@
 geocoding.py
 ------------
 Handles geocoding of user addresses and validation against supported regions.
+Geocode results are cached in-process and in a shared table keyed by normalized address;
+misses call the Geocoding API over the container's shared HTTP session.
 """
 
-import googlemaps
-from config.env import GOOGLE_API_KEY
-from config.constants import MAX_DISTANCE_KM
+import re
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from config.env import GOOGLE_API_KEY, GOOGLE_MAPS_API_URL
+from config.constants import (
+    MAX_DISTANCE_KM, GEOCODE_CACHE_TTL_SECONDS, GEOCODE_NEGATIVE_TTL_SECONDS, GEOCODE_CACHE_MEMORY_SIZE
+)
+from config.db_schema import geocode_cache
+from db import get_engine
+from runtime import get_http_session
+from governor import geocode_governor
 from utils.distance_utils import nearest_region
+from utils.ttl_cache import TTLCache
+from tracing import count
 
-def geocode_user_address(address: str) -> tuple[float, float]:
+# Marker for addresses the API could not resolve
+_NOT_FOUND = (None, None)
+
+# A unit designator followed by a unit token: one with a digit, or a single letter ("apt b").
+# "ste" and "fl" need "#" or a number, as they are also street names and state codes.
+_UNIT_PATTERN = re.compile(
+    r"\b(?:apt|apartment|unit|suite|floor|rm|room)\b\.?\s*#?\s*(?:[\w-]*\d[\w-]*|[a-z])\b"
+    r"|\b(?:ste|fl)\b\.?\s*(?:#\s*[\w-]+|[\w-]*\d[\w-]*\b)"
+    r"|#\s*[\w-]+"
+)
+# Bumped when normalization changes, so keys cached under the old rules are not read
+_KEY_VERSION = "2"
+# A state and ZIP segment, which can look like a unit ("fl 33132")
+_STATE_ZIP_PATTERN = re.compile(r"[a-z]{2}\s+\d{5}(?:-\d{4})?")
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+_memory_cache = TTLCache(GEOCODE_CACHE_MEMORY_SIZE, GEOCODE_CACHE_TTL_SECONDS)
+_table_ready = False
+
+
+def normalize_address(address: str) -> str:
+    """
+    Fold an address into a cache key: lowercase, unit designators removed,
+    punctuation and whitespace collapsed.
+
+    Units are only removed from the street segment (before the first comma), or as a
+    segment of their own; the city, state and ZIP are kept as given.
+
+    Args:
+        address (str): Raw user-provided address.
+
+    Returns:
+        str: Normalized address.
+    """
+    street, *rest = address.lower().split(",")
+    segments = [_UNIT_PATTERN.sub(" ", street)]
+    segments += [
+        segment for segment in rest
+        if _STATE_ZIP_PATTERN.fullmatch(segment.strip()) or not _UNIT_PATTERN.fullmatch(segment.strip())
+    ]
+    key = _PUNCTUATION_PATTERN.sub(" ", " ".join(segments))
+    return _WHITESPACE_PATTERN.sub(" ", key).strip()
+
+
+async def _read_db(address_key):
+    global _table_ready
+    try:
+        if not _table_ready:
+            async with get_engine().begin() as conn:
+                await conn.run_sync(geocode_cache.create, checkfirst=True)
+            _table_ready = True
+        query = select(geocode_cache.c.latitude, geocode_cache.c.longitude).where(
+            geocode_cache.c.address_key == address_key,
+            geocode_cache.c.expires_at > func.now()
+        )
+        async with get_engine().connect() as conn:
+            row = (await conn.execute(query)).first()
+        return None if row is None else (row.latitude, row.longitude)
+    except Exception as e:
+        print(f"[ERROR] Failed reading geocode cache: {e}")
+        return None
+
+
+async def _write_db(address_key, location, ttl_seconds):
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+    stmt = insert(geocode_cache).values(
+        address_key=address_key, latitude=location[0], longitude=location[1], expires_at=expires_at
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[geocode_cache.c.address_key],
+        set_={
+            "latitude": stmt.excluded.latitude,
+            "longitude": stmt.excluded.longitude,
+            "expires_at": stmt.excluded.expires_at
+        }
+    )
+    try:
+        async with get_engine().begin() as conn:
+            await conn.execute(stmt)
+    except Exception as e:
+        print(f"[ERROR] Failed writing geocode cache: {e}")
+
+
+async def _remember(address_key, location):
+    ttl = GEOCODE_NEGATIVE_TTL_SECONDS if location == _NOT_FOUND else GEOCODE_CACHE_TTL_SECONDS
+    _memory_cache.set(address_key, location, ttl_seconds=ttl)
+    await _write_db(address_key, location, ttl)
+
+
+async def _send_geocode_request(session, url, params):
+    """One Geocoding request; returns (status, data) as ApiGovernor.call expects."""
+    count("geocode_api_calls")
+    try:
+        async with session.get(url, params=params) as resp:
+            if resp.status == 429:
+                return "OVER_QUERY_LIMIT", {}
+            if resp.status >= 500:
+                return "UNKNOWN_ERROR", {}
+            data = await resp.json()
+    except Exception as e:
+        print(f"[ERROR] Failed geocoding address: {e}")
+        return "REQUEST_FAILED", {}
+    return data.get("status"), data
+
+
+async def _fetch_geocode(address):
+    """
+    Call the Geocoding API over the shared HTTP session, retrying transient failures
+    under the geocode governor.
+
+    Returns:
+        (float, float): Latitude and longitude, or _NOT_FOUND if the address has no match.
+
+    Raises:
+        ValueError: If the request fails, so the failure is not cached.
+    """
+    url = f"{GOOGLE_MAPS_API_URL}/geocode/json"
+    session = await get_http_session()
+    params = {"address": address, "key": GOOGLE_API_KEY}
+    status, data = await geocode_governor.call(lambda: _send_geocode_request(session, url, params))
+    if status == "ZERO_RESULTS":
+        return _NOT_FOUND
+    if status != "OK" or not data.get("results"):
+        print(f"[ERROR] Geocoding API returned {status}: {data.get('error_message', '')}")
+        raise ValueError(f"Failed to find address: {address}")
+
+    point = data["results"][0]["geometry"]["location"]
+    return point["lat"], point["lng"]
+
+
+async def geocode_user_address(address: str) -> tuple[float, float]:
     """
     Convert a user-provided address to latitude and longitude.
 
@@ -22,13 +166,24 @@ def geocode_user_address(address: str) -> tuple[float, float]:
     Raises:
         ValueError: If the address cannot be geocoded.
     """
-    gmaps = googlemaps.Client(key=GOOGLE_API_KEY)
-    try:
-        geocode_result = gmaps.geocode(address)
-        location = geocode_result[0]['geometry']['location']
-        return location['lat'], location['lng']
-    except Exception:
+    address_key = f"{_KEY_VERSION}:{normalize_address(address)}"
+
+    location = _memory_cache.get(address_key)
+    if location is None:
+        location = await _read_db(address_key)
+        if location is not None:
+            ttl = GEOCODE_NEGATIVE_TTL_SECONDS if location == _NOT_FOUND else GEOCODE_CACHE_TTL_SECONDS
+            _memory_cache.set(address_key, location, ttl_seconds=ttl)
+
+    if location is None:
+        location = await _fetch_geocode(address)
+        await _remember(address_key, location)
+    else:
+        count("geocode_cache_hits")
+
+    if location == _NOT_FOUND:
         raise ValueError(f"Failed to find address: {address}")
+    return location
 
 
 def validate_city(lat: float, lon: float) -> str:
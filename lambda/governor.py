@@ -0,0 +1,179 @@
+"""
+governor.py
+-----------
+Adaptive concurrency and budgets for calls to the Google Maps APIs.
+
+Each API has a governor holding an AIMD concurrency limit: every success raises
+the limit by about one per window of requests, and throttling (OVER_QUERY_LIMIT,
+HTTP 429, timeouts) halves it. Transient failures are retried with jittered
+exponential backoff.
+
+Distance Matrix elements are also budgeted, per request and per minute per
+container. Batches beyond either budget are not sent; their elements come back
+as BUDGET_EXCEEDED and, like failed elements, are filled with offline estimates
+by the caller and flagged, so listings are not lost.
+"""
+
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from config.constants import (
+    GOOGLE_MAX_CONCURRENCY, GOOGLE_MIN_CONCURRENCY, GOOGLE_MAX_RETRIES, GOOGLE_RETRY_BASE_SECONDS,
+    GOOGLE_RETRY_MAX_SECONDS, MATRIX_ELEMENTS_PER_REQUEST, MATRIX_ELEMENTS_PER_MINUTE
+)
+from config.distance_matrix import NO_ROUTE_STATUSES
+from tracing import count
+
+# Statuses worth retrying, and those that signal we are sending too fast
+TRANSIENT_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR", "REQUEST_FAILED"}
+THROTTLE_STATUSES = {"OVER_QUERY_LIMIT", "REQUEST_FAILED"}
+# Element statuses that mean "no answer right now" rather than "no route"
+UNAVAILABLE_STATUSES = TRANSIENT_STATUSES | {"BUDGET_EXCEEDED"}
+
+_request_state = ContextVar("governor_request", default=None)
+
+
+class ApiGovernor:
+    """
+    AIMD concurrency limit for one API, shared by all requests on the container's loop.
+
+    Args:
+        name (str): API name, used in counter names.
+        max_limit (int): Highest concurrency the limit grows to.
+        min_limit (int): Lowest concurrency the limit shrinks to.
+    """
+
+    def __init__(self, name, max_limit=GOOGLE_MAX_CONCURRENCY, min_limit=GOOGLE_MIN_CONCURRENCY):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._condition = None
+        self._loop = None
+
+    def _get_condition(self):
+        # asyncio primitives belong to a loop; recreate if the runtime's loop was replaced
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def _acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def _release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def succeeded(self):
+        """Grow the limit additively: about +1 per limit's worth of successes."""
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def throttled(self):
+        """Halve the limit."""
+        self.limit = max(self.min_limit, self.limit / 2)
+        count(f"{self.name}_throttled")
+
+    async def call(self, send):
+        """
+        Send a request under the concurrency limit, retrying transient failures.
+
+        Args:
+            send (callable): Async send() -> (status, data), where status is the API's
+                             status string, OVER_QUERY_LIMIT for HTTP 429, UNKNOWN_ERROR
+                             for HTTP 5xx and REQUEST_FAILED if no response arrived.
+
+        Returns:
+            (str, dict): The status and data of the last attempt.
+        """
+        for attempt in range(GOOGLE_MAX_RETRIES + 1):
+            await self._acquire()
+            try:
+                status, data = await send()
+            finally:
+                await self._release()
+            if status not in TRANSIENT_STATUSES:
+                self.succeeded()
+                return status, data
+            if status in THROTTLE_STATUSES:
+                self.throttled()
+            if attempt == GOOGLE_MAX_RETRIES:
+                break
+            count(f"{self.name}_retries")
+            await asyncio.sleep(backoff_seconds(attempt))
+        return status, data
+
+
+class ElementBudget:
+    """Token bucket of Distance Matrix elements, refilled continuously up to the per-minute budget."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def take(self, n):
+        """Take n elements if available, without waiting."""
+        now = time.monotonic()
+        self.tokens = min(self.per_minute, self.tokens + (now - self.updated_at) * self.per_minute / 60)
+        self.updated_at = now
+        if self.tokens < n:
+            return False
+        self.tokens -= n
+        return True
+
+
+def backoff_seconds(attempt):
+    """Jittered exponential backoff before retry number attempt + 1."""
+    return min(GOOGLE_RETRY_MAX_SECONDS, GOOGLE_RETRY_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+matrix_governor = ApiGovernor("matrix")
+geocode_governor = ApiGovernor("geocode")
+_minute_budget = ElementBudget(MATRIX_ELEMENTS_PER_MINUTE)
+
+
+def start_request():
+    """Start the current request's element budget and degradation flag."""
+    _request_state.set({"elements_left": MATRIX_ELEMENTS_PER_REQUEST, "degraded": False})
+
+
+def reserve_elements(n):
+    """
+    Reserve n Distance Matrix elements against the request and per-minute budgets.
+    Calls outside a request (started with start_request) only draw on the per-minute budget.
+
+    Returns:
+        bool: Whether the elements may be requested.
+    """
+    state = _request_state.get()
+    if state is not None and state["elements_left"] < n:
+        count("matrix_elements_over_request_budget", n)
+        return False
+    if not _minute_budget.take(n):
+        count("matrix_elements_over_minute_budget", n)
+        return False
+    if state is not None:
+        state["elements_left"] -= n
+    return True
+
+
+def mark_degraded():
+    """Record that the current request's results include estimates in place of API answers."""
+    state = _request_state.get()
+    if state is not None:
+        state["degraded"] = True
+
+
+def request_degraded():
+    """Whether the current request's results include estimates in place of API answers."""
+    state = _request_state.get()
+    return state is not None and state["degraded"]
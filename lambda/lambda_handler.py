@@ -8,12 +8,23 @@ Modules used:
 - input_validation (for event validation)
 - geocoding (for address geocoding and city validation)
 - listings (for fetching and formatting listings)
+
+Requests run on a per-container event loop (see runtime), so database and HTTP
+connections stay open across warm invocations. Each request is traced (see tracing).
 """
 
+import asyncio
 from check_inputs import check_inputs
-from geocoding import geocode_user_address, validate_city
+from db import get_dataset_version
+from geocoding import validate_city
+from destinations import resolve_destinations
 from listings import get_listings_with_commute
+from commute_grid import record_demand
+from response_cache import response_cache_key, get_cached_response, store_response
 from responses import build_response, build_error_response
+from runtime import run
+from tracing import start_trace, finish_trace, stage, annotate
+from governor import start_request, request_degraded
 
 
 def lambda_handler(event, context):
@@ -27,23 +38,75 @@ def lambda_handler(event, context):
     Returns:
         dict: JSON response with listings, commute times, and pagination.
     """
+    return run(handle_request(event))
+
+
+async def handle_request(event):
+    """
+    Process a property listing request on the container's event loop.
+
+    Args:
+        event (dict): Contains user inputs such as address, filters, sorting, and commute type.
+
+    Returns:
+        dict: JSON response with listings, commute times, and pagination.
+    """
+    trace = start_trace()
+    start_request()
+    return finish_trace(trace, await process_request(event))
+
+
+async def process_request(event):
+    """Validate, look up and build the response for one request."""
     try:
-        validated = check_inputs(event)
-        user_lat, user_lon = geocode_user_address(validated['user_address'])
-        closest_city = validate_city(user_lat, user_lon)
+        with stage("check_inputs"):
+            validated = check_inputs(event)
+        annotate(sort_by=validated['sort_by'], commute_source=validated['commute_source'],
+                 destinations=len(validated['destinations']))
+        # The dataset version check does not depend on the addresses, so it overlaps geocoding
+        with stage("geocode"):
+            destinations, version = await asyncio.gather(
+                resolve_destinations(validated['destinations']), get_dataset_version()
+            )
+        # The primary destination picks the region
+        with stage("validate_city"):
+            closest_city = validate_city(*destinations[0].coords)
+        annotate(region=closest_city)
+        # Counted before the response cache, so cached and precomputed answers keep their demand
+        await record_demand(destinations)
+
+        # Identical searches against the same dataset version are served from the response cache
+        with stage("response_cache"):
+            cache_key = response_cache_key(validated, destinations, closest_city, version)
+            cached = await get_cached_response(cache_key)
+        annotate(response_cache="hit" if cached is not None else "miss")
+        if cached is not None:
+            with stage("respond"):
+                return build_response(cached['results'], validated['page'], validated['page_size'], cached['total'],
+                                      cached['next_cursor'], request_headers=event.get('headers'),
+                                      truncated=cached.get('truncated', False))
 
-        results, total = get_listings_with_commute(
-            user_coords=(user_lat, user_lon),
+        results, total, next_cursor, truncated = await get_listings_with_commute(
+            destinations=destinations,
             closest_city=closest_city,
             filters=validated['filters'],
             sort_by=validated['sort_by'],
             ascending=validated['ascending'],
             page=validated['page'],
             page_size=validated['page_size'],
-            commute_type=validated['commute_type']
+            cursor=validated['cursor'],
+            fields=validated['fields'],
+            commute_source=validated['commute_source']
         )
+        # Results with estimates standing in for failed or over-budget lookups are not cached
+        annotate(degraded=request_degraded(), truncated=truncated)
+        if not request_degraded():
+            with stage("response_cache"):
+                await store_response(cache_key, version, results, total, next_cursor, truncated)
 
-        return build_response(results, validated['page'], validated['page_size'], total)
+        with stage("respond"):
+            return build_response(results, validated['page'], validated['page_size'], total, next_cursor,
+                                  request_headers=event.get('headers'), truncated=truncated)
 
     except ValueError as ve:
         return build_error_response(str(ve), 400)
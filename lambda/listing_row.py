@@ -0,0 +1,51 @@
+"""
+listing_row.py
+--------------
+Compact row object for a listing on the query path, filled straight from
+database tuples and serialized directly to a dict for JSON output.
+"""
+
+from config.db_schema import listings
+
+LISTING_COLUMNS = tuple(col.name for col in listings.columns)
+
+# Fields computed per request on top of the stored columns
+COMPUTED_FIELDS = (
+    'sort_key', 'distance_kilometers', 'commute_seconds', 'commute_minutes', 'commute_url',
+    'commute_times', 'commute_score', 'commutes', 'commute_estimated'
+)
+
+# Fields a client may receive for each listing, in output order
+OUTPUT_COLUMNS = [
+    'formatted_address', 'city', 'region', 'list_price', 'beds',
+    'full_baths', 'half_baths', 'property_url', 'latitude', 'longitude',
+    'distance_kilometers', 'commute_minutes', 'primary_photo', 'commute_url',
+    'commute_score', 'commutes', 'commute_estimated'
+]
+
+
+class ListingRow:
+    """A single listing: the stored columns plus per-request computed fields."""
+
+    __slots__ = LISTING_COLUMNS + COMPUTED_FIELDS
+
+    def __init__(self, values, sort_key=None):
+        for name, value in zip(LISTING_COLUMNS, values):
+            setattr(self, name, value)
+        self.sort_key = sort_key
+        self.distance_kilometers = None
+        self.commute_seconds = None
+        self.commute_minutes = None
+        self.commute_url = None
+        self.commute_times = None
+        self.commute_score = None
+        self.commutes = None
+        self.commute_estimated = False
+
+    @property
+    def coords(self):
+        return self.latitude, self.longitude
+
+    def to_dict(self, fields):
+        """Project the row onto the given fields."""
+        return {field: getattr(self, field) for field in fields}
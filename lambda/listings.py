@@ -4,95 +4,178 @@ listings.py
 Fetches property listings, computes commute times, and formats the results for output.
 """
 
-import asyncio
-from utils.time_utils import default_arrival_timestamp
-from db import get_listings
-from calculate_commute_times import compute_commute_times
-
-
-def get_listings_with_commute(user_coords, closest_city, filters, sort_by, ascending,
-                              page, page_size, commute_type):
+from functools import partial
+from config.commute_keys import TIME_DEPENDENT_MODES, default_arrival_timestamp
+from db import get_listings, get_dataset_version
+from commute_cache import get_commute_matrix
+from commute_sort import get_listings_by_commute
+from commute_estimator import estimate_commute_matrix, fill_unavailable
+from commute_grid import get_commute_grid
+from destinations import apply_commute_times
+from pagination import encode_cursor
+from listing_row import OUTPUT_COLUMNS
+from tracing import stage
+
+COMMUTE_SORT_KEYS = ['commute_seconds', 'commute_time', 'commute_score']
+
+
+async def get_listings_with_commute(destinations, closest_city, filters, sort_by, ascending,
+                                    page, page_size, cursor=None, fields=OUTPUT_COLUMNS, commute_source='api'):
     """
     Fetch listings, compute commute times, and return formatted data.
 
+    When update_db has precomputed commutes to every destination's cell, they are read
+    and sorted on in SQL, for either commute_source, and no lookups are needed. Listings
+    whose times are offline estimates (commute_source 'estimate', or lookups the API could
+    not answer) have commute_estimated set.
+
     Args:
-        user_coords (tuple): (latitude, longitude) of the user.
+        destinations (list): Destination tuples; the first is the primary destination.
         closest_city (str): Closest supported city.
         filters (dict): Filter parameters for listings.
         sort_by (str): Column to sort by.
         ascending (bool): Sort order.
         page (int): Current page.
         page_size (int): Listings per page.
-        commute_type (str): Travel mode ('DRIVING', 'TRANSIT', 'WALKING', etc.).
+        cursor (dict): Decoded cursor from the previous page, if any.
+        fields (list): Output fields to include for each listing.
+        commute_source (str): 'api' for Distance Matrix times, 'estimate' for offline estimates.
 
     Returns:
-        (list, int): Formatted listing data and total listing count.
+        (list, int, str, bool): Formatted listing data, the number of listings matching the filters,
+                                the cursor for the next page (None on the last page), and whether a
+                                commute ordering was truncated to its candidate pool (see
+                                commute_sort), in which case the count covers only those.
     """
-    df = get_listings(user_coords[0], user_coords[1], closest_city,
-                      filters, sort_by, ascending, page, page_size)
-
-    if df.empty:
-        return [], 0
+    user_coords = destinations[0].coords
+    if commute_source == 'estimate':
+        lookup = partial(estimate_commute_matrix, region=closest_city)
+    else:
+        lookup = get_commute_matrix
+
+    truncated = False
+    commute_grid_cells = await get_commute_grid(destinations, closest_city)
+    if commute_grid_cells is not None:
+        rows, total = await get_listings(user_coords[0], user_coords[1], closest_city, filters, sort_by, ascending,
+                                         page, page_size, cursor=cursor, commute_grid_cells=commute_grid_cells)
+        if not rows:
+            return [], total, None, truncated
+        next_cursor = build_next_cursor(rows, sort_by, ascending, page_size, await get_dataset_version())
+        for row in rows:
+            apply_commute_times(row, destinations, row.commute_times)
+    elif sort_by in COMMUTE_SORT_KEYS:
+        rows, total, truncated, has_more = await get_listings_by_commute(
+            destinations, closest_city, filters, ascending, page, page_size,
+            sort_by=sort_by, cursor=cursor, lookup=lookup
+        )
+        if not rows:
+            return [], total, None, truncated
+        # A truncated ordering ends with the candidate pool
+        next_cursor = None
+        if has_more or not truncated:
+            next_cursor = build_next_cursor(rows, sort_by, ascending, page_size, await get_dataset_version())
+    else:
+        rows, total = await get_listings(user_coords[0], user_coords[1], closest_city,
+                                         filters, sort_by, ascending, page, page_size, cursor=cursor)
+        if not rows:
+            return [], total, None, truncated
+        # Taken before commute lookups can drop rows, so the next page starts after this one
+        next_cursor = build_next_cursor(rows, sort_by, ascending, page_size, await get_dataset_version())
+        rows = await add_commute_data(rows, destinations, lookup, closest_city)
+
+    if commute_source == 'estimate' and commute_grid_cells is None:
+        for row in rows:
+            row.commute_estimated = True
+
+    with stage("format"):
+        results = format_listings(rows, destinations, fields)
+
+    return results, total, next_cursor, truncated
+
+
+def build_next_cursor(rows, sort_by, ascending, page_size, version):
+    """
+    Build the cursor pointing past the last listing of a page.
 
-    df = add_commute_data(df, user_coords, commute_type)
-    results = format_listings(df, user_coords, commute_type)
+    Args:
+        rows (list): Page of ListingRow objects.
+        sort_by (str): Sort the page was produced with.
+        ascending (bool): Sort order.
+        page_size (int): Listings per page.
+        version (int): Dataset version the page was read from.
 
-    return results, len(df)
+    Returns:
+        str: Cursor token, or None if the page was not full.
+    """
+    if len(rows) < page_size:
+        return None
+    last = rows[-1]
+    # A listing missing the sorted column (e.g. no list_price) has a NULL sort key
+    last_key = None if last.sort_key is None else float(last.sort_key)
+    return encode_cursor(sort_by, ascending, last_key, last.id, version)
 
 
-def add_commute_data(df, user_coords, travel_type: str):
+async def add_commute_data(rows, destinations, lookup=get_commute_matrix, region=None):
     """
-    Add commute times to a DataFrame of listings.
+    Add commute times to every destination, served from the commute cache where possible.
+    Lookups the API could not answer are filled with estimates and flagged.
 
     Args:
-        df (DataFrame): Listings data.
-        user_coords (tuple): (latitude, longitude) of the user.
-        travel_type (str): Travel mode.
+        rows (list): ListingRow objects.
+        destinations (list): Destination tuples.
+        lookup (callable): Async lookup(origins_coords, destinations) returning a commute matrix.
+        region (str): Region whose estimator calibration fills unanswered lookups.
 
     Returns:
-        DataFrame: Updated with commute times.
+        list: The listings that have a commute time to every destination, updated with them.
     """
-    origins_coords = list(zip(df['latitude'], df['longitude']))
-    commute_times = asyncio.run(compute_commute_times(origins_coords, user_coords, travel_type=travel_type))
-
-    df['commute_seconds'] = commute_times
-    df.dropna(subset=['commute_seconds'], inplace=True)
-    df['commute_minutes'] = df['commute_seconds'] / 60
-    return df
+    origins = [row.coords for row in rows]
+    pairs = [(d.coords, d.commute_type) for d in destinations]
+    with stage("commute"):
+        commute_matrix = await lookup(origins, pairs)
+    commute_matrix, estimated = await fill_unavailable(commute_matrix, origins, pairs, region)
+    return [
+        row for row, times, is_estimate in zip(rows, commute_matrix, estimated)
+        if apply_commute_times(row, destinations, times, is_estimate)
+    ]
 
 
-def format_listings(df, user_coords, commute_type: str):
+def format_listings(rows, destinations, fields=OUTPUT_COLUMNS):
     """
     Format listings with commute URLs and selected columns.
 
     Args:
-        df (DataFrame): Listings data.
-        user_coords (tuple): (latitude, longitude) of the user.
-        commute_type (str): Travel mode.
+        rows (list): ListingRow objects.
+        destinations (list): Destination tuples; commute_url refers to the first.
+        fields (list): Output fields to include for each listing.
 
     Returns:
         list: List of dictionaries for JSON output.
     """
-    arrival_param = get_arrival_time_param(commute_type)
-    user_lat, user_lon = user_coords
-
-    df['commute_url'] = df.apply(
-        lambda row: (
-            f"https://www.google.com/maps/dir/?api=1"
-            f"&origin={row['latitude']},{row['longitude']}"
-            f"&destination={user_lat},{user_lon}"
-            f"&travelmode={commute_type.lower()}"
-            f"{arrival_param}"
-        ),
-        axis=1
-    )
-
-    columns = [
-        'formatted_address', 'city', 'region', 'list_price', 'beds',
-        'full_baths', 'half_baths', 'property_url', 'latitude', 'longitude',
-        'distance_kilometers', 'commute_minutes', 'primary_photo', 'commute_url'
-    ]
-    return df[columns].to_dict(orient="records")
+    if 'commute_url' in fields or 'commutes' in fields:
+        url_suffixes = [commute_url_suffix(d) for d in destinations]
+        for row in rows:
+            origin = f"https://www.google.com/maps/dir/?api=1&origin={row.latitude},{row.longitude}"
+            urls = [f"{origin}{suffix}" for suffix in url_suffixes]
+            row.commute_url = urls[0]
+            row.commutes = [
+                {
+                    "address": d.address,
+                    "commute_type": d.commute_type,
+                    "commute_minutes": seconds / 60,
+                    "commute_url": url
+                }
+                for d, seconds, url in zip(destinations, row.commute_times, urls)
+            ]
+
+    return [row.to_dict(fields) for row in rows]
+
+
+def commute_url_suffix(destination):
+    """Destination, travel mode and arrival time part of a Google Maps directions URL."""
+    lat, lon = destination.coords
+    commute_type = destination.commute_type
+    return f"&destination={lat},{lon}&travelmode={commute_type.lower()}{get_arrival_time_param(commute_type)}"
 
 
 def get_arrival_time_param(commute_type: str) -> str:
@@ -105,7 +188,6 @@ def get_arrival_time_param(commute_type: str) -> str:
     Returns:
         str: Query string for arrival_time.
     """
-    if commute_type.upper() not in ["DRIVING", "TRANSIT"]:
+    if commute_type.lower() not in TIME_DEPENDENT_MODES:
         return ""
-    arrival_param = f"&arrival_time={default_arrival_timestamp()}" if commute_type.upper() in ["DRIVING","TRANSIT"] else ""
-    return arrival_param
\ No newline at end of file
+    return f"&arrival_time={default_arrival_timestamp()}"
\ No newline at end of file
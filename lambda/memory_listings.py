@@ -0,0 +1,173 @@
+"""
+memory_listings.py
+------------------
+In-process listings engine: each region's listings are held as NumPy column arrays
+with presorted (key, id) permutations for the stored sort keys, so filtering,
+sorting and paging run inside the container without a database round trip.
+
+A region is loaded on its first request and reloaded when the dataset version
+changes, which get_dataset_version re-reads at most every DATASET_VERSION_CHECK_SECONDS.
+Results match db.get_listings: the same filters, haversine distance, (sort key, id)
+ordering with NULLs last ascending and first descending, and cursor seeks.
+
+Selected with LISTINGS_ENGINE=memory; requests on precomputed commute grids still
+go to SQL.
+"""
+
+import numpy as np
+from sqlalchemy import select
+from config.db_schema import listings
+from db import get_engine, get_dataset_version, check_cursor_version, DISTANCE_SORT_KEYS
+from listing_row import ListingRow, LISTING_COLUMNS
+from utils.distance_utils import geodesic_distances, bounding_box
+from tracing import stage, count
+
+STATIC_SORT_KEYS = ['list_price', 'beds', 'baths']
+NUMERIC_COLUMNS = ['list_price', 'beds', 'total_baths', 'latitude', 'longitude']
+
+_regions = {}
+
+
+def _distance_km(user_lat, user_lon, lats, lons):
+    """The haversine of db._distance_expr, so sorts, filters and cursors agree with SQL."""
+    R = 6371  # Earth radius in kilometers
+    lat1, lats = np.radians(user_lat), np.radians(lats)
+    a = (np.sin((lats - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lats) * np.sin(np.radians(lons - user_lon) / 2) ** 2)
+    return R * 2 * np.arcsin(np.sqrt(a))
+
+
+def _after_cursor(keys, ids, cursor, ascending):
+    """Mask of the ordered rows after the cursor, as db._seek_condition (NaN keys are NULL)."""
+    last_key, last_id = cursor['last_key'], cursor['last_id']
+    missing = np.isnan(keys)
+    if last_key is None:
+        same_key_after = missing & (ids > last_id if ascending else ids < last_id)
+        return same_key_after if ascending else same_key_after | ~missing
+    with np.errstate(invalid="ignore"):
+        if ascending:
+            return (keys > last_key) | ((keys == last_key) & (ids > last_id)) | missing
+        return (keys < last_key) | ((keys == last_key) & (ids < last_id))
+
+
+class RegionListings:
+    """
+    One region's listings: the row tuples, numeric columns as float arrays (NULL as NaN),
+    and an ascending (key, id) permutation per stored sort key.
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.rows = rows
+        positions = {name: i for i, name in enumerate(LISTING_COLUMNS)}
+        self.ids = np.array([row[positions['id']] for row in rows], dtype=np.int64)
+        self.columns = {
+            name: np.array([row[positions[name]] for row in rows], dtype=float) for name in NUMERIC_COLUMNS
+        }
+        self.columns['baths'] = self.columns['total_baths']
+        # lexsort puts NaN last, as Postgres orders NULLs in ascending order
+        self.orders = {key: np.lexsort((self.ids, self.columns[key])) for key in STATIC_SORT_KEYS}
+
+    def filter_mask(self, user_lat, user_lon, filters):
+        """Boolean mask of the listings matching filters, as db._filter_conditions."""
+        columns = self.columns
+        mask = np.ones(len(self.rows), dtype=bool)
+        # Comparisons with NaN are False, so NULLs never match a filter, as in SQL
+        with np.errstate(invalid="ignore"):
+            if "max_distance_km" in filters:
+                min_lat, max_lat, min_lon, max_lon = bounding_box(user_lat, user_lon, filters["max_distance_km"])
+                mask &= (columns['latitude'] >= min_lat) & (columns['latitude'] <= max_lat)
+                mask &= (columns['longitude'] >= min_lon) & (columns['longitude'] <= max_lon)
+                distances = _distance_km(user_lat, user_lon, columns['latitude'], columns['longitude'])
+                mask &= distances <= filters["max_distance_km"]
+            for key, column, above in [
+                ('min_price', 'list_price', True), ('max_price', 'list_price', False),
+                ('min_beds', 'beds', True), ('max_beds', 'beds', False),
+                ('min_baths', 'baths', True), ('max_baths', 'baths', False)
+            ]:
+                if key in filters:
+                    mask &= columns[column] >= filters[key] if above else columns[column] <= filters[key]
+        return mask
+
+    def ordered(self, mask, sort_by, ascending, user_lat, user_lon):
+        """
+        Matching listings in page order.
+
+        Returns:
+            (ndarray, ndarray): Row positions in order, and their sort keys.
+        """
+        if sort_by in DISTANCE_SORT_KEYS:
+            matches = np.flatnonzero(mask)
+            keys = _distance_km(user_lat, user_lon, self.columns['latitude'][matches],
+                                self.columns['longitude'][matches])
+            order = np.lexsort((self.ids[matches], keys))
+            positions, keys = matches[order], keys[order]
+        else:
+            positions = self.orders[sort_by]
+            positions = positions[mask[positions]]
+            keys = self.columns[sort_by][positions]
+        if not ascending:
+            positions, keys = positions[::-1], keys[::-1]
+        return positions, keys
+
+
+async def _load_region(region):
+    """Return the region's listings for the current dataset version, loading them if needed."""
+    version = await get_dataset_version()
+    loaded = _regions.get(region)
+    if loaded is not None and loaded.version == version:
+        return loaded
+    async with get_engine().connect() as conn:
+        rows = (await conn.execute(select(listings).where(listings.c.region == region))).all()
+    loaded = RegionListings([tuple(row) for row in rows], version)
+    _regions[region] = loaded
+    count("memory_regions_loaded")
+    return loaded
+
+
+async def get_memory_listings(user_lat, user_lon, closest_city, filters, sort_by='list_price', ascending=True,
+                              page=1, page_size=20, cursor=None):
+    """
+    Fetch a page of listings from the in-memory region columns. Arguments and results
+    are those of db.get_listings, without commute grid support.
+
+    Returns:
+        (list, int): ListingRow objects for the page with 'distance_kilometers' and 'sort_key'
+                     populated, and the total number of listings matching the filters.
+
+    Raises:
+        ValueError: If the cursor was issued for an older dataset version.
+    """
+    await check_cursor_version(cursor)
+    region = await _load_region(closest_city)
+
+    with stage("memory_listings"):
+        mask = region.filter_mask(user_lat, user_lon, filters)
+        positions, keys = region.ordered(mask, sort_by, ascending, user_lat, user_lon)
+        total = len(positions)
+
+        # Pagination: seek past the cursor's (sort key, id) when given, otherwise offset
+        if cursor is not None:
+            page_positions = np.flatnonzero(_after_cursor(keys, region.ids[positions], cursor, ascending))[:page_size]
+        else:
+            start = (page - 1) * page_size
+            page_positions = np.arange(start, min(start + page_size, total))
+
+        rows = [
+            ListingRow(region.rows[positions[i]], None if np.isnan(keys[i]) else float(keys[i]))
+            for i in page_positions
+        ]
+    count("memory_rows_matched", total)
+    count("memory_rows_returned", len(rows))
+
+    if sort_by in DISTANCE_SORT_KEYS:
+        for row in rows:
+            row.distance_kilometers = row.sort_key
+    elif rows:
+        distances = geodesic_distances(
+            user_lat, user_lon, [row.latitude for row in rows], [row.longitude for row in rows]
+        )
+        for row, distance in zip(rows, distances.tolist()):
+            row.distance_kilometers = distance
+
+    return rows, total
@@ -0,0 +1,63 @@
+"""
+pagination.py
+-------------
+Opaque cursor tokens for keyset pagination.
+
+A cursor records the sort it was issued for, the sort key and id of the last
+listing on the previous page, and the dataset version, so the next page can
+seek straight past it instead of scanning and discarding OFFSET rows. The sort
+key is null when the last listing has no value for the sorted column.
+"""
+
+import base64
+import json
+
+
+def encode_cursor(sort_by, ascending, last_key, last_id, version):
+    """
+    Build an opaque cursor token.
+
+    Args:
+        sort_by (str): Sort the page was produced with.
+        ascending (bool): Sort order.
+        last_key (float): Sort key of the last listing on the page, or None if it is NULL.
+        last_id (int): Id of the last listing on the page.
+        version (int): Dataset version the page was read from.
+
+    Returns:
+        str: URL-safe cursor token.
+    """
+    payload = {"s": sort_by, "a": ascending, "k": last_key, "i": last_id, "v": version}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token produced by encode_cursor.
+
+    Args:
+        token (str): Cursor token.
+
+    Returns:
+        dict: Keys 'sort_by', 'ascending', 'last_key', 'last_id', 'version'.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        cursor = {
+            "sort_by": payload["s"],
+            "ascending": payload["a"],
+            "last_key": payload["k"],
+            "last_id": int(payload["i"]),
+            "version": int(payload["v"]),
+        }
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("cursor is invalid")
+    last_key = cursor["last_key"]
+    if last_key is not None and (not isinstance(last_key, (int, float)) or isinstance(last_key, bool)):
+        raise ValueError("cursor is invalid")
+    return cursor
@@ -0,0 +1,179 @@
+"""
+response_cache.py
+-----------------
+Cache of complete listing responses keyed by the normalized request: the
+validated inputs from check_inputs, the geocoded destinations quantized to
+RESPONSE_CACHE_COORD_DECIMALS, and the dataset version. A new load by update_db
+bumps the version, so stale entries are never served and simply age out.
+
+Entries live in an in-container LRU and, in "shared" mode, in a Postgres table
+shared by all containers.
+"""
+
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from config.db_schema import response_cache
+from config.env import RESPONSE_CACHE_MODE
+from config.commute_keys import arrival_bucket
+from config.constants import (
+    RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MEMORY_SIZE, RESPONSE_CACHE_MAX_ROWS,
+    RESPONSE_CACHE_EVICT_INTERVAL_SECONDS, RESPONSE_CACHE_COORD_DECIMALS
+)
+from db import get_engine, filter_signature
+from utils.ttl_cache import TTLCache
+
+_memory_cache = TTLCache(RESPONSE_CACHE_MEMORY_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "db_errors": 0}
+_table_ready = False
+_last_eviction = 0.0
+
+
+def response_cache_key(validated, destinations, closest_city, version):
+    """
+    Build the cache key for a request.
+
+    Args:
+        validated (dict): Output of check_inputs.
+        destinations (list): Geocoded Destination tuples; the first is the primary destination.
+        closest_city (str): Closest supported city.
+        version (int): Current dataset version.
+
+    Returns:
+        str: Hex digest identifying the request.
+    """
+    user_lat, user_lon = destinations[0].coords
+    canonical = {
+        "destinations": [
+            [
+                round(d.coords[0], RESPONSE_CACHE_COORD_DECIMALS),
+                round(d.coords[1], RESPONSE_CACHE_COORD_DECIMALS),
+                d.commute_type,
+                d.weight,
+                # Time-dependent modes are cached per arrival hour, like the commute cache
+                arrival_bucket(d.commute_type)
+            ]
+            for d in destinations
+        ],
+        "city": closest_city,
+        "filters": filter_signature(validated['filters'], user_lat, user_lon),
+        "sort_by": validated['sort_by'],
+        "ascending": validated['ascending'],
+        "page": validated['page'],
+        "page_size": validated['page_size'],
+        "cursor": validated['cursor'],
+        "fields": validated['fields'],
+        "commute_source": validated['commute_source'],
+        "version": version
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def get_cache_stats():
+    """Return a copy of the hit/miss counters for this container."""
+    stats = dict(_stats)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+    stats["memory_entries"] = len(_memory_cache)
+    return stats
+
+
+async def _ensure_table():
+    global _table_ready
+    if not _table_ready:
+        async with get_engine().begin() as conn:
+            await conn.run_sync(response_cache.create, checkfirst=True)
+        _table_ready = True
+
+
+async def _read_db(cache_key):
+    try:
+        await _ensure_table()
+        query = select(response_cache.c.payload).where(
+            response_cache.c.cache_key == cache_key,
+            response_cache.c.expires_at > func.now()
+        )
+        async with get_engine().connect() as conn:
+            payload = (await conn.execute(query)).scalar()
+        return None if payload is None else json.loads(payload)
+    except Exception as e:
+        _stats["db_errors"] += 1
+        print(f"[ERROR] Failed reading response cache: {e}")
+        return None
+
+
+async def _evict_db(conn, version):
+    """Drop expired rows and rows from older dataset versions, then the oldest beyond the size cap."""
+    global _last_eviction
+    now = time.monotonic()
+    if now - _last_eviction < RESPONSE_CACHE_EVICT_INTERVAL_SECONDS:
+        return
+    _last_eviction = now
+
+    await conn.execute(delete(response_cache).where(
+        (response_cache.c.expires_at <= func.now()) | (response_cache.c.dataset_version < version)
+    ))
+    count = (await conn.execute(select(func.count()).select_from(response_cache))).scalar()
+    excess = count - RESPONSE_CACHE_MAX_ROWS
+    if excess > 0:
+        oldest = select(response_cache.c.cache_key).order_by(response_cache.c.expires_at).limit(excess)
+        await conn.execute(delete(response_cache).where(response_cache.c.cache_key.in_(oldest.scalar_subquery())))
+
+
+async def _write_db(cache_key, version, payload):
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=RESPONSE_CACHE_TTL_SECONDS)
+    stmt = insert(response_cache).values(
+        cache_key=cache_key, dataset_version=version, payload=json.dumps(payload), expires_at=expires_at
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[response_cache.c.cache_key],
+        set_={"payload": stmt.excluded.payload, "expires_at": stmt.excluded.expires_at}
+    )
+    try:
+        await _ensure_table()
+        async with get_engine().begin() as conn:
+            await conn.execute(stmt)
+            await _evict_db(conn, version)
+    except Exception as e:
+        _stats["db_errors"] += 1
+        print(f"[ERROR] Failed writing response cache: {e}")
+
+
+async def get_cached_response(cache_key):
+    """
+    Look up a cached response.
+
+    Returns:
+        dict: Payload with 'results', 'total', 'next_cursor' and 'truncated', or None on a miss.
+    """
+    if RESPONSE_CACHE_MODE == "off":
+        return None
+
+    payload = _memory_cache.get(cache_key)
+    if payload is not None:
+        _stats["memory_hits"] += 1
+        return payload
+
+    if RESPONSE_CACHE_MODE == "shared":
+        payload = await _read_db(cache_key)
+        if payload is not None:
+            _stats["db_hits"] += 1
+            _memory_cache.set(cache_key, payload)
+            return payload
+
+    _stats["misses"] += 1
+    return None
+
+
+async def store_response(cache_key, version, results, total, next_cursor, truncated=False):
+    """Cache a computed response in memory and, in "shared" mode, in Postgres."""
+    if RESPONSE_CACHE_MODE == "off":
+        return
+    payload = {"results": results, "total": total, "next_cursor": next_cursor, "truncated": truncated}
+    _memory_cache.set(cache_key, payload)
+    if RESPONSE_CACHE_MODE == "shared":
+        await _write_db(cache_key, version, payload)
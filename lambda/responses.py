@@ -2,12 +2,76 @@
 responses.py
 ------------
 Utility functions for building successful and error responses for AWS Lambda.
+
+Bodies are serialized with orjson when it is installed, and large bodies are
+compressed (brotli or gzip, per the client's Accept-Encoding) and returned
+base64-encoded as API Gateway expects for binary payloads.
 """
 
+import base64
+import gzip
 import json
+from config.constants import COMPRESSION_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+def _dumps(payload):
+    """Serialize payload to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def accepted_encodings(headers):
+    """
+    Parse the Accept-Encoding request header.
+
+    Args:
+        headers (dict): Request headers; names are matched case-insensitively.
+
+    Returns:
+        set: Encodings the client accepts (q > 0).
+    """
+    header = next((value for name, value in (headers or {}).items() if name.lower() == "accept-encoding"), "")
+    encodings = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        try:
+            q = float(params.strip()[2:]) if params.strip().startswith("q=") else 1.0
+        except ValueError:
+            q = 0.0
+        if name and q > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
 
+def _encode_body(body, headers):
+    """
+    Compress body for the client if it is large enough and an encoding is accepted.
 
-def build_response(results, page, page_size, total):
+    Returns:
+        (bytes, str): The possibly compressed body and its Content-Encoding (None if uncompressed).
+    """
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return body, None
+    encodings = accepted_encodings(headers)
+    if brotli is not None and "br" in encodings:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if "gzip" in encodings:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def build_response(results, page, page_size, total, next_cursor=None, request_headers=None, truncated=False):
     """
     Build a successful Lambda response.
 
@@ -16,18 +80,35 @@ def build_response(results, page, page_size, total):
         page (int): Current page.
         page_size (int): Number of listings per page.
         total (int): Total number of listings.
+        next_cursor (str): Cursor token for the next page, or None on the last page.
+        request_headers (dict): Request headers, used to negotiate body compression.
+        truncated (bool): Whether a commute ordering covered only the candidate pool (the
+                          nearest listings, or the farthest for longest-first),
+                          so total counts only those.
 
     Returns:
         dict: JSON Lambda response.
     """
+    body = _dumps({
+        "page": page,
+        "page_size": page_size,
+        "total_listings": total,
+        "next_cursor": next_cursor,
+        "truncated": truncated,
+        "results": results
+    })
+    body, content_encoding = _encode_body(body, request_headers)
+
+    response_headers = {"Content-Type": "application/json", "Vary": "Accept-Encoding"}
+    if content_encoding is None:
+        return {"statusCode": 200, "headers": response_headers, "body": body.decode("utf-8")}
+
+    response_headers["Content-Encoding"] = content_encoding
     return {
         "statusCode": 200,
-        "body": json.dumps({
-            "page": page,
-            "page_size": page_size,
-            "total_listings": total,
-            "results": results
-        })
+        "headers": response_headers,
+        "body": base64.b64encode(body).decode("ascii"),
+        "isBase64Encoded": True
     }
 
 
@@ -45,4 +126,4 @@ def build_error_response(message, status_code):
     return {
         "statusCode": status_code,
         "body": json.dumps({"error": message})
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,42 @@
+"""
+runtime.py
+----------
+Per-container async runtime: one event loop reused across warm invocations and
+one keep-alive HTTP session to the Google Maps APIs bound to it.
+
+Connections in the session (and in the async database pool) belong to the loop,
+so reusing the loop is what lets warm invocations skip TCP/TLS handshakes.
+"""
+
+import asyncio
+from config.constants import HTTP_MAX_CONNECTIONS, HTTP_KEEPALIVE_SECONDS, HTTP_TIMEOUT_SECONDS
+
+_loop = None
+_http_session = None
+
+
+def run(coro):
+    """Run a coroutine to completion on the container's event loop."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
+
+
+async def get_http_session():
+    """Return the shared aiohttp session, creating it on first use."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        # Imported here so containers serving only cached results never load aiohttp
+        import aiohttp
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300
+        )
+        _http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS)
+        )
+    return _http_session
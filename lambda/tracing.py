@@ -0,0 +1,153 @@
+"""
+tracing.py
+----------
+Lightweight per-request tracing: stage timers and counters, emitted at the end of
+each request as one CloudWatch Embedded Metric Format (EMF) log line and, when
+TRACE_MODE is "full", a Server-Timing response header.
+
+The current trace lives in a context variable, so modules record into it without
+passing it around, and tasks started during the request (asyncio.gather,
+ensure_future) record into the same trace. Stages that run concurrently overlap,
+so stage times can add up to more than the total.
+
+With TRACE_MODE "off" no trace is started, and stage() and count() return at once.
+"""
+
+import json
+import time
+from contextvars import ContextVar
+from config.env import TRACE_MODE
+from config.constants import TRACE_NAMESPACE
+
+_current = ContextVar("trace", default=None)
+
+
+class Trace:
+    """Stage durations, counters and properties of one request."""
+
+    __slots__ = ("started", "stages", "counters", "properties")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.properties = {}
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms):
+        """Server-Timing header value: one entry per stage, then the total."""
+        entries = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+    def emf_record(self, total_ms):
+        """EMF log record with stage times in milliseconds, counters, and properties."""
+        metrics = {f"{name}_ms": ms for name, ms in self.stages.items()}
+        metrics["total_ms"] = total_ms
+        definitions = [{"Name": name, "Unit": "Milliseconds"} for name in metrics]
+        definitions += [{"Name": name, "Unit": "Count"} for name in self.counters]
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{"Namespace": TRACE_NAMESPACE, "Dimensions": [[]], "Metrics": definitions}]
+            },
+            **self.properties,
+            **metrics,
+            **self.counters
+        }
+
+
+class _Stage:
+    """Adds the time spent inside the block to a stage of the current trace."""
+
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.started) * 1000
+        self.trace.stages[self.name] = self.trace.stages.get(self.name, 0.0) + ms
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def start_trace():
+    """Start tracing the current request, unless TRACE_MODE is "off"."""
+    if TRACE_MODE == "off":
+        return None
+    trace = Trace()
+    _current.set(trace)
+    return trace
+
+
+def stage(name):
+    """
+    Context manager timing a stage of the current request.
+    Entering a stage more than once adds up its time.
+
+    Args:
+        name (str): Stage name; a token, as it appears in the Server-Timing header.
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NO_STAGE
+    return _Stage(trace, name)
+
+
+def count(name, n=1):
+    """Add n to a counter of the current request."""
+    trace = _current.get()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + n
+
+
+def annotate(**properties):
+    """Attach properties (region, sort, cache outcome, ...) to the current request's metrics record."""
+    trace = _current.get()
+    if trace is not None:
+        trace.properties.update(properties)
+
+
+def finish_trace(trace, response):
+    """
+    Emit the request's metrics and, in "full" mode, add the Server-Timing header.
+
+    Args:
+        trace (Trace): The trace from start_trace(), or None when tracing is off.
+        response (dict): Lambda response; its headers are updated in place.
+
+    Returns:
+        dict: The response.
+    """
+    if trace is None:
+        return response
+    _current.set(None)
+    total_ms = trace.elapsed_ms()
+    trace.properties["status_code"] = response.get("statusCode")
+    try:
+        print(json.dumps(trace.emf_record(total_ms), default=str))
+    except Exception as e:
+        print(f"[ERROR] Failed emitting request metrics: {e}")
+    if TRACE_MODE == "full":
+        response.setdefault("headers", {})["Server-Timing"] = trace.server_timing(total_ms)
+    return response
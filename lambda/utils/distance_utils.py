@@ -1,17 +1,21 @@
-from geopy.distance import geodesic
-from config.constants import CITY_CENTERS
+from geo.kernel import geodesic_km, bounding_boxes, nearest_city_center
 
 def nearest_region(lat, lon):
     """Finds the closest city center to a given latitude and longitude, and distance in kilometers."""
-    closest = None
-    min_distance_km = float('inf')
-    for city, (city_lat, city_lon) in CITY_CENTERS.items():
-        distance_km = geodesic((lat, lon), (city_lat, city_lon)).km
-        if distance_km < min_distance_km:
-            min_distance_km = distance_km
-            closest = city
-    return closest, min_distance_km
+    names, distances = nearest_city_center(lat, lon)
+    return str(names[0]), float(distances[0])
 
 def geodesic_distance(lat1, lon1, lat2, lon2):
     """Compute the geodesic distance between two points (in kilometers)."""
-    return geodesic((lat1, lon1), (lat2, lon2)).km
\ No newline at end of file
+    return float(geodesic_km(lat1, lon1, lat2, lon2))
+
+def geodesic_distances(lat, lon, lats, lons):
+    """Compute geodesic distances from one point to arrays of points (in kilometers)."""
+    return geodesic_km(lat, lon, lats, lons)
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Latitude/longitude box that contains every point within radius_km of (lat, lon).
+    Returns (min_lat, max_lat, min_lon, max_lon).
+    """
+    return tuple(float(bound) for bound in bounding_boxes(lat, lon, radius_km))
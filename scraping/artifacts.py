@@ -0,0 +1,138 @@
+"""
+artifacts.py
+------------
+Writes scraped listings as one Parquet file per region plus a manifest with row
+counts and content hashes, so the updater only reloads regions that changed.
+
+Artifacts go to S3, or to a local directory standing in for S3.
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+from io import BytesIO
+import boto3
+import pandas as pd
+from config.constants import LOAD_CHUNK_ROWS
+
+MANIFEST_NAME = "manifest.json"
+
+
+class S3ArtifactStore:
+    """Artifact store backed by an S3 bucket and key prefix."""
+
+    def __init__(self, bucket, prefix="", region_name="us-east-1"):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client('s3', region_name=region_name)
+
+    def _key(self, name):
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def put(self, name, data):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(name), Body=data)
+
+    def get(self, name):
+        """Return the object's bytes, or None if it does not exist."""
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(name))['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def describe(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+
+class LocalArtifactStore:
+    """Artifact store backed by a local directory, for runs without S3."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def get(self, name):
+        """Return the file's bytes, or None if it does not exist."""
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def describe(self):
+        return self.root
+
+
+def region_slug(region):
+    """File-name-safe form of a region name."""
+    return re.sub(r"[^a-z0-9]+", "-", region.lower()).strip("-")
+
+
+def content_hash(df):
+    """Hash of a region's rows that does not depend on row order or file encoding."""
+    df = df.sort_values('property_url').reset_index(drop=True)
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update(",".join(df.columns).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_manifest(store):
+    """Return the manifest currently in the store, or an empty one."""
+    data = store.get(MANIFEST_NAME)
+    if data is None:
+        return {"regions": {}}
+    return json.loads(data)
+
+
+def write_region_artifacts(df, store, failed_cities=None):
+    """
+    Write one Parquet file per region and a manifest describing them.
+
+    Regions whose content hash matches the previous manifest are not re-uploaded,
+    and regions missing from this scrape keep their previous entry.
+
+    Args:
+        df (DataFrame): Cleaned listings with a 'region' column.
+        store: S3ArtifactStore or LocalArtifactStore.
+        failed_cities (dict): City -> failure details for cities whose scrape failed;
+                              their listings come from the previous snapshot.
+
+    Returns:
+        dict: The new manifest.
+    """
+    previous = load_manifest(store)["regions"]
+    regions = dict(previous)
+    uploaded = 0
+
+    for region, region_df in df.groupby('region'):
+        region_df = region_df.sort_values('property_url').reset_index(drop=True)
+        digest = content_hash(region_df)
+        name = f"regions/{region_slug(region)}.parquet"
+
+        if previous.get(region, {}).get("sha256") != digest:
+            buffer = BytesIO()
+            # Row groups no larger than the updater's load chunks keep its memory bounded
+            region_df.to_parquet(buffer, index=False, row_group_size=LOAD_CHUNK_ROWS)
+            store.put(name, buffer.getvalue())
+            uploaded += 1
+
+        regions[region] = {"key": name, "rows": len(region_df), "sha256": digest}
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "regions": regions,
+        "failed_cities": failed_cities or {}
+    }
+    # The manifest goes last: it is what triggers the updater
+    store.put(MANIFEST_NAME, json.dumps(manifest, indent=2).encode("utf-8"))
+    print(f"Uploaded {uploaded} of {len(regions)} region files to {store.describe()}.")
+    if failed_cities:
+        print(f"Manifest records {len(failed_cities)} failed cities: {', '.join(failed_cities)}")
+    return manifest
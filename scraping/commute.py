@@ -1,13 +1,10 @@
-from geopy.distance import geodesic
-from config.constants import CITY_CENTERS
+from geo.kernel import nearest_city_center
 
 def nearest_region(lat, lon):
     """Finds the closest city center to a given latitude and longitude, and distance in kilometers."""
-    closest = None
-    min_distance_km = float('inf')
-    for city, (city_lat, city_lon) in CITY_CENTERS.items():
-        distance_km = geodesic((lat, lon), (city_lat, city_lon)).km
-        if distance_km < min_distance_km:
-            min_distance_km = distance_km
-            closest = city
-    return closest, min_distance_km
\ No newline at end of file
+    names, distances = nearest_city_center(lat, lon)
+    return str(names[0]), float(distances[0])
+
+def nearest_regions(lats, lons):
+    """Finds the closest city center and its distance in kilometers for arrays of coordinates."""
+    return nearest_city_center(lats, lons)
@@ -0,0 +1,94 @@
+"""
+postprocess.py
+--------------
+Cleaning of scraped listings: per-city coordinate and bath fixes, region
+assignment and distance filtering, then combining city snapshots into the
+typed frame written as region artifacts.
+"""
+
+import pandas as pd
+from .commute import nearest_regions
+from config.constants import MAX_DISTANCE_KM
+
+# Final columns to include (only those that exist in the DataFrame).
+# Ids are assigned by the database so they stay stable across refreshes.
+DESIRED_COLUMNS = [
+    'property_url', 'latitude', 'longitude', 'beds', 'full_baths',
+    'half_baths', 'list_price', 'formatted_address', 'city', 'region', 'primary_photo'
+]
+
+# Column types written to the region Parquet files
+COLUMN_TYPES = {
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'beds': 'int64',
+    'full_baths': 'int64',
+    'half_baths': 'int64',
+    'list_price': 'float64'
+}
+
+
+def clean_city_listings(df, city):
+    """
+    Cleans the raw scrape of one city.
+
+    Args:
+        df (DataFrame): Listings as returned by the scraper.
+        city (str): City the listings were scraped for.
+
+    Returns:
+        DataFrame: Cleaned listings, or None if the city returned nothing usable.
+    """
+    if df.empty:
+        print(f"No listings returned for {city}")
+        return None
+
+    # Remove rows missing latitude or longitude
+    df = df.dropna(subset=["latitude", "longitude"])
+    if df.empty:
+        print(f"No valid coordinates for {city}")
+        return None
+
+    # Fill NaNs for full_baths and half_baths with 0 and ensure numeric type
+    if 'full_baths' in df.columns:
+        df['full_baths'] = pd.to_numeric(df['full_baths'], errors='coerce').fillna(0).astype(int)
+    if 'half_baths' in df.columns:
+        df['half_baths'] = pd.to_numeric(df['half_baths'], errors='coerce').fillna(0).astype(int)
+
+    # Compute region and distance
+    df['region'], df['distance_to_city'] = nearest_regions(
+        df['latitude'].to_numpy(dtype=float), df['longitude'].to_numpy(dtype=float)
+    )
+
+    # Filter by max distance
+    df = df[df['distance_to_city'] <= MAX_DISTANCE_KM]
+    if df.empty:
+        print(f"No listings within {MAX_DISTANCE_KM} kilometers for {city}")
+        return None
+
+    print(f"Scraped {len(df)} listings for {city}")
+    return df[[col for col in DESIRED_COLUMNS if col in df.columns]]
+
+
+def combine_snapshots(snapshots):
+    """
+    Combines cleaned city snapshots into one frame of unique, complete, typed listings.
+
+    Args:
+        snapshots (list): Non-empty DataFrames from clean_city_listings.
+
+    Returns:
+        DataFrame: Listings ready to be written as region artifacts.
+    """
+    # Combine all city data
+    combined_df = pd.concat(snapshots, ignore_index=True)
+
+    # Remove duplicate listings based on property URL
+    combined_df = combined_df.drop_duplicates(subset='property_url', keep='first')
+
+    # Drop rows missing essential columns (but keep full_baths and half_baths after fillna)
+    essential_columns = [col for col in DESIRED_COLUMNS if col not in ('full_baths', 'half_baths')]
+    combined_df = combined_df.dropna(subset=essential_columns)
+
+    filtered_df = combined_df[[col for col in DESIRED_COLUMNS if col in combined_df.columns]]
+    return filtered_df.astype({col: t for col, t in COLUMN_TYPES.items() if col in filtered_df.columns})
@@ -0,0 +1,259 @@
+"""
+scheduler.py
+------------
+Runs per-city scrapes with bounded concurrency under a shared token-bucket rate
+limit, backing off adaptively when the data source answers 403/429.
+
+Progress is checkpointed to a local state directory: each finished city's
+listings are saved as a snapshot and recorded in the checkpoint, so a crashed
+run resumes with only the unfinished cities (until the next scheduled run starts
+afresh), and each city is only asked for listings since its last successful
+scrape. Failed cities are recorded too, and reported in the artifact manifest.
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from config.constants import (
+    SCRAPE_CONCURRENCY, SCRAPE_RATE_PER_SECOND, SCRAPE_MAX_RETRIES, SCRAPE_FULL_WINDOW_DAYS,
+    SCRAPE_SCHEDULE_HOURS
+)
+from .artifacts import region_slug
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by all scrape workers.
+    The refill rate drops on throttling responses and recovers gradually on success.
+    """
+
+    def __init__(self, rate_per_second, capacity=1.0):
+        self.max_rate = rate_per_second
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def throttled(self, attempt):
+        """Halve the rate and pause every worker for a jittered exponential backoff."""
+        with self.lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            delay = min(300, 2 ** attempt * 5) * random.uniform(0.5, 1.5)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    def succeeded(self):
+        """Recover the rate additively after a successful request."""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 8)
+
+
+def is_throttled(error):
+    """Whether an exception from the data source is a 403/429 throttling response."""
+    for source in (error, getattr(error, "response", None)):
+        status = getattr(source, "status_code", None) or getattr(source, "status", None)
+        if status in (403, 429):
+            return True
+    message = str(error)
+    return "403" in message or "429" in message
+
+
+class ScrapeCheckpoint:
+    """
+    Local scrape state: per-city last successful scrape times, per-city listing
+    snapshots, and the set of cities completed by the current run.
+    """
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self.path = os.path.join(state_dir, "checkpoint.json")
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(state_dir, "cities"), exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.state = json.load(f)
+        else:
+            self.state = {"cities": {}, "run": None}
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def start_run(self):
+        """
+        Resume an unfinished run, or start a new one. Returns the cities already completed.
+
+        A run left unfinished for longer than one schedule interval is abandoned, so a
+        city that keeps failing cannot stop later runs from scraping the others.
+        """
+        with self.lock:
+            run = self.state.get("run")
+            if run is not None and not run.get("finished"):
+                age = _now() - datetime.fromisoformat(run["started_at"])
+                if age > timedelta(hours=SCRAPE_SCHEDULE_HOURS):
+                    print(f"Abandoning scrape run started at {run['started_at']}; starting a new one")
+                    run = None
+                else:
+                    print(f"Resuming scrape run started at {run['started_at']}")
+            if run is None or run.get("finished"):
+                run = {"started_at": _now().isoformat(), "completed": [], "finished": False}
+                self.state["run"] = run
+                self._save()
+            return set(run["completed"])
+
+    def finish_run(self):
+        with self.lock:
+            self.state["run"]["finished"] = True
+            self._save()
+
+    def past_days(self, city, full_refresh=False):
+        """Days of listings to request: since the city's last success, up to the full window."""
+        last_success = self.state["cities"].get(city, {}).get("last_success")
+        if full_refresh or last_success is None:
+            return SCRAPE_FULL_WINDOW_DAYS
+        elapsed = _now() - datetime.fromisoformat(last_success)
+        return max(1, min(SCRAPE_FULL_WINDOW_DAYS, math.ceil(elapsed.total_seconds() / 86400) + 1))
+
+    def _snapshot_path(self, city):
+        return os.path.join(self.state_dir, "cities", f"{region_slug(city)}.parquet")
+
+    def load_snapshot(self, city):
+        path = self._snapshot_path(city)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def _save_snapshot(self, city, df, started_at):
+        """Drop listings not seen within the full window and write the city's snapshot."""
+        cutoff = pd.Timestamp(started_at) - pd.Timedelta(days=SCRAPE_FULL_WINDOW_DAYS)
+        df = df[pd.to_datetime(df["last_seen"], utc=True) >= cutoff]
+        df.to_parquet(self._snapshot_path(city), index=False)
+
+    def complete_city(self, city, df, started_at):
+        """
+        Merge newly scraped listings into the city's snapshot, drop listings not seen
+        within the full window, save it, and record the city as done for this run.
+        df is None when the city had no new listings since its last success.
+        """
+        previous = self.load_snapshot(city)
+        if df is not None:
+            df = df.assign(last_seen=started_at)
+            if previous is not None:
+                df = pd.concat([previous, df], ignore_index=True)
+                df = df.drop_duplicates(subset="property_url", keep="last")
+        else:
+            df = previous
+        if df is not None:
+            self._save_snapshot(city, df, started_at)
+
+        with self.lock:
+            city_state = self.state["cities"].setdefault(city, {})
+            city_state["last_success"] = started_at.isoformat()
+            city_state.pop("last_failure", None)
+            self.state["run"]["completed"].append(city)
+            self.state["run"].get("failed", {}).pop(city, None)
+            self._save()
+
+    def fail_city(self, city, started_at, reason):
+        """
+        Record a failed scrape without marking the city done, so a re-run retries it
+        and the next success still requests everything since the last success.
+
+        Nothing new was seen, so listings are not pruned as delisted. The previous
+        snapshot is still cut to the full window: listings unseen for that long are
+        dropped on schedule even while a city keeps failing.
+        """
+        previous = self.load_snapshot(city)
+        if previous is not None:
+            self._save_snapshot(city, previous, started_at)
+
+        failure = {"at": started_at.isoformat(), "reason": reason}
+        with self.lock:
+            self.state["cities"].setdefault(city, {})["last_failure"] = failure
+            self.state["run"].setdefault("failed", {})[city] = failure
+            self._save()
+
+    def failed_cities(self):
+        """Cities whose latest scrape in this run failed, with their last success time."""
+        with self.lock:
+            failed = (self.state.get("run") or {}).get("failed", {})
+            return {
+                city: dict(failure, last_success=self.state["cities"].get(city, {}).get("last_success"))
+                for city, failure in failed.items()
+            }
+
+def run_scheduled(cities, scrape_city, checkpoint, full_refresh=False):
+    """
+    Scrape cities concurrently under the shared rate limit, checkpointing each one.
+
+    Args:
+        cities (list): City names to scrape.
+        scrape_city (callable): scrape_city(city, past_days) -> DataFrame of cleaned listings,
+                                or None if the city had no new listings in the window.
+        checkpoint (ScrapeCheckpoint): Local scrape state.
+        full_refresh (bool): Ignore last-success times and request the full window.
+
+    Returns:
+        list: Cities whose scrape raised or stayed throttled after all retries.
+    """
+    bucket = TokenBucket(SCRAPE_RATE_PER_SECOND)
+    completed = checkpoint.start_run()
+    pending = [city for city in cities if city not in completed]
+    if completed:
+        print(f"Skipping {len(completed)} cities finished earlier in this run")
+
+    def worker(city):
+        past_days = checkpoint.past_days(city, full_refresh)
+        for attempt in range(SCRAPE_MAX_RETRIES):
+            bucket.acquire()
+            started_at = _now()
+            print(f"Scraping listings for {city} (past {past_days} days)...")
+            try:
+                df = scrape_city(city, past_days)
+            except Exception as e:
+                if is_throttled(e):
+                    delay = bucket.throttled(attempt)
+                    print(f"Throttled scraping {city}; backing off {delay:.0f}s")
+                    continue
+                print(f"Failed to scrape {city}: {e}")
+                checkpoint.fail_city(city, started_at, str(e))
+                return False
+            bucket.succeeded()
+            checkpoint.complete_city(city, df, started_at)
+            return True
+        print(f"Giving up on {city} after {SCRAPE_MAX_RETRIES} throttled attempts")
+        checkpoint.fail_city(city, started_at, "throttled")
+        return False
+
+    with ThreadPoolExecutor(max_workers=SCRAPE_CONCURRENCY) as executor:
+        outcomes = list(executor.map(worker, pending))
+
+    failed = [city for city, ok in zip(pending, outcomes) if not ok]
+    if not failed:
+        checkpoint.finish_run()
+    return failed
+
+
+def _now():
+    return datetime.now(timezone.utc)
@@ -1,106 +1,74 @@
-import pandas as pd
-import boto3
-from datetime import datetime
-from io import StringIO
+import os
 from homeharvest import scrape_property
-from .commute import nearest_region
-from config.constants import CITY_CENTERS, MAX_DISTANCE_KM
+from .postprocess import clean_city_listings, combine_snapshots
+from .artifacts import S3ArtifactStore, LocalArtifactStore, write_region_artifacts
+from .scheduler import ScrapeCheckpoint, run_scheduled
+from config.constants import CITY_CENTERS
 
-def scrape_and_save_to_s3(s3_bucket, s3_key, region_name="us-east-1"):
+def scrape_city(city, past_days):
     """
-    Scrapes rental listings, processes the data, and saves it as a CSV file to S3.
-    
+    Scrapes and cleans rental listings for one city.
+
     Args:
-        s3_bucket (str): The name of the S3 bucket.
-        s3_key (str): The object key (path and filename) for the CSV in S3.
-        region_name (str): The AWS region for the S3 bucket.
-        
+        city (str): City to scrape.
+        past_days (int): How many days of listings to request.
+
     Returns:
-        bool: True if data was successfully scraped and saved, False otherwise.
+        DataFrame: Cleaned listings, or None if the city had no new usable listings.
     """
-    all_properties = []
-    s3_client = boto3.client('s3', region_name=region_name)
-
-    # I tried using concurrency and got 403 errors
-    for city in CITY_CENTERS.keys():
-        print(f"Scraping listings for {city}...")
-        try:
-            df = scrape_property(
-                location=city,
-                listing_type="for_rent",
-                past_days=60
-            )
-            
-            if df.empty:
-                print(f"No listings returned for {city}")
-                continue
-
-            # Remove rows missing latitude or longitude
-            df = df.dropna(subset=["latitude", "longitude"])
-            if df.empty:
-                print(f"No valid coordinates for {city}")
-                continue
-
-            # Fill NaNs for full_baths and half_baths with 0 and ensure numeric type
-            if 'full_baths' in df.columns:
-                df['full_baths'] = pd.to_numeric(df['full_baths'], errors='coerce').fillna(0).astype(int)
-            if 'half_baths' in df.columns:
-                df['half_baths'] = pd.to_numeric(df['half_baths'], errors='coerce').fillna(0).astype(int)
-
-            # Compute region and distance
-            df['region'], df['distance_to_city'] = zip(*df.apply(
-                lambda row: nearest_region(row['latitude'], row['longitude']), axis=1
-            ))
+    df = scrape_property(
+        location=city,
+        listing_type="for_rent",
+        past_days=past_days
+    )
+    return clean_city_listings(df, city)
+
+def scrape_and_save_to_s3(s3_bucket, s3_prefix="listings", region_name="us-east-1", local_dir=None,
+                          state_dir=".scrape_state", full_refresh=False):
+    """
+    Scrapes rental listings, processes the data, and saves it to S3 as one Parquet
+    file per region plus a manifest of row counts and content hashes.
 
-            # Filter by max distance
-            df = df[df['distance_to_city'] <= MAX_DISTANCE_KM]
-            if df.empty:
-                print(f"No listings within {MAX_DISTANCE_KM} kilometers for {city}")
-                continue
+    Cities are scraped concurrently under a shared rate limit. Each finished city is
+    checkpointed in state_dir, so a crashed run resumes with the unfinished cities, and
+    each city only requests listings since its last successful scrape.
 
-            df['last_updated'] = datetime.utcnow()
-            all_properties.append(df)
-            print(f"Scraped {len(df)} listings for {city}")
+    Args:
+        s3_bucket (str): The name of the S3 bucket.
+        s3_prefix (str): Key prefix for the region files and manifest in S3.
+        region_name (str): The AWS region for the S3 bucket.
+        local_dir (str): If given, write artifacts to this directory instead of S3.
+        state_dir (str): Directory for checkpoints and per-city listing snapshots.
+        full_refresh (bool): Request the full listing window for every city.
 
-        except Exception as e:
-            print(f"Failed to scrape {city}: {e}")
-    
+    Returns:
+        bool: True if data was successfully scraped and saved, False otherwise.
+    """
+    if local_dir:
+        store = LocalArtifactStore(local_dir)
+    else:
+        store = S3ArtifactStore(s3_bucket, s3_prefix, region_name=region_name)
+
+    checkpoint = ScrapeCheckpoint(state_dir)
+    failed = run_scheduled(list(CITY_CENTERS.keys()), scrape_city, checkpoint, full_refresh=full_refresh)
+    if failed:
+        print(f"Failed to scrape {len(failed)} cities; re-run to resume: {', '.join(failed)}")
+
+    # Snapshots hold every listing seen within the window, including earlier increments
+    all_properties = [
+        snapshot for snapshot in (checkpoint.load_snapshot(city) for city in CITY_CENTERS.keys())
+        if snapshot is not None and not snapshot.empty
+    ]
     if not all_properties:
         print("No data scraped. Aborting S3 upload.")
         return False
 
-    # Combine all city data
-    combined_df = pd.concat(all_properties, ignore_index=True)
-
-    # Remove duplicate listings based on property URL
-    combined_df = combined_df.drop_duplicates(subset='property_url', keep='first')
-
-    # Add sequential ID
-    combined_df = combined_df.assign(id=range(1, len(combined_df) + 1))
-
-    # Final columns to include (only those that exist in the DataFrame)
-    desired_columns = [
-        'id', 'property_url', 'latitude', 'longitude', 'beds', 'full_baths',
-        'half_baths', 'list_price', 'formatted_address', 'city', 'region', 'primary_photo'
-    ]
-    
-    # Drop rows missing essential columns (but keep full_baths and half_baths after fillna)
-    essential_columns = [col for col in desired_columns if col not in ('full_baths', 'half_baths')]
-    combined_df = combined_df.dropna(subset=essential_columns)
-
-    filtered_df = combined_df[[col for col in desired_columns if col in combined_df.columns]]
-
-    # Convert to CSV and upload to S3
-    csv_buffer = StringIO()
-    filtered_df.to_csv(csv_buffer, index=False)
+    filtered_df = combine_snapshots(all_properties)
 
+    # Write per-region Parquet files and the manifest
     try:
-        s3_client.put_object(
-            Bucket=s3_bucket,
-            Key=s3_key,
-            Body=csv_buffer.getvalue()
-        )
-        print(f"Successfully uploaded {len(filtered_df)} listings to S3 bucket {s3_bucket} at key {s3_key}.")
+        write_region_artifacts(filtered_df, store, failed_cities=checkpoint.failed_cities())
+        print(f"Successfully saved {len(filtered_df)} listings to {store.describe()}.")
         return True
     except Exception as e:
         print(f"Failed to upload to S3: {e}")
@@ -109,5 +77,7 @@ def scrape_and_save_to_s3(s3_bucket, s3_key, region_name="us-east-1"):
 if __name__ == "__main__":
     scrape_and_save_to_s3(
         s3_bucket="commute-rental-listings",
-        s3_key="rental_listings.csv"
-    )
\ No newline at end of file
+        s3_prefix="listings",
+        local_dir=os.environ.get("LOCAL_ARTIFACT_DIR"),
+        full_refresh=os.environ.get("FULL_REFRESH") == "1"
+    )
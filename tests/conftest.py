@@ -0,0 +1,39 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mirror the Lambda container layout: lambda/ modules import flat, config/ and geo/ as packages
+sys.path[:0] = [os.path.join(REPO_ROOT, "lambda"), REPO_ROOT]
+# update_db modules also import flat; appended so the API Lambda's db module keeps precedence
+sys.path.append(os.path.join(REPO_ROOT, "update_db"))
+
+
+@pytest.fixture
+def pg_engine():
+    """
+    psycopg2 engine on a throwaway schema of the scratch database in TEST_DB_URL
+    (libpq URL); tests using it are skipped when it is not set.
+    """
+    url = os.environ.get("TEST_DB_URL")
+    if not url:
+        pytest.skip("TEST_DB_URL is not set")
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.engine import make_url
+
+    url = make_url(url).set(drivername="postgresql+psycopg2")
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
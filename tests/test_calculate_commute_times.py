@@ -0,0 +1,97 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import calculate_commute_times
+import config.distance_matrix
+import governor
+import runtime
+from config.constants import MAX_MATRIX_ELEMENTS, MAX_MATRIX_ORIGINS
+
+
+def _origin(i):
+    return (47.0 + i / 1000, -122.0)
+
+
+def _destination(j):
+    return (48.0 + j, -121.0)
+
+
+def _index(coord, base):
+    return round((float(coord.split(",")[0]) - base) * 1000)
+
+
+class FakeMatrix:
+    """Distance Matrix endpoint answering (origin index * 100 + destination index) seconds."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def handle(self, request):
+        origins = request.query["origins"].split("|")
+        destinations = request.query["destinations"].split("|")
+        self.requests.append((len(origins), len(destinations)))
+        rows = []
+        for origin in origins:
+            i = _index(origin, 47.0)
+            elements = []
+            for j in range(len(destinations)):
+                if i % 7 == 3 and j == 1:
+                    elements.append({"status": "ZERO_RESULTS"})
+                elif i % 11 == 5:
+                    elements.append({"status": "NOT_FOUND"})
+                else:
+                    elements.append({"status": "OK", "duration": {"value": i * 100 + j}})
+            # One origin's row comes back short, as a partial response would
+            rows.append({"elements": elements[:-1] if i == 42 else elements})
+        return web.json_response({"status": "OK", "rows": rows})
+
+
+def _compute(origins, destinations, monkeypatch):
+    fake = FakeMatrix()
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/distancematrix/json", fake.handle)
+        server = TestServer(app)
+        await server.start_server()
+        monkeypatch.setattr(calculate_commute_times, "DISTANCE_MATRIX_URL", str(server.make_url("/distancematrix/json")))
+        monkeypatch.setattr(config.distance_matrix, "GOOGLE_API_KEY", "test")
+        try:
+            return await calculate_commute_times.compute_commute_matrix(origins, destinations)
+        finally:
+            await server.close()
+
+    governor.start_request()
+    return runtime.run(scenario()), fake.requests
+
+
+@pytest.mark.parametrize("n_destinations", [1, 3, 5])
+def test_batches_respect_origin_and_element_limits(n_destinations, monkeypatch):
+    origins = [_origin(i) for i in range(60)]
+    destinations = [_destination(j) for j in range(n_destinations)]
+    matrix, requests = _compute(origins, destinations, monkeypatch)
+
+    assert all(n_origins <= MAX_MATRIX_ORIGINS for n_origins, _ in requests)
+    assert all(n_origins * n_dest <= MAX_MATRIX_ELEMENTS for n_origins, n_dest in requests)
+    assert sum(n_origins for n_origins, _ in requests) == len(origins)
+    per_request = min(MAX_MATRIX_ORIGINS, MAX_MATRIX_ELEMENTS // n_destinations)
+    assert len(requests) == -(-len(origins) // per_request)
+    assert len(matrix) == len(origins) and all(len(row) == n_destinations for row in matrix)
+
+
+def test_rows_map_back_to_origins_and_destinations(monkeypatch):
+    origins = [_origin(i) for i in range(60)]
+    destinations = [_destination(j) for j in range(3)]
+    matrix, _ = _compute(origins, destinations, monkeypatch)
+
+    for i, row in enumerate(matrix):
+        for j, element in enumerate(row):
+            if i == 42 and j == 2:
+                assert element == (None, "MISSING")
+            elif i % 7 == 3 and j == 1:
+                assert element == (None, "ZERO_RESULTS")
+            elif i % 11 == 5:
+                assert element == (None, "NOT_FOUND")
+            else:
+                assert element == (i * 100 + j, "OK")
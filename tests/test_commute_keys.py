@@ -0,0 +1,23 @@
+from config.commute_keys import cell_cache_key, cell_center, commute_cache_key, destination_cell
+from config.distance_matrix import CommuteElement, parse_matrix
+
+
+def test_precompute_keys_match_request_keys():
+    origin, destination = (47.65766, -122.37319), (47.6062, -122.3321)
+    cell = destination_cell(destination)
+    for mode in ("walking", "transit"):
+        # update_db looks cells up by cell id; requests by the destination inside it
+        assert cell_cache_key(origin, cell, mode) == commute_cache_key(origin, destination, mode)
+        assert cell_cache_key(origin, cell, mode) == commute_cache_key(origin, cell_center(cell), mode)
+
+
+def test_parse_matrix_marks_missing_elements():
+    data = {"rows": [
+        {"elements": [{"status": "OK", "duration": {"value": 60}}, {"status": "ZERO_RESULTS"}]},
+        {"elements": [{"status": "OK", "duration": {"value": 90}}]}
+    ]}
+    assert parse_matrix(data, 3, 2) == [
+        [CommuteElement(60, "OK"), CommuteElement(None, "ZERO_RESULTS")],
+        [CommuteElement(90, "OK"), CommuteElement(None, "MISSING")],
+        [CommuteElement(None, "MISSING"), CommuteElement(None, "MISSING")]
+    ]
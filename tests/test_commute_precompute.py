@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+import runtime
+import commute_grid
+from commute_precompute import busiest_cells
+from config.constants import COMMUTE_GRID_MAX_CELLS, COMMUTE_GRID_MIN_DEMAND
+from config.db_schema import commute_demand
+from destinations import Destination
+
+
+def _demand(region, cell_lat, requests, mode="driving"):
+    return {
+        "region": region, "cell_lat": cell_lat, "cell_lon": 0, "mode": mode,
+        "day": datetime.now(timezone.utc).date(), "requests": requests
+    }
+
+
+def test_busy_region_does_not_crowd_out_the_others(pg_engine):
+    busy = [_demand("Seattle, WA", i, 1000 + i) for i in range(3 * COMMUTE_GRID_MAX_CELLS)]
+    quiet = [_demand("Austin, TX", i, COMMUTE_GRID_MIN_DEMAND + i) for i in range(3)]
+    below = [_demand("New York, NY", 0, COMMUTE_GRID_MIN_DEMAND - 1)]
+    with pg_engine.begin() as conn:
+        commute_demand.create(conn)
+        conn.execute(commute_demand.insert(), busy + quiet + below)
+        selected = busiest_cells(conn)
+
+    per_region = {}
+    for region, _, _, _ in selected:
+        per_region[region] = per_region.get(region, 0) + 1
+    assert per_region == {"Seattle, WA": COMMUTE_GRID_MAX_CELLS, "Austin, TX": 3}
+    # Each region keeps its busiest cells, and the result stays busiest first
+    seattle = [cell[0] for region, cell, _, _ in selected if region == "Seattle, WA"]
+    assert sorted(seattle) == list(range(2 * COMMUTE_GRID_MAX_CELLS, 3 * COMMUTE_GRID_MAX_CELLS))
+    demands = [demand for _, _, _, demand in selected]
+    assert demands == sorted(demands, reverse=True)
+
+
+def test_demand_is_recorded_under_the_cells_region(monkeypatch):
+    async def no_flush():
+        pass
+
+    monkeypatch.setattr(commute_grid, "_flush_demand", no_flush)
+    monkeypatch.setattr(commute_grid, "_pending_demand", commute_grid.Counter())
+    runtime.run(commute_grid.record_demand([
+        Destination("office", (47.6062, -122.3321), "transit", 1.0),
+        Destination("friend", (30.2672, -97.7431), "driving", 1.0),
+        Destination("nowhere", (0.0, 0.0), "driving", 1.0)
+    ]))
+    assert sorted(key[0] for key in commute_grid._pending_demand) == ["Austin, TX", "Seattle, WA"]
@@ -0,0 +1,137 @@
+import asyncio
+import random
+import pytest
+import commute_sort
+import governor
+from config.constants import COMMUTE_SORT_MAX_CANDIDATES, MAX_DESTINATIONS
+from destinations import Destination
+from listing_row import ListingRow, LISTING_COLUMNS
+from utils.distance_utils import geodesic_distances
+
+USER = (47.6062, -122.3321)
+N_LISTINGS = 3000
+PAGE_SIZE = 20
+
+
+def _listings(n, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        values = dict.fromkeys(LISTING_COLUMNS)
+        values.update(id=i, latitude=USER[0] + rng.uniform(-0.2, 0.2), longitude=USER[1] + rng.uniform(-0.3, 0.3))
+        rows.append(tuple(values[name] for name in LISTING_COLUMNS))
+    distances = geodesic_distances(*USER, [r[LISTING_COLUMNS.index("latitude")] for r in rows],
+                                   [r[LISTING_COLUMNS.index("longitude")] for r in rows])
+    return rows, dict(zip(range(1, n + 1), distances.tolist()))
+
+
+@pytest.fixture
+def region(monkeypatch):
+    """N_LISTINGS listings served nearest-first; walking commutes of 6 km/h plus up to 3 hours."""
+    rows, distances = _listings(N_LISTINGS)
+    rng = random.Random(1)
+    seconds = {i: round(distances[i] / 6 * 3600 + rng.uniform(0, 3 * 3600)) for i in distances}
+
+    async def get_listings(user_lat, user_lon, city, filters, sort_by, ascending, page, page_size, cursor=None):
+        ordered = sorted(rows, key=lambda r: (distances[r[0]], r[0]), reverse=not ascending)
+        if cursor is not None:
+            last = (cursor["last_key"], cursor["last_id"])
+            ordered = [r for r in ordered if ((distances[r[0]], r[0]) > last if ascending else (distances[r[0]], r[0]) < last)]
+        page_rows = []
+        for raw in ordered[:page_size]:
+            row = ListingRow(raw, distances[raw[0]])
+            row.distance_kilometers = row.sort_key
+            page_rows.append(row)
+        return page_rows, len(rows)
+
+    async def lookup(origins, pairs):
+        ids = {(row[LISTING_COLUMNS.index("latitude")], row[LISTING_COLUMNS.index("longitude")]): row[0] for row in rows}
+        return [[seconds[ids[origin]]] for origin in origins]
+
+    async def estimate(origins, pairs, region):
+        return [[0] for _ in origins]
+
+    async def fill_unavailable(matrix, origins, pairs, region):
+        return matrix, [False] * len(matrix)
+
+    async def version():
+        return 1
+
+    async def check_cursor_version(cursor):
+        return None
+
+    monkeypatch.setattr(commute_sort, "get_listings", get_listings)
+    monkeypatch.setattr(commute_sort, "estimate_commute_matrix", estimate)
+    monkeypatch.setattr(commute_sort, "fill_unavailable", fill_unavailable)
+    monkeypatch.setattr(commute_sort, "get_dataset_version", version)
+    monkeypatch.setattr(commute_sort, "check_cursor_version", check_cursor_version)
+    return lookup, seconds, distances
+
+
+def _page(lookup, page, ascending=True):
+    destinations = [Destination("home", USER, "walking", 1.0)]
+    return asyncio.run(commute_sort.get_listings_by_commute(
+        destinations, "Seattle, WA", {}, ascending, page, PAGE_SIZE, lookup=lookup
+    ))
+
+
+def test_first_page_is_globally_ordered(region):
+    lookup, seconds, _ = region
+    rows, total, truncated, _ = _page(lookup, 1)
+    expected = sorted(seconds, key=lambda i: (seconds[i], i))[:PAGE_SIZE]
+    assert [row.id for row in rows] == expected
+    assert total == N_LISTINGS
+    assert not truncated
+
+
+def test_pages_past_the_candidate_cap_are_truncated(region):
+    lookup, seconds, distances = region
+    pool = sorted(distances, key=lambda i: (distances[i], i))[:COMMUTE_SORT_MAX_CANDIDATES]
+    ranked_pool = sorted(pool, key=lambda i: (seconds[i], i))
+
+    rows, total, truncated, has_more = _page(lookup, 20)
+    assert truncated
+    assert total == COMMUTE_SORT_MAX_CANDIDATES
+    assert [row.id for row in rows] == ranked_pool[19 * PAGE_SIZE:20 * PAGE_SIZE]
+    assert has_more
+
+    last_page = COMMUTE_SORT_MAX_CANDIDATES // PAGE_SIZE
+    rows, total, truncated, has_more = _page(lookup, last_page)
+    assert truncated and len(rows) == PAGE_SIZE and not has_more
+
+    for page in (26, 40):
+        rows, total, truncated, has_more = _page(lookup, page)
+        assert rows == [] and truncated and total == COMMUTE_SORT_MAX_CANDIDATES and not has_more
+
+
+def test_longest_first_ranks_the_capped_pool(region):
+    lookup, seconds, distances = region
+    # Longest-first pools the farthest listings
+    pool = sorted(distances, key=lambda i: (distances[i], i), reverse=True)[:COMMUTE_SORT_MAX_CANDIDATES]
+    rows, total, truncated, _ = _page(lookup, 1, ascending=False)
+    assert truncated
+    assert total == COMMUTE_SORT_MAX_CANDIDATES
+    assert [row.id for row in rows] == sorted(pool, key=lambda i: (seconds[i], i), reverse=True)[:PAGE_SIZE]
+
+
+@pytest.mark.parametrize("n_destinations", [2, MAX_DESTINATIONS])
+def test_multi_destination_sort_stays_within_the_request_budget(region, n_destinations):
+    lookup, _, _ = region
+    refused = []
+
+    async def metered_lookup(origins, pairs):
+        # Worst case: every element is a cache miss billed to the request
+        if not governor.reserve_elements(len(origins) * len(pairs)):
+            refused.append(len(origins))
+        times = await lookup(origins, pairs[:1])
+        return [row * len(pairs) for row in times]
+
+    destinations = [Destination(f"stop {i}", USER, "walking", 1.0 + i) for i in range(n_destinations)]
+    governor.start_request()
+    # Longest-first ranks the whole capped pool, the most lookups a sort can make
+    rows, _, truncated, _ = asyncio.run(commute_sort.get_listings_by_commute(
+        destinations, "Seattle, WA", {}, False, 1, PAGE_SIZE, sort_by="commute_score", lookup=metered_lookup
+    ))
+    assert truncated and len(rows) == PAGE_SIZE
+    assert refused == []
+    assert not governor.request_degraded()
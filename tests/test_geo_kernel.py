@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import geo.kernel as kernel
+from config.constants import CITY_CENTERS
+
+geopy_distance = pytest.importorskip("geopy.distance")
+
+# Within a few meters of geopy, far below the precision listings are shown or filtered at
+TOLERANCE_KM = 0.005
+
+
+def _points(n=500, seed=0):
+    """Random points around the supported metros, plus some anywhere in the contiguous US."""
+    rng = np.random.default_rng(seed)
+    centers = np.array(list(CITY_CENTERS.values()))
+    near = centers[rng.integers(len(centers), size=n)] + rng.uniform(-1.0, 1.0, size=(n, 2))
+    anywhere = np.column_stack([rng.uniform(25, 49, n // 5), rng.uniform(-124, -67, n // 5)])
+    return np.vstack([near, anywhere])
+
+
+def test_geodesic_km_matches_geopy():
+    points = _points()
+    origins, destinations = points[:-1], points[1:]
+    ours = kernel.geodesic_km(origins[:, 0], origins[:, 1], destinations[:, 0], destinations[:, 1])
+    theirs = [geopy_distance.geodesic(tuple(a), tuple(b)).km for a, b in zip(origins, destinations)]
+    assert np.max(np.abs(ours - np.array(theirs))) < TOLERANCE_KM
+
+
+def test_geodesic_km_of_a_point_to_itself_is_zero():
+    assert kernel.geodesic_km(47.6, -122.3, 47.6, -122.3) == 0.0
+
+
+@pytest.mark.parametrize("use_tree", [True, False])
+def test_nearest_city_center_matches_geopy(monkeypatch, use_tree):
+    if use_tree:
+        pytest.importorskip("scipy.spatial")
+    else:
+        monkeypatch.setattr(kernel, "cKDTree", None)
+    index = kernel.CenterIndex(CITY_CENTERS)
+    points = _points(seed=1)
+    names, distances = index.nearest(points[:, 0], points[:, 1])
+
+    for point, name, distance in zip(points, names, distances):
+        expected = {city: geopy_distance.geodesic(tuple(point), center).km for city, center in CITY_CENTERS.items()}
+        nearest = min(expected, key=expected.get)
+        assert name == nearest
+        assert abs(distance - expected[nearest]) < TOLERANCE_KM
@@ -0,0 +1,37 @@
+import pytest
+
+from geocoding import normalize_address
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("123 Main St Apt 4B, Seattle, WA 98101", "123 main st seattle wa 98101"),
+    ("123 Main St #4, Seattle, WA", "123 main st seattle wa"),
+    ("123 Main St, Apt 4, Seattle, WA", "123 main st seattle wa"),
+    ("123 Main St, Ste 200, Seattle, WA 98101", "123 main st seattle wa 98101"),
+    ("500 Pine St Suite B, Seattle, WA", "500 pine st seattle wa"),
+    ("500 Pine St Ste. 200, Seattle, WA", "500 pine st seattle wa"),
+    ("500 Pine St Fl 3, Seattle, WA", "500 pine st seattle wa"),
+    ("  123  MAIN st.,  Seattle ,WA ", "123 main st seattle wa"),
+])
+def test_unit_designators_are_removed(address, expected):
+    assert normalize_address(address) == expected
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("100 Biscayne Blvd, Miami, FL 33132", "100 biscayne blvd miami fl 33132"),
+    ("200 Ste Marie Rd, Montreal, QC", "200 ste marie rd montreal qc"),
+    ("5 Unit Rd, Denver CO", "5 unit rd denver co"),
+    ("12 Floor St, Unit City, UT 84000", "12 floor st unit city ut 84000"),
+])
+def test_street_names_and_states_are_kept(address, expected):
+    assert normalize_address(address) == expected
+
+
+def test_distinct_addresses_keep_distinct_keys():
+    pairs = [
+        ("100 Biscayne Blvd, Miami, FL 33132", "100 Biscayne Blvd, Miami, FL 33131"),
+        ("200 Ste Marie Rd, Montreal, QC", "200 Rd, Montreal, QC"),
+        ("5 Unit Rd, Denver CO", "5, Denver CO"),
+    ]
+    for first, second in pairs:
+        assert normalize_address(first) != normalize_address(second)
@@ -0,0 +1,118 @@
+import pandas as pd
+from sqlalchemy import select
+
+from config.db_schema import listings, dataset_version
+from listings_sync import DATA_COLUMNS, sync_listings, sync_listing_chunks, changed_regions, validate_chunk
+
+
+def _listing(url, region="Seattle, WA", price=2000.0, full_baths=1, half_baths=0):
+    return {
+        "formatted_address": f"{url} Main St", "city": region.split(",")[0], "region": region,
+        "list_price": price, "beds": 2, "full_baths": full_baths, "half_baths": half_baths,
+        "property_url": url, "primary_photo": None, "latitude": 47.6, "longitude": -122.3
+    }
+
+
+def _frame(*rows):
+    return pd.DataFrame(list(rows))
+
+
+def _stored(engine):
+    with engine.connect() as conn:
+        query = select(listings.c.property_url, listings.c.id, listings.c.region, listings.c.list_price)
+        return {row.property_url: row for row in conn.execute(query)}
+
+
+def _version(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(dataset_version.c.version)).scalar()
+
+
+def test_merge_inserts_updates_and_deletes_in_place(pg_engine):
+    sync_listings(pg_engine, _frame(_listing("a"), _listing("b"), _listing("c")))
+    before = _stored(pg_engine)
+
+    counts = sync_listings(pg_engine, _frame(_listing("a"), _listing("b", price=2500.0), _listing("d"), _listing("a")))
+    after = _stored(pg_engine)
+    assert counts == {**counts, "inserted": 1, "updated": 1, "deleted": 1, "rows": 4}
+    assert set(after) == {"a", "b", "d"}
+    # Existing listings keep their ids; the repeated property_url is loaded once
+    assert after["a"].id == before["a"].id and after["b"].id == before["b"].id
+    assert after["b"].list_price == 2500.0
+
+
+def test_region_load_only_deletes_within_its_regions(pg_engine):
+    sync_listings(pg_engine, _frame(_listing("a"), _listing("p", region="Portland, OR")))
+    counts = sync_listings(pg_engine, _frame(_listing("b")), manifest_entries={"Seattle, WA": {"sha256": "s1", "rows": 1}})
+    assert counts["deleted"] == 1
+    assert set(_stored(pg_engine)) == {"b", "p"}
+
+
+def test_empty_region_deletes_its_listings_and_records_the_hash(pg_engine):
+    sync_listings(pg_engine, _frame(_listing("a"), _listing("p", region="Portland, OR")))
+    version = _version(pg_engine)
+    manifest = {"regions": {"Seattle, WA": {"sha256": "empty", "rows": 0}}}
+
+    changed = changed_regions(pg_engine, manifest)
+    counts = sync_listing_chunks(pg_engine, iter([]), manifest_entries=changed)
+    assert counts["rows"] == 0 and counts["deleted"] == 1
+    assert set(_stored(pg_engine)) == {"p"}
+    assert _version(pg_engine) == version + 1
+    # The next load skips the region instead of repeating the no-op
+    assert changed_regions(pg_engine, manifest) == {}
+
+
+def test_empty_full_snapshot_changes_nothing(pg_engine):
+    sync_listings(pg_engine, _frame(_listing("a")))
+    version = _version(pg_engine)
+    counts = sync_listing_chunks(pg_engine, iter([]))
+    assert counts["rows"] == 0 and counts["deleted"] == 0
+    assert set(_stored(pg_engine)) == {"a"}
+    assert _version(pg_engine) == version
+
+
+def test_changed_regions_skips_loaded_hashes(pg_engine):
+    entries = {"Seattle, WA": {"sha256": "s1", "rows": 1}}
+    sync_listings(pg_engine, _frame(_listing("a")), manifest_entries=entries)
+    manifest = {"regions": {
+        "Seattle, WA": {"sha256": "s1", "rows": 1},
+        "Portland, OR": {"sha256": "p1", "rows": 3}
+    }}
+    assert list(changed_regions(pg_engine, manifest)) == ["Portland, OR"]
+    manifest["regions"]["Seattle, WA"]["sha256"] = "s2"
+    assert sorted(changed_regions(pg_engine, manifest)) == ["Portland, OR", "Seattle, WA"]
+
+
+def test_validate_chunk_coerces_types_and_rejects_rows_without_url():
+    chunk = pd.DataFrame([
+        {**_listing("a"), "list_price": "1,900", "beds": 2.0, "full_baths": "2"},
+        {**_listing("b"), "beds": 1.5, "half_baths": "one", "extra": "ignored"},
+        {**_listing(None), "list_price": 1000.0},
+    ]).drop(columns=["primary_photo"])
+    validated = validate_chunk(chunk)
+
+    assert list(validated.columns) == DATA_COLUMNS
+    assert list(validated["property_url"]) == ["a", "b"]
+    a, b = validated.iloc[0], validated.iloc[1]
+    assert pd.isna(a["list_price"]) and a["beds"] == 2 and a["full_baths"] == 2
+    assert pd.isna(b["beds"]) and pd.isna(b["half_baths"])
+    assert validated["primary_photo"].isna().all()
+    assert str(validated["beds"].dtype) == "Int64"
+
+
+def test_copy_merge_fills_generated_total_baths(pg_engine):
+    chunks = [
+        _frame(_listing("a", full_baths=2, half_baths=1), _listing(None)),
+        _frame(_listing("b", full_baths=1, half_baths=0), {**_listing("c"), "half_baths": 0.5}),
+    ]
+    counts = sync_listing_chunks(pg_engine, iter(chunks))
+    assert counts["inserted"] == 3 and counts["rows"] == 3
+
+    with pg_engine.connect() as conn:
+        rows = dict(conn.execute(select(listings.c.property_url, listings.c.total_baths)).all())
+    # NULL half baths (a fractional value rejected by validation) leave total_baths NULL
+    assert rows == {"a": 2.5, "b": 1.0, "c": None}
+
+    sync_listings(pg_engine, _frame(_listing("a", full_baths=3, half_baths=0), _listing("b"), _listing("c")))
+    with pg_engine.connect() as conn:
+        assert conn.execute(select(listings.c.total_baths).where(listings.c.property_url == "a")).scalar() == 3.0
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+import memory_listings
+from check_inputs import check_inputs
+from listing_row import ListingRow, LISTING_COLUMNS
+from listings import build_next_cursor
+from pagination import decode_cursor
+
+PAGE_SIZE = 3
+
+
+def _region():
+    """Nine listings; ids 3, 6 and 9 have no list_price."""
+    rows = []
+    for i in range(1, 10):
+        values = dict.fromkeys(LISTING_COLUMNS)
+        values.update(id=i, list_price=None if i % 3 == 0 else 1000.0 + 100 * (i % 4), beds=2, full_baths=1,
+                       half_baths=0, total_baths=1.0, latitude=47.6 + i / 1000, longitude=-122.3)
+        rows.append(tuple(values[name] for name in LISTING_COLUMNS))
+    return memory_listings.RegionListings(rows, version=1)
+
+
+@pytest.fixture
+def region(monkeypatch):
+    loaded = _region()
+
+    async def load_region(region):
+        return loaded
+
+    async def check_cursor_version(cursor):
+        return None
+
+    monkeypatch.setattr(memory_listings, "_load_region", load_region)
+    monkeypatch.setattr(memory_listings, "check_cursor_version", check_cursor_version)
+    return loaded
+
+
+def _walk(ascending):
+    """Page through the region by cursor, as a client would."""
+    ids, token = [], None
+    while True:
+        cursor = None
+        if token is not None:
+            cursor = check_inputs({"user_address": "x", "sort_by": "list_price", "ascending": ascending,
+                                   "cursor": token})["cursor"]
+        rows, _ = asyncio.run(memory_listings.get_memory_listings(
+            47.6, -122.3, "Seattle, WA", {}, "list_price", ascending, 1, PAGE_SIZE, cursor=cursor
+        ))
+        ids += [row.id for row in rows]
+        token = build_next_cursor(rows, "list_price", ascending, PAGE_SIZE, version=1)
+        if token is None:
+            return ids
+
+
+def test_cursor_round_trips_a_null_sort_key():
+    row = ListingRow(tuple(6 if name == "id" else None for name in LISTING_COLUMNS), sort_key=None)
+    token = build_next_cursor([row], "list_price", True, 1, version=4)
+    assert decode_cursor(token) == {"sort_by": "list_price", "ascending": True, "last_key": None,
+                                    "last_id": 6, "version": 4}
+
+
+def test_null_cursor_rejected_for_sorts_without_nulls():
+    row = ListingRow(tuple(6 if name == "id" else None for name in LISTING_COLUMNS), sort_key=None)
+    token = build_next_cursor([row], "distance", True, 1, version=4)
+    with pytest.raises(ValueError):
+        check_inputs({"user_address": "x", "sort_by": "distance", "cursor": token})
+
+
+@pytest.mark.parametrize("ascending", [True, False])
+def test_pages_cross_null_sort_keys(region, ascending):
+    # Ascending: priced listings by (price, id), then NULLs by id; descending is the reverse
+    priced = sorted((i for i in range(1, 10) if i % 3), key=lambda i: (1000 + 100 * (i % 4), i))
+    expected = priced + [3, 6, 9]
+    if not ascending:
+        expected = expected[::-1]
+    # Pages of three put a NULL key on a page boundary in both directions
+    assert _walk(ascending) == expected
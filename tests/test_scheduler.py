@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+import pandas as pd
+
+from config.constants import SCRAPE_FULL_WINDOW_DAYS, SCRAPE_SCHEDULE_HOURS
+from scraping import scheduler
+from scraping.scheduler import ScrapeCheckpoint, run_scheduled
+
+
+def _listings(*urls):
+    return pd.DataFrame({"property_url": list(urls), "list_price": [1000.0] * len(urls)})
+
+
+def _at(monkeypatch, when):
+    monkeypatch.setattr(scheduler, "_now", lambda: when)
+
+
+def test_empty_increment_is_a_success(tmp_path, monkeypatch):
+    checkpoint = ScrapeCheckpoint(str(tmp_path))
+    start = scheduler._now()
+    _at(monkeypatch, start)
+    assert run_scheduled(["A"], lambda city, days: _listings("a1", "a2"), checkpoint) == []
+
+    # No new listings since the last success: the snapshot is kept and the run finishes
+    later = start + timedelta(days=1)
+    _at(monkeypatch, later)
+    assert run_scheduled(["A"], lambda city, days: None, checkpoint) == []
+    assert checkpoint.state["cities"]["A"]["last_success"] == later.isoformat()
+    assert checkpoint.state["run"]["finished"]
+    assert set(checkpoint.load_snapshot("A")["property_url"]) == {"a1", "a2"}
+
+    # Listings unseen for the full window still age out
+    _at(monkeypatch, start + timedelta(days=SCRAPE_FULL_WINDOW_DAYS + 1))
+    assert run_scheduled(["A"], lambda city, days: None, checkpoint) == []
+    assert checkpoint.load_snapshot("A").empty
+
+
+def test_failed_city_is_recorded_and_retried(tmp_path, monkeypatch):
+    checkpoint = ScrapeCheckpoint(str(tmp_path))
+    start = scheduler._now()
+    _at(monkeypatch, start)
+    run_scheduled(["A"], lambda city, days: _listings("a1"), checkpoint)
+    first_success = checkpoint.state["cities"]["A"]["last_success"]
+
+    def broken(city, days):
+        raise RuntimeError("boom")
+
+    _at(monkeypatch, start + timedelta(hours=1))
+    assert run_scheduled(["A"], broken, checkpoint) == ["A"]
+    city_state = checkpoint.state["cities"]["A"]
+    assert city_state["last_success"] == first_success
+    assert city_state["last_failure"]["reason"] == "boom"
+    assert checkpoint.failed_cities()["A"]["last_success"] == first_success
+    assert not checkpoint.state["run"]["finished"]
+    assert set(checkpoint.load_snapshot("A")["property_url"]) == {"a1"}
+
+    # A re-run within the schedule interval resumes and clears the failure on success
+    _at(monkeypatch, start + timedelta(hours=2))
+    assert run_scheduled(["A"], lambda city, days: _listings("a2"), checkpoint) == []
+    assert "last_failure" not in checkpoint.state["cities"]["A"]
+    assert checkpoint.failed_cities() == {}
+    assert checkpoint.state["run"]["finished"]
+
+
+def test_stale_unfinished_run_is_not_resumed(tmp_path, monkeypatch):
+    checkpoint = ScrapeCheckpoint(str(tmp_path))
+    start = scheduler._now()
+    scraped = []
+
+    def scrape(city, days):
+        scraped.append(city)
+        if city == "B":
+            raise RuntimeError("boom")
+        return _listings(city.lower())
+
+    _at(monkeypatch, start)
+    assert run_scheduled(["A", "B"], scrape, checkpoint) == ["B"]
+
+    # The next scheduled run scrapes every city, not only the one left over
+    scraped.clear()
+    _at(monkeypatch, start + timedelta(hours=SCRAPE_SCHEDULE_HOURS + 1))
+    assert run_scheduled(["A", "B"], scrape, checkpoint) == ["B"]
+    assert sorted(scraped) == ["A", "B"]
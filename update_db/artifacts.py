@@ -0,0 +1,65 @@
+"""
+artifacts.py
+------------
+Reads the per-region Parquet files and manifest written by the scraper,
+from S3 or from a local directory standing in for S3.
+
+Region files are read one row group at a time. Parquet needs random access, so
+S3 objects are first downloaded in parts to a temporary file rather than into memory.
+"""
+
+import json
+import os
+import tempfile
+import boto3
+import pyarrow.parquet as pq
+from config.constants import LOAD_CHUNK_ROWS
+
+MANIFEST_NAME = "manifest.json"
+
+
+class S3ArtifactStore:
+    """Artifact store backed by an S3 bucket and key prefix."""
+
+    def __init__(self, bucket, prefix=""):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client('s3')
+
+    def get(self, name):
+        key = f"{self.prefix}/{name}" if self.prefix else name
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def open(self, name):
+        """Download an object to a temporary file and return it open for reading."""
+        key = f"{self.prefix}/{name}" if self.prefix else name
+        f = tempfile.TemporaryFile()
+        self.client.download_fileobj(self.bucket, key, f)
+        f.seek(0)
+        return f
+
+
+class LocalArtifactStore:
+    """Artifact store backed by a local directory."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def get(self, name):
+        with open(os.path.join(self.root, name), "rb") as f:
+            return f.read()
+
+    def open(self, name):
+        return open(os.path.join(self.root, name), "rb")
+
+
+def load_manifest(store):
+    """Read the manifest describing the current region files."""
+    return json.loads(store.get(MANIFEST_NAME))
+
+
+def iter_region(store, entry, chunk_rows=LOAD_CHUNK_ROWS):
+    """Yield one region's listings as DataFrames of at most chunk_rows rows."""
+    with store.open(entry["key"]) as f:
+        for batch in pq.ParquetFile(f).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
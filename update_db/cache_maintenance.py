@@ -0,0 +1,31 @@
+"""
+cache_maintenance.py
+--------------------
+Keeps the shared commute cache within COMMUTE_CACHE_MAX_ROWS. Runs after each
+load, so API requests never count or trim the table themselves; they only drop
+small batches of expired rows.
+"""
+
+from sqlalchemy import select, delete, func
+from config.db_schema import commute_cache
+from config.constants import COMMUTE_CACHE_MAX_ROWS
+
+
+def trim_commute_cache(engine):
+    """
+    Drop expired commute cache rows, then the soonest-expiring rows beyond the size cap.
+
+    Returns:
+        int: Rows deleted.
+    """
+    with engine.begin() as conn:
+        commute_cache.create(conn, checkfirst=True)
+        deleted = conn.execute(delete(commute_cache).where(commute_cache.c.expires_at <= func.now())).rowcount
+        rows = conn.execute(select(func.count()).select_from(commute_cache)).scalar()
+        excess = rows - COMMUTE_CACHE_MAX_ROWS
+        if excess > 0:
+            oldest = select(commute_cache.c.cache_key).order_by(commute_cache.c.expires_at).limit(excess)
+            deleted += conn.execute(
+                delete(commute_cache).where(commute_cache.c.cache_key.in_(oldest.scalar_subquery()))
+            ).rowcount
+    return deleted
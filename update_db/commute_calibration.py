@@ -0,0 +1,166 @@
+"""
+commute_calibration.py
+----------------------
+Fits the API Lambda's offline commute estimator from commute times the Distance
+Matrix API has already returned, as stored in the shared commute cache. Makes
+no external calls.
+
+For each region and travel mode, commute seconds are modelled as
+intercept + seconds_per_km * straight-line distance, which folds the road/path
+detour factor and the effective mode speed into one slope. Error is measured on a
+held-out fifth of the observations before refitting on all of them.
+
+Usage:
+    python commute_calibration.py    # prints the calibration report as JSON
+"""
+
+import json
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, insert
+from config.db_schema import commute_cache, commute_estimates
+from config.constants import (
+    COMMUTE_CACHE_CELL_DEGREES, COMMUTE_ESTIMATE_DEFAULTS, COMMUTE_ESTIMATE_MIN_SAMPLES,
+    COMMUTE_ESTIMATE_MAX_SAMPLES, COMMUTE_ESTIMATE_HOLDOUT_FRACTION
+)
+from geo.kernel import geodesic_km, nearest_city_center
+
+ALL_REGIONS = "*"
+
+
+def load_observations(engine, limit=COMMUTE_ESTIMATE_MAX_SAMPLES):
+    """
+    Read the most recent commute cache entries as (region, mode, distance_km, seconds).
+
+    Cache keys have the form "lat,lon|cell_lat,cell_lon|mode|arrival_bucket", where
+    the cell indexes a COMMUTE_CACHE_CELL_DEGREES grid around the destination.
+    """
+    query = (
+        select(commute_cache.c.cache_key, commute_cache.c.commute_seconds)
+        # NULL seconds are cached "no route" answers, which say nothing about speed
+        .where(commute_cache.c.commute_seconds.isnot(None))
+        .order_by(commute_cache.c.expires_at.desc())
+        .limit(limit)
+    )
+    with engine.connect() as conn:
+        commute_cache.create(conn, checkfirst=True)
+        df = pd.read_sql(query, conn)
+    if df.empty:
+        return pd.DataFrame(columns=["key", "region", "mode", "distance_km", "seconds"])
+
+    parts = df["cache_key"].str.split("|", expand=True)
+    origin = parts[0].str.split(",", expand=True).astype(float)
+    cell = parts[1].str.split(",", expand=True).astype(float)
+    origin_lat, origin_lon = origin[0].to_numpy(), origin[1].to_numpy()
+    # Cell centers stand in for the exact destination, which the cache does not keep
+    dest_lat = (cell[0].to_numpy() + 0.5) * COMMUTE_CACHE_CELL_DEGREES
+    dest_lon = (cell[1].to_numpy() + 0.5) * COMMUTE_CACHE_CELL_DEGREES
+
+    regions, _ = nearest_city_center(origin_lat, origin_lon)
+    return pd.DataFrame({
+        "key": df["cache_key"],
+        "region": regions,
+        "mode": parts[2],
+        "distance_km": geodesic_km(origin_lat, origin_lon, dest_lat, dest_lon),
+        "seconds": df["commute_seconds"].astype(float)
+    })
+
+
+def fit_commute_model(distance_km, seconds):
+    """
+    Least-squares fit of seconds = intercept + seconds_per_km * distance_km.
+    Falls back to a fit through the origin if the intercept comes out negative.
+
+    Returns:
+        (float, float): Intercept seconds and seconds per km, or None if no positive slope fits.
+    """
+    design = np.column_stack([np.ones_like(distance_km), distance_km])
+    (intercept, slope), *_ = np.linalg.lstsq(design, seconds, rcond=None)
+    if intercept < 0:
+        intercept = 0.0
+        denominator = float(np.dot(distance_km, distance_km))
+        slope = float(np.dot(distance_km, seconds)) / denominator if denominator > 0 else 0.0
+    if not slope > 0:
+        return None
+    return float(intercept), float(slope)
+
+
+def calibration_error(coefficients, distance_km, seconds):
+    """Mean absolute error in seconds and mean absolute percentage error of a fit."""
+    predicted = coefficients[0] + coefficients[1] * distance_km
+    errors = np.abs(predicted - seconds)
+    positive = seconds > 0
+    mape = float(np.mean(errors[positive] / seconds[positive])) if positive.any() else None
+    return float(np.mean(errors)), mape
+
+
+def _calibrate_group(group):
+    """Fit one region/mode group; error comes from a held-out slice chosen by key hash."""
+    distance_km = group["distance_km"].to_numpy(dtype=float)
+    seconds = group["seconds"].to_numpy(dtype=float)
+    holdout = (pd.util.hash_pandas_object(group["key"], index=False).to_numpy() % 100
+               < COMMUTE_ESTIMATE_HOLDOUT_FRACTION * 100)
+
+    if holdout.any() and (~holdout).sum() >= COMMUTE_ESTIMATE_MIN_SAMPLES // 2:
+        trial = fit_commute_model(distance_km[~holdout], seconds[~holdout])
+        mae, mape = calibration_error(trial, distance_km[holdout], seconds[holdout]) if trial else (None, None)
+    else:
+        mae, mape = None, None
+
+    coefficients = fit_commute_model(distance_km, seconds)
+    if coefficients is None:
+        return None
+    return {
+        "intercept_seconds": coefficients[0],
+        "seconds_per_km": coefficients[1],
+        "samples": len(group),
+        "mae_seconds": mae,
+        "mape": mape
+    }
+
+
+def calibrate(engine):
+    """
+    Fit estimator coefficients per region and mode, plus a per-mode fit across all
+    regions, and replace the contents of the commute_estimates table.
+
+    Returns:
+        list: One report entry per fitted (region, mode), including held-out error and
+              the error the uncalibrated default coefficients would have had.
+    """
+    observations = load_observations(engine)
+    report = []
+    for mode, by_mode in observations.groupby("mode"):
+        groups = [(ALL_REGIONS, by_mode)] + list(by_mode.groupby("region"))
+        for region, group in groups:
+            if len(group) < COMMUTE_ESTIMATE_MIN_SAMPLES:
+                continue
+            fitted = _calibrate_group(group)
+            if fitted is None:
+                continue
+            entry = {"region": region, "mode": mode, **fitted}
+            if mode in COMMUTE_ESTIMATE_DEFAULTS:
+                entry["default_mae_seconds"], entry["default_mape"] = calibration_error(
+                    COMMUTE_ESTIMATE_DEFAULTS[mode],
+                    group["distance_km"].to_numpy(dtype=float),
+                    group["seconds"].to_numpy(dtype=float)
+                )
+            report.append(entry)
+
+    columns = {col.name for col in commute_estimates.columns}
+    calibrated_at = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        commute_estimates.create(conn, checkfirst=True)
+        conn.execute(delete(commute_estimates))
+        if report:
+            conn.execute(insert(commute_estimates), [
+                {**{k: v for k, v in entry.items() if k in columns}, "calibrated_at": calibrated_at}
+                for entry in report
+            ])
+    return report
+
+
+if __name__ == "__main__":
+    from db import engine
+    print(json.dumps(calibrate(engine), indent=2))
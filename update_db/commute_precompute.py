@@ -0,0 +1,267 @@
+"""
+commute_precompute.py
+---------------------
+Batch precompute of commute times from listings to the busiest destination cells.
+
+Each region is tiled by the commute cache's destination grid (COMMUTE_CACHE_CELL_DEGREES
+cells within MAX_DISTANCE_KM of its center). Demand for a cell and travel mode is the
+number of API requests to it within COMMUTE_DEMAND_WINDOW_DAYS, as counted in
+commute_demand by the API Lambda under the region nearest the cell, grid hits included.
+For the busiest cells of each region, the commute from every listing in the region to
+the cell center is stored in commute_grid.
+Values already in the commute cache are reused and only the rest go to the Distance
+Matrix API, within COMMUTE_GRID_MAX_ELEMENTS per run.
+
+A cell is recorded in commute_grid_cells once every listing of the current dataset
+version has a row, and only then does the API Lambda join and sort on it.
+
+Usage:
+    python commute_precompute.py    # prints the precompute report as JSON
+"""
+
+import json
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from config.db_schema import (
+    listings, commute_cache, commute_demand, commute_grid, commute_grid_cells, dataset_version
+)
+from config.env import GOOGLE_API_KEY
+from config.constants import (
+    MAX_MATRIX_ORIGINS, COMMUTE_GRID_MAX_CELLS, COMMUTE_GRID_MIN_DEMAND,
+    COMMUTE_GRID_MAX_ELEMENTS, COMMUTE_GRID_CONCURRENCY, COMMUTE_DEMAND_WINDOW_DAYS
+)
+from config.commute_keys import cell_center, cell_cache_key
+from config.distance_matrix import (
+    DISTANCE_MATRIX_URL, NO_ROUTE_STATUSES, format_coords, matrix_params, parse_matrix
+)
+
+
+def _demand_window_start():
+    """First day (UTC) of request counts that still count toward demand."""
+    return datetime.now(timezone.utc).date() - timedelta(days=COMMUTE_DEMAND_WINDOW_DAYS - 1)
+
+
+def busiest_cells(conn):
+    """
+    Rank destination cells by requests within the demand window, separately in each
+    region, so one busy region cannot crowd the others out.
+
+    Returns:
+        list: (region, (cell_lat, cell_lon), mode, demand), at most COMMUTE_GRID_MAX_CELLS
+              per region, busiest first.
+    """
+    demand = func.sum(commute_demand.c.requests)
+    rank = func.row_number().over(
+        partition_by=commute_demand.c.region,
+        order_by=(demand.desc(), commute_demand.c.cell_lat, commute_demand.c.cell_lon, commute_demand.c.mode)
+    )
+    ranked = (
+        select(
+            commute_demand.c.region, commute_demand.c.cell_lat, commute_demand.c.cell_lon, commute_demand.c.mode,
+            demand.label("demand"), rank.label("rank")
+        )
+        .where(commute_demand.c.day >= _demand_window_start())
+        .group_by(commute_demand.c.region, commute_demand.c.cell_lat, commute_demand.c.cell_lon, commute_demand.c.mode)
+        .having(demand >= COMMUTE_GRID_MIN_DEMAND)
+        .subquery()
+    )
+    query = (
+        select(ranked.c.region, ranked.c.cell_lat, ranked.c.cell_lon, ranked.c.mode, ranked.c.demand)
+        .where(ranked.c.rank <= COMMUTE_GRID_MAX_CELLS)
+        .order_by(ranked.c.demand.desc(), ranked.c.region, ranked.c.rank)
+    )
+    return [
+        (row.region, (row.cell_lat, row.cell_lon), row.mode, int(row.demand))
+        for row in conn.execute(query)
+    ]
+
+
+def _fetch_batch(origins, destination, travel_type):
+    """
+    One Distance Matrix request from origins to a single destination.
+
+    Returns:
+        list: Seconds per origin, None for no route, or the string "failed" if the
+              request or element failed and should be retried on a later run.
+    """
+    params = {**matrix_params([destination], travel_type), "origins": format_coords(origins)}
+    url = f"{DISTANCE_MATRIX_URL}?{urllib.parse.urlencode(params)}"
+    try:
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            data = json.loads(resp.read())
+    except Exception as e:
+        print(f"Failed fetching commute grid batch of {len(origins)} origins: {e}")
+        return ["failed"] * len(origins)
+    if data.get("status") != "OK":
+        return ["failed"] * len(origins)
+
+    results = []
+    for (element,) in parse_matrix(data, len(origins), 1):
+        if element.status == "OK":
+            results.append(element.seconds)
+        elif element.status in NO_ROUTE_STATUSES:
+            results.append(None)
+        else:
+            results.append("failed")
+    return results
+
+
+def fetch_commute_times(origins, destination, travel_type):
+    """Commute seconds from each origin to destination, batched and fetched concurrently."""
+    batches = [origins[start:start + MAX_MATRIX_ORIGINS] for start in range(0, len(origins), MAX_MATRIX_ORIGINS)]
+    with ThreadPoolExecutor(max_workers=COMMUTE_GRID_CONCURRENCY) as executor:
+        responses = executor.map(lambda batch: _fetch_batch(batch, destination, travel_type), batches)
+        return [seconds for response in responses for seconds in response]
+
+
+def _cached_seconds(conn, keys):
+    """Unexpired commute cache values for keys."""
+    found = {}
+    for start in range(0, len(keys), 1000):
+        query = select(commute_cache.c.cache_key, commute_cache.c.commute_seconds).where(
+            commute_cache.c.cache_key.in_(keys[start:start + 1000]),
+            commute_cache.c.expires_at > func.now()
+        )
+        found.update({row.cache_key: row.commute_seconds for row in conn.execute(query)})
+    return found
+
+
+def precompute_cell(engine, region, cell, travel_type, demand, version, budget):
+    """
+    Bring one cell's commute_grid rows up to date with the region's listings.
+
+    Args:
+        engine: SQLAlchemy engine.
+        region (str): Region whose listings are origins.
+        cell (tuple): (cell_lat, cell_lon) destination cell.
+        travel_type (str): Travel mode.
+        demand (int): Requests to the cell within the demand window, recorded with the coverage.
+        version (int): Current dataset version.
+        budget (int): Distance Matrix elements this cell may use.
+
+    Returns:
+        dict: Report entry with the rows reused, taken from the commute cache and fetched,
+              and whether the cell is complete.
+    """
+    cell_match = (
+        (commute_grid.c.cell_lat == cell[0]) & (commute_grid.c.cell_lon == cell[1]) & (commute_grid.c.mode == travel_type)
+    )
+    with engine.connect() as conn:
+        origins = conn.execute(
+            select(listings.c.id, listings.c.latitude, listings.c.longitude).where(listings.c.region == region)
+        ).all()
+        existing = {
+            row.listing_id: (row.latitude, row.longitude)
+            for row in conn.execute(
+                select(commute_grid.c.listing_id, commute_grid.c.latitude, commute_grid.c.longitude).where(cell_match)
+            )
+        }
+        # Rows are reused while the listing still exists at the same coordinates
+        todo = [row for row in origins if existing.get(row.id) != (row.latitude, row.longitude)]
+        keys = [cell_cache_key((row.latitude, row.longitude), cell, travel_type) for row in todo]
+        cached = _cached_seconds(conn, keys)
+
+    values = {}
+    missing = []
+    for row, key in zip(todo, keys):
+        if key in cached:
+            values[row.id] = cached[key]
+        else:
+            missing.append(row)
+    from_cache = len(values)
+
+    fetched = 0
+    if missing and GOOGLE_API_KEY and budget > 0:
+        missing_now = missing[:budget]
+        times = fetch_commute_times([(row.latitude, row.longitude) for row in missing_now], cell_center(cell), travel_type)
+        fetched = len(missing_now)
+        for row, seconds in zip(missing_now, times):
+            if seconds != "failed":
+                values[row.id] = seconds
+
+    coords = {row.id: (row.latitude, row.longitude) for row in todo}
+    current_ids = [row.id for row in origins]
+    complete = len(values) == len(todo)
+    with engine.begin() as conn:
+        conn.execute(delete(commute_grid).where(cell_match, commute_grid.c.listing_id.notin_(current_ids)))
+        if values:
+            stmt = insert(commute_grid)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[commute_grid.c.cell_lat, commute_grid.c.cell_lon, commute_grid.c.mode, commute_grid.c.listing_id],
+                set_={
+                    "latitude": stmt.excluded.latitude,
+                    "longitude": stmt.excluded.longitude,
+                    "commute_seconds": stmt.excluded.commute_seconds
+                }
+            )
+            conn.execute(stmt, [
+                {
+                    "cell_lat": cell[0], "cell_lon": cell[1], "mode": travel_type, "listing_id": listing_id,
+                    "latitude": coords[listing_id][0], "longitude": coords[listing_id][1], "commute_seconds": seconds
+                }
+                for listing_id, seconds in values.items()
+            ])
+        if complete:
+            stmt = insert(commute_grid_cells).values(
+                region=region, cell_lat=cell[0], cell_lon=cell[1], mode=travel_type, dataset_version=version,
+                demand=demand, listings=len(origins), computed_at=datetime.now(timezone.utc)
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[commute_grid_cells.c.region, commute_grid_cells.c.cell_lat,
+                                commute_grid_cells.c.cell_lon, commute_grid_cells.c.mode],
+                set_={
+                    "dataset_version": stmt.excluded.dataset_version, "demand": stmt.excluded.demand,
+                    "listings": stmt.excluded.listings, "computed_at": stmt.excluded.computed_at
+                }
+            )
+            conn.execute(stmt)
+
+    return {
+        "region": region, "cell": list(cell), "mode": travel_type, "demand": demand, "listings": len(origins),
+        "reused": len(origins) - len(todo), "from_cache": from_cache, "fetched": fetched, "complete": complete
+    }
+
+
+def precompute_commute_grid(engine):
+    """
+    Precompute commutes for the busiest cells, drop cells that are no longer busy,
+    and drop request counts older than the demand window.
+
+    Returns:
+        list: One report entry per selected cell, busiest first.
+    """
+    with engine.begin() as conn:
+        commute_cache.create(conn, checkfirst=True)
+        commute_grid.create(conn, checkfirst=True)
+        commute_grid_cells.create(conn, checkfirst=True)
+        commute_demand.create(conn, checkfirst=True)
+        conn.execute(delete(commute_demand).where(commute_demand.c.day < _demand_window_start()))
+        version = conn.execute(select(dataset_version.c.version).where(dataset_version.c.id == 1)).scalar() or 0
+        selected = busiest_cells(conn)
+
+        keep = [(cell[0], cell[1], travel_type) for _, cell, travel_type, _ in selected]
+        grid_key = tuple_(commute_grid.c.cell_lat, commute_grid.c.cell_lon, commute_grid.c.mode)
+        cells_key = tuple_(commute_grid_cells.c.cell_lat, commute_grid_cells.c.cell_lon, commute_grid_cells.c.mode)
+        if keep:
+            conn.execute(delete(commute_grid_cells).where(cells_key.notin_(keep)))
+            conn.execute(delete(commute_grid).where(grid_key.notin_(keep)))
+        else:
+            conn.execute(delete(commute_grid_cells))
+            conn.execute(delete(commute_grid))
+
+    report = []
+    budget = COMMUTE_GRID_MAX_ELEMENTS
+    for region, cell, travel_type, demand in selected:
+        entry = precompute_cell(engine, region, cell, travel_type, demand, version, budget)
+        budget -= entry["fetched"]
+        report.append(entry)
+    return report
+
+
+if __name__ == "__main__":
+    from db import engine
+    print(json.dumps(precompute_commute_grid(engine), indent=2))
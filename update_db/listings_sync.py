@@ -0,0 +1,268 @@
+"""
+listings_sync.py
+----------------
+Diff-based load of scraped listings into the 'listings' table.
+
+Rows are loaded into a temporary staging table and merged keyed on property_url:
+new listings are inserted, changed ones updated in place and delisted ones deleted,
+all in one transaction. Ids of existing listings never change, indexes and
+statistics are kept, and readers are never blocked by a table rewrite.
+
+Listings arrive as an iterable of DataFrame chunks, each validated and streamed
+into the staging table with COPY FROM STDIN, so memory is bounded by the chunk
+size rather than the size of the load. Duplicates are dropped in the database.
+"""
+
+import time
+from io import StringIO
+import pandas as pd
+from sqlalchemy import text, func, select, bindparam, Integer, Float
+from sqlalchemy.dialects.postgresql import insert
+from config.db_schema import listings, dataset_version, region_loads
+from config.constants import LOAD_CHUNK_ROWS
+
+STAGING_TABLE = "listings_staging"
+
+# Every listings column except the database-assigned id and generated columns
+DATA_COLUMNS = [col.name for col in listings.columns if col.name != "id" and col.computed is None]
+
+
+def ensure_listings_schema(engine):
+    """
+    Create the listings table and its indexes if missing, add generated columns
+    tables from older loads lack, and make sure id is assigned by a sequence
+    (tables created by older to_sql loads have none).
+
+    Runs in its own short transaction before a load, and only issues the DDL the
+    catalog shows is missing: ALTER TABLE locks out every reader of listings until
+    its transaction ends, so it must never be held through a load.
+    """
+    with engine.begin() as conn:
+        listings.create(conn, checkfirst=True)
+        columns = dict(conn.execute(text(
+            "SELECT column_name, column_default FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'listings'"
+        )).all())
+        for column in listings.columns:
+            if column.computed is not None and column.name not in columns:
+                conn.execute(text(
+                    f"ALTER TABLE listings ADD COLUMN {column.name} "
+                    f"{column.type.compile(dialect=conn.dialect)} "
+                    f"GENERATED ALWAYS AS ({column.computed.sqltext}) STORED"
+                ))
+        for index in listings.indexes:
+            index.create(conn, checkfirst=True)
+        if columns.get("id") is None:
+            conn.execute(text("CREATE SEQUENCE IF NOT EXISTS listings_id_seq OWNED BY listings.id"))
+            conn.execute(text("ALTER TABLE listings ALTER COLUMN id SET DEFAULT nextval('listings_id_seq')"))
+            conn.execute(text(
+                "SELECT setval('listings_id_seq', COALESCE((SELECT MAX(id) FROM listings), 0) + 1, false)"
+            ))
+
+
+def create_staging_table(conn):
+    """Create a temporary staging table with the listings data columns, dropped on commit."""
+    columns = ", ".join(DATA_COLUMNS)
+    conn.execute(text(
+        f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+        f"SELECT {columns} FROM listings WITH NO DATA"
+    ))
+
+
+def validate_chunk(df):
+    """
+    Coerce a chunk of scraped listings to the listings column types.
+
+    Missing columns are NULL, non-numeric values in numeric columns and fractional
+    values in integer columns become NULL, and rows without a property_url are dropped.
+
+    Returns:
+        DataFrame: The chunk with exactly DATA_COLUMNS, in order.
+    """
+    validated = pd.DataFrame(index=df.index)
+    for name in DATA_COLUMNS:
+        values = df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        column_type = listings.c[name].type
+        if isinstance(column_type, Integer):
+            numeric = pd.to_numeric(values, errors="coerce")
+            values = numeric.where(numeric % 1 == 0).astype("Int64")
+        elif isinstance(column_type, Float):
+            values = pd.to_numeric(values, errors="coerce")
+        validated[name] = values
+    return validated[validated["property_url"].notna()]
+
+
+def copy_staging(conn, df):
+    """
+    Stream a validated chunk into the staging table with COPY FROM STDIN.
+
+    Returns:
+        int: Rows copied.
+    """
+    buffer = StringIO()
+    df.to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    # The raw psycopg2 connection, inside the same transaction
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(DATA_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+    return len(df)
+
+
+def dedupe_staging(conn):
+    """Keep the first staged row of each property_url, as the rows were copied in order."""
+    conn.execute(text(
+        f"DELETE FROM {STAGING_TABLE} s USING ("
+        f"SELECT ctid, row_number() OVER (PARTITION BY property_url ORDER BY ctid) AS n FROM {STAGING_TABLE}"
+        f") d WHERE s.ctid = d.ctid AND d.n > 1"
+    ))
+    conn.execute(text(f"ANALYZE {STAGING_TABLE}"))
+
+
+def iter_chunks(df, chunk_rows=LOAD_CHUNK_ROWS):
+    """Split a DataFrame into chunks of at most chunk_rows rows."""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def merge_staging(conn, regions=None):
+    """
+    Merge the staging table into listings.
+
+    Args:
+        conn: Open connection inside a transaction.
+        regions (list): If given, only listings in these regions may be deleted, so a
+                        partial load leaves other regions untouched.
+
+    Returns:
+        dict: Number of rows inserted, updated and deleted.
+    """
+    assignments = ", ".join(f"{col} = s.{col}" for col in DATA_COLUMNS)
+    current = ", ".join(f"l.{col}" for col in DATA_COLUMNS)
+    staged = ", ".join(f"s.{col}" for col in DATA_COLUMNS)
+    columns = ", ".join(DATA_COLUMNS)
+
+    updated = conn.execute(text(
+        f"UPDATE listings l SET {assignments} FROM {STAGING_TABLE} s "
+        f"WHERE l.property_url = s.property_url AND ({current}) IS DISTINCT FROM ({staged})"
+    )).rowcount
+
+    inserted = conn.execute(text(
+        f"INSERT INTO listings ({columns}) SELECT {staged} FROM {STAGING_TABLE} s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM listings l WHERE l.property_url = s.property_url)"
+    )).rowcount
+
+    delete_sql = (
+        f"DELETE FROM listings l WHERE NOT EXISTS "
+        f"(SELECT 1 FROM {STAGING_TABLE} s WHERE s.property_url = l.property_url)"
+    )
+    if regions is None:
+        deleted = conn.execute(text(delete_sql)).rowcount
+    else:
+        stmt = text(delete_sql + " AND l.region IN :regions").bindparams(bindparam("regions", expanding=True))
+        deleted = conn.execute(stmt, {"regions": list(regions)}).rowcount
+
+    return {"inserted": inserted, "updated": updated, "deleted": deleted}
+
+
+def bump_dataset_version(conn):
+    """Increment the dataset version so API-side caches keyed on it are invalidated."""
+    dataset_version.create(conn, checkfirst=True)
+    stmt = insert(dataset_version).values(id=1, version=1, updated_at=func.now())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[dataset_version.c.id],
+        set_={"version": dataset_version.c.version + 1, "updated_at": func.now()}
+    )
+    conn.execute(stmt)
+
+
+def get_loaded_hashes(engine):
+    """Return {region: sha256} for the artifacts last loaded into the database."""
+    with engine.begin() as conn:
+        region_loads.create(conn, checkfirst=True)
+        return {row.region: row.sha256 for row in conn.execute(select(region_loads.c.region, region_loads.c.sha256))}
+
+
+def changed_regions(engine, manifest):
+    """Return the manifest entries of regions whose content hash differs from the last load."""
+    loaded_hashes = get_loaded_hashes(engine)
+    return {
+        region: entry for region, entry in manifest["regions"].items()
+        if loaded_hashes.get(region) != entry["sha256"]
+    }
+
+
+def record_region_loads(conn, manifest_entries):
+    """Remember the content hash of each region just loaded."""
+    region_loads.create(conn, checkfirst=True)
+    for region, entry in manifest_entries.items():
+        stmt = insert(region_loads).values(
+            region=region, sha256=entry["sha256"], rows=entry["rows"], loaded_at=func.now()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[region_loads.c.region],
+            set_={"sha256": stmt.excluded.sha256, "rows": stmt.excluded.rows, "loaded_at": func.now()}
+        )
+        conn.execute(stmt)
+
+
+def analyze_listings(engine):
+    """Refresh planner statistics after a load."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE listings"))
+
+
+def sync_listing_chunks(engine, chunks, manifest_entries=None):
+    """
+    Apply a scraped snapshot, streamed as DataFrame chunks, to the listings table.
+    A full snapshot with no rows changes nothing; region artifacts with no rows delete
+    their regions' listings.
+
+    Args:
+        engine: SQLAlchemy engine (psycopg2 driver, for COPY).
+        chunks (iterable): DataFrames of scraped listings. Where a property_url repeats,
+                           its first row is kept.
+        manifest_entries (dict): When loading region artifacts, the manifest entries of the
+                                 regions in the chunks. Deletions are then limited to those
+                                 regions and their content hashes are recorded.
+
+    Returns:
+        dict: Number of rows inserted, updated and deleted, rows read, seconds taken
+              and rows per second.
+    """
+    started = time.perf_counter()
+    regions = list(manifest_entries) if manifest_entries is not None else None
+    rows = 0
+    ensure_listings_schema(engine)
+    with engine.begin() as conn:
+        create_staging_table(conn)
+        for chunk in chunks:
+            rows += copy_staging(conn, validate_chunk(chunk))
+        if rows == 0 and regions is None:
+            # An empty full snapshot is a failed export, not every listing delisted
+            return {"inserted": 0, "updated": 0, "deleted": 0, "rows": 0, "seconds": 0.0, "rows_per_second": None}
+        # An empty region artifact still deletes the region's listings and records its hash
+        if rows:
+            dedupe_staging(conn)
+        counts = merge_staging(conn, regions)
+        if manifest_entries:
+            record_region_loads(conn, manifest_entries)
+        if rows or counts["deleted"]:
+            bump_dataset_version(conn)
+    analyze_listings(engine)
+
+    seconds = time.perf_counter() - started
+    counts.update(rows=rows, seconds=seconds, rows_per_second=rows / seconds if seconds else None)
+    return counts
+
+
+def sync_listings(engine, df, manifest_entries=None):
+    """
+    Apply a scraped snapshot held in one DataFrame to the listings table.
+    See sync_listing_chunks.
+    """
+    return sync_listing_chunks(engine, iter_chunks(df), manifest_entries)
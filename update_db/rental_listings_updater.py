@@ -1,44 +1,122 @@
+import os
 import pandas as pd
 import boto3
-from io import StringIO
-from sqlalchemy import text
+from config.constants import LOAD_CHUNK_ROWS
 from db import engine
+from listings_sync import sync_listing_chunks, changed_regions
+from artifacts import S3ArtifactStore, LocalArtifactStore, load_manifest, iter_region
+from commute_calibration import calibrate
+from commute_precompute import precompute_commute_grid
+from cache_maintenance import trim_commute_cache
 
 def lambda_handler(event, context):
     """
-    Reads a CSV file from S3 and replaces the 'listings' table in PostgreSQL.
-    s3_key (str): The object key (path and filename) for the CSV in S3.
+    Applies scraped listings to the 'listings' table in PostgreSQL, inserting new
+    listings, updating changed ones and deleting delisted ones.
+
+    Triggered by the scraper's manifest upload to S3: only regions whose content hash
+    differs from the last load are read and synced. A legacy single CSV key is synced
+    in full. For local runs, pass {"artifact_dir": path} instead of an S3 event.
+
+    Listings are streamed in chunks of LOAD_CHUNK_ROWS into COPY, so memory use does
+    not grow with the size of the load.
 
     Returns:
         bool: True if the database was updated, False otherwise.
     """
+    if 'artifact_dir' in event:
+        return load_region_artifacts(LocalArtifactStore(event['artifact_dir']))
+
     s3_bucket = event['Records'][0]['s3']['bucket']['name']
     s3_key = event['Records'][0]['s3']['object']['key']
-    
+
+    if s3_key.endswith('.csv'):
+        return load_csv(s3_bucket, s3_key)
+    return load_region_artifacts(S3ArtifactStore(s3_bucket, os.path.dirname(s3_key)))
+
+
+def after_load():
+    """Refresh data derived from listings and observed commutes. Failures here never fail the load."""
+    try:
+        deleted = trim_commute_cache(engine)
+        print(f"Trimmed {deleted} expired or excess commute cache rows.")
+    except Exception as e:
+        print(f"Failed to trim the commute cache: {e}")
+    try:
+        report = calibrate(engine)
+        print(f"Calibrated the commute estimator for {len(report)} region/mode pairs.")
+    except Exception as e:
+        print(f"Failed to calibrate the commute estimator: {e}")
+    try:
+        report = precompute_commute_grid(engine)
+        complete = sum(entry["complete"] for entry in report)
+        fetched = sum(entry["fetched"] for entry in report)
+        print(f"Precomputed commutes for {complete}/{len(report)} destination cells ({fetched} API elements).")
+    except Exception as e:
+        print(f"Failed to precompute the commute grid: {e}")
+
+
+def load_region_artifacts(store):
+    """
+    Sync the regions whose artifacts changed since the last load.
+
+    Returns:
+        bool: True if the database was updated, False otherwise.
+    """
+    try:
+        changed = changed_regions(engine, load_manifest(store))
+        if not changed:
+            print("No regions changed since the last load. Leaving the database unchanged.")
+            return False
+    except Exception as e:
+        print(f"Failed to read artifacts: {e}")
+        return False
+
+    total = sum(entry['rows'] for entry in changed.values())
+    print(f"Syncing {total} records for {len(changed)} changed regions: {', '.join(changed)}")
+    chunks = (chunk for entry in changed.values() for chunk in iter_region(store, entry))
+    try:
+        counts = sync_listing_chunks(engine, chunks, manifest_entries=changed)
+        print_sync_report(counts)
+        after_load()
+        return True
+    except Exception as e:
+        print(f"Failed to load listings into the database: {e}")
+        return False
+
+
+def load_csv(s3_bucket, s3_key):
+    """
+    Sync the full listings table from a single CSV in S3.
+
+    Returns:
+        bool: True if the database was updated, False otherwise.
+    """
     s3_client = boto3.client('s3')
     try:
         obj = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
-        csv_string = obj['Body'].read().decode('utf-8')
-        df = pd.read_csv(StringIO(csv_string))
     except Exception as e:
         print(f"Failed to read file from S3: {e}")
         return False
 
-    print(f"Adding {len(df)} records to the database...")
+    # The body is parsed as it downloads, one chunk of rows at a time
+    print(f"Syncing s3://{s3_bucket}/{s3_key} to the database...")
     try:
-        with engine.begin() as conn:
-            df.to_sql(
-                'listings',
-                conn,
-                schema='public',
-                if_exists='replace',
-                index=False
-            )
-            
-            conn.execute(text("ALTER TABLE public.listings ADD PRIMARY KEY (id);"))
-            
-        print(f"Database table 'listings' replaced with {len(df)} rental listings.")
-        return True
+        counts = sync_listing_chunks(engine, pd.read_csv(obj['Body'], chunksize=LOAD_CHUNK_ROWS))
     except Exception as e:
-        print(f"Failed to insert data into the database: {e}")
-        return False
\ No newline at end of file
+        print(f"Failed to load listings into the database: {e}")
+        return False
+    if counts['rows'] == 0:
+        print("No records in file. Leaving the database unchanged.")
+        return False
+    print_sync_report(counts)
+    after_load()
+    return True
+
+
+def print_sync_report(counts):
+    print(
+        f"Database table 'listings' synced: {counts['inserted']} inserted, "
+        f"{counts['updated']} updated, {counts['deleted']} deleted "
+        f"({counts['rows']} rows in {counts['seconds']:.1f}s, {counts['rows_per_second'] or 0:.0f} rows/s)."
+    )